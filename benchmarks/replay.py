@@ -0,0 +1,86 @@
+"""
+Replay a cassette recorded with pyflare.replay.RecordingTransport as load, at a multiple of its recorded rate.
+
+Calls are sent either to the local stand-in server, started with the given options, or with --offline answered from
+the cassette itself, which measures the client alone:
+
+    python benchmarks/replay.py session.jsonl.gz --speed 10
+    python benchmarks/replay.py session.jsonl.gz --speed 100 --offline --latency-speed 100
+"""
+__author__ = 'Joe Linn'
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pyflare import PyflareClient, PyflareHosting
+from pyflare.replay import LoadReplayer, ReplayTransport, read_cassette
+from pyflare.transport import TRANSPORTS
+
+import server
+from run import median, percentile, start_server
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('cassette')
+    parser.add_argument('-s', '--speed', type=float, default=1.0,
+                        help='Factor by which to compress the recorded schedule; 0 sends calls as fast as possible')
+    parser.add_argument('-c', '--concurrency', type=int, default=32, help='Maximum number of calls in flight')
+    parser.add_argument('--offline', action='store_true', help='Answer calls from the cassette instead of a server')
+    parser.add_argument('--latency-speed', type=float, default=0,
+                        help='With --offline, delay responses by their recorded duration divided by this factor')
+    parser.add_argument('--url', help='Use an already running stand-in server')
+    parser.add_argument('-t', '--transport', default='requests', choices=sorted(TRANSPORTS),
+                        help='Transport the clients send requests through')
+    defaults = server.ServerConfig()
+    group = parser.add_argument_group('stand-in server')
+    for field in server.ServerConfig.FIELDS:
+        default = getattr(defaults, field)
+        group.add_argument('--' + field.replace('_', '-'), type=type(default), default=default)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    entries = list(read_cassette(options.cassette))
+    process = None
+    if options.offline:
+        transport = ReplayTransport(entries, speed=options.latency_speed or None)
+        client = PyflareClient('replay@example.com', '0' * 32, transport=transport)
+        hosting = PyflareHosting('0' * 32, transport=transport)
+    else:
+        if options.url:
+            url = options.url.rstrip('/') + '/'
+        else:
+            config = server.ServerConfig(**dict((field, getattr(options, field))
+                                                for field in server.ServerConfig.FIELDS))
+            process, url = start_server(config)
+        client = PyflareClient('replay@example.com', '0' * 32, pool_maxsize=options.concurrency,
+                               transport=options.transport, url=url + server.CLIENT_PATH.lstrip('/'))
+        hosting = PyflareHosting('0' * 32, pool_maxsize=options.concurrency, transport=options.transport,
+                                 url=url + server.HOSTING_PATH.lstrip('/'))
+    try:
+        result = LoadReplayer(client, hosting, options.concurrency).replay(entries, options.speed or None)
+    finally:
+        client.close()
+        hosting.close()
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    recorded = max(entry['t'] for entry in entries) - min(entry['t'] for entry in entries) if entries else 0
+    lateness = sorted(result.lateness)
+    sys.stdout.write('{0} calls recorded over {1:.1f}s, replayed at {2} in {3:.1f}s: {4:.1f} calls/s\n'.format(
+        len(entries), recorded, '{0:g}x'.format(options.speed) if options.speed else 'full speed', result.elapsed,
+        result.throughput))
+    sys.stdout.write('{0} failed; start lateness p50 {1:.1f}ms, p99 {2:.1f}ms, max {3:.1f}ms\n'.format(
+        result.failed, (median(lateness) or 0) * 1e3, (percentile(lateness, 99) or 0) * 1e3,
+        result.max_lateness * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,394 @@
+"""
+Benchmarks of the pyflare checkout this script lives in, against the local stand-in API of benchmarks/server.py.
+
+Every scenario is run at every concurrency level it supports, a number of times, measuring requests and records per
+second, per-request latency percentiles, CPU time per decoded record and peak memory per decoded record. Results are
+written as JSON along with the server configuration and environment, and can be compared with those of an earlier run,
+e.g. of the previous release:
+
+    git checkout v1.1.5 && python benchmarks/run.py -o before.json
+    git checkout master && python benchmarks/run.py -o after.json --compare before.json
+"""
+__author__ = 'Joe Linn'
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pyflare import PyflareClient, PyflareHosting, serialization, transport
+from pyflare.instrumentation import Callbacks, timer
+from pyflare.retry import RetryPolicy
+
+import server
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+SCHEMA = 1
+
+# Metrics which are better when higher; all others are better when lower
+HIGHER_IS_BETTER = ('requests_per_second', 'records_per_second')
+COMPARED_METRICS = ('requests_per_second', 'records_per_second', 'latency_p50_ms', 'latency_p99_ms',
+                    'cpu_us_per_record', 'peak_bytes_per_record')
+
+process_time = getattr(time, 'process_time', None) or (lambda: sum(os.times()[:2]))
+
+
+class Scenario(object):
+    """
+    A workload. Its function takes the clients and the benchmark options and returns the number of records decoded.
+    """
+
+    def __init__(self, name, function, concurrent=False, available=True):
+        """
+        :param concurrent: Whether the workload takes a concurrency level. If not, it runs at concurrency 1 only.
+        :type concurrent: bool
+        :param available: False if the workload needs an optional dependency which is not installed
+        :type available: bool
+        """
+        self.name = name
+        self.function = function
+        self.concurrent = concurrent
+        self.available = available
+
+
+def rec_load_all(client, hosting, options, concurrency):
+    return sum(1 for _ in client.rec_load_all(server.zone_name(0)))
+
+
+def rec_load_all_typed(client, hosting, options, concurrency):
+    return sum(1 for _ in client.rec_load_all(server.zone_name(0), typed=True))
+
+
+def rec_load_all_stream(client, hosting, options, concurrency):
+    return sum(1 for _ in client.rec_load_all(server.zone_name(0), stream=True))
+
+
+def rec_load_all_prefetch(client, hosting, options, concurrency):
+    return sum(1 for _ in client.rec_load_all(server.zone_name(0), prefetch=2))
+
+
+def zone_load_multi(client, hosting, options, concurrency):
+    return len(client.zone_load_multi()['response']['zones']['objs'])
+
+
+def fan_out_rec_load_all(client, hosting, options, concurrency):
+    zones = [server.zone_name(index) for index in range(options.zones)]
+    records = 0
+    for _, response in client.fan_out('rec_load_all', zones, concurrency):
+        if not isinstance(response, Exception):
+            records += len(response)
+    return records
+
+
+def bulk_records(client, hosting, options, concurrency):
+    operations = [{'action': 'rec_edit', 'zone': server.zone_name(0), 'record_type': 'TXT', 'record_id': index,
+                   'name': 'host{0}'.format(index), 'content': 'v={0}'.format(index)}
+                  for index in range(options.operations)]
+    return client.bulk_records(operations, concurrency).succeeded
+
+
+def bulk_ip_action(client, hosting, options, concurrency):
+    addresses = ['10.{0}.{1}.{2}'.format(index >> 16 & 255, index >> 8 & 255, index & 255)
+                 for index in range(options.operations)]
+    return client.bulk_ip_action('ban', addresses, concurrency).succeeded
+
+
+def iter_zones(client, hosting, options, concurrency):
+    return sum(1 for _ in hosting.iter_zones('0' * 32, page_size=100))
+
+
+SCENARIOS = OrderedDict((scenario.name, scenario) for scenario in (
+    Scenario('rec_load_all', rec_load_all),
+    Scenario('rec_load_all_typed', rec_load_all_typed),
+    Scenario('rec_load_all_stream', rec_load_all_stream, available=ijson is not None),
+    Scenario('rec_load_all_prefetch', rec_load_all_prefetch),
+    Scenario('zone_load_multi', zone_load_multi),
+    Scenario('fan_out_rec_load_all', fan_out_rec_load_all, concurrent=True),
+    Scenario('bulk_records', bulk_records, concurrent=True),
+    Scenario('bulk_ip_action', bulk_ip_action, concurrent=True),
+    Scenario('iter_zones', iter_zones),
+))
+
+
+def percentile(values, q):
+    """
+    :param values: sorted values
+    :param q: Between 0 and 100
+    :return: Nearest-rank percentile, or None if there are no values
+    """
+    if not values:
+        return None
+    return values[min(int(len(values) * q / 100.0), len(values) - 1)]
+
+
+def median(values):
+    return percentile(sorted(values), 50)
+
+
+def make_clients(url, concurrency, options, instrumentation=None):
+    retry = RetryPolicy(max_retries=options.retries, backoff_factor=0) if options.retries else None
+    pool = max(concurrency, PyflareClient.DEFAULT_POOL_MAXSIZE)
+    client = PyflareClient('bench@example.com', '0' * 32, pool_maxsize=pool, retry=retry,
+                           instrumentation=instrumentation, transport=options.transport,
+                           url=url + server.CLIENT_PATH.lstrip('/'))
+    hosting = PyflareHosting('0' * 32, pool_maxsize=pool, retry=retry, instrumentation=instrumentation,
+                             transport=options.transport, url=url + server.HOSTING_PATH.lstrip('/'))
+    return client, hosting
+
+
+def run_once(scenario, url, concurrency, options, trace_memory=False):
+    """
+    :return: Measurements of a single run of a scenario
+    :rtype: dict
+    """
+    latencies = []
+    errors = []
+
+    def finished(event):
+        latencies.append(event.elapsed)
+        if event.error is not None:
+            errors.append(event.error_code)
+
+    client, hosting = make_clients(url, concurrency, options, Callbacks(finished=finished))
+    try:
+        # one request first, so that connection setup is not part of the measurement
+        try:
+            client.ip_lkup('127.0.0.1')
+        except Exception:
+            pass
+        del latencies[:], errors[:]
+        gc.collect()
+        if trace_memory:
+            tracemalloc.start()
+        cpu, wall = process_time(), timer()
+        try:
+            records = scenario.function(client, hosting, options, concurrency)
+            failure = None
+        except Exception as e:
+            records, failure = 0, '{0}: {1}'.format(type(e).__name__, e)
+        wall, cpu = timer() - wall, process_time() - cpu
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    finally:
+        client.close()
+        hosting.close()
+    return {'seconds': wall, 'cpu': cpu, 'records': records, 'latencies': latencies, 'errors': len(errors),
+            'failure': failure, 'peak_bytes': peak}
+
+
+def measure(scenario, url, concurrency, options):
+    """
+    Run a scenario options.repeat times for timings, then once more with allocation tracing for memory
+    :return: Summary of the runs
+    :rtype: dict
+    """
+    runs = [run_once(scenario, url, concurrency, options) for _ in range(options.repeat)]
+    peak = None
+    if tracemalloc is not None and not options.skip_memory:
+        peak = run_once(scenario, url, concurrency, options, trace_memory=True)['peak_bytes']
+    latencies = sorted(latency for run in runs for latency in run['latencies'])
+    seconds = median([run['seconds'] for run in runs])
+    requests = int(median([len(run['latencies']) for run in runs]))
+    records = int(median([run['records'] for run in runs]))
+    cpu = median([run['cpu'] for run in runs])
+    return OrderedDict((
+        ('scenario', scenario.name),
+        ('concurrency', concurrency),
+        ('repeat', options.repeat),
+        ('requests', requests),
+        ('records', records),
+        ('errors', sum(run['errors'] for run in runs)),
+        ('failures', [run['failure'] for run in runs if run['failure']]),
+        ('seconds', seconds),
+        ('requests_per_second', requests / seconds if seconds else None),
+        ('records_per_second', records / seconds if seconds else None),
+        ('latency_p50_ms', _scale(percentile(latencies, 50), 1e3)),
+        ('latency_p99_ms', _scale(percentile(latencies, 99), 1e3)),
+        ('cpu_us_per_record', cpu * 1e6 / records if records else None),
+        ('peak_bytes_per_record', float(peak) / records if peak is not None and records else None),
+    ))
+
+
+def _scale(value, factor):
+    return value * factor if value is not None else None
+
+
+def environment(options):
+    try:
+        revision = subprocess.check_output(['git', 'describe', '--always', '--dirty', '--tags'], cwd=ROOT,
+                                           stderr=subprocess.STDOUT).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    decoder = next((name for name, function in serialization.DECODERS.items()
+                    if function is serialization._decoder), 'custom')
+    return OrderedDict((
+        ('revision', revision),
+        ('python', platform.python_version()),
+        ('implementation', platform.python_implementation()),
+        ('platform', platform.platform()),
+        ('cpus', _cpu_count()),
+        ('transport', options.transport),
+        ('decoder', decoder),
+        ('ijson', getattr(ijson, '__version__', None) if ijson is not None else None),
+        ('retries', options.retries),
+    ))
+
+
+def _cpu_count():
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def start_server(config):
+    """
+    Run the stand-in server in its own process, so its CPU time is not counted against the client
+    :return: The process and the url it serves on
+    """
+    process = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                             'server.py')] + config.to_args(),
+                               stdout=subprocess.PIPE)
+    url = process.stdout.readline().decode('utf-8').strip()
+    if not url:
+        process.wait()
+        raise RuntimeError('the stand-in server failed to start')
+    return process, url
+
+
+def compare(baseline, results, tolerance):
+    """
+    Print the change of every metric from baseline to results
+    :param tolerance: Percentage by which a metric may get worse before it counts as a regression
+    :type tolerance: float
+    :return: Number of regressions
+    :rtype: int
+    """
+    if baseline.get('server') != results['server']:
+        sys.stdout.write('warning: the server configurations differ, results are not comparable\n')
+    previous = dict(((entry['scenario'], entry['concurrency']), entry) for entry in baseline['results'])
+    regressions = 0
+    sys.stdout.write('{0:<24} {1:>4} {2:<22} {3:>12} {4:>12} {5:>8}\n'.format(
+        'scenario', 'conc', 'metric', 'before', 'after', 'change'))
+    for entry in results['results']:
+        old = previous.get((entry['scenario'], entry['concurrency']))
+        if old is None:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = old.get(metric), entry.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) * 100.0 / before
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = ''
+            if worse > tolerance:
+                regressions += 1
+                flag = '  REGRESSION'
+            sys.stdout.write('{0:<24} {1:>4} {2:<22} {3:>12.2f} {4:>12.2f} {5:>+7.1f}%{6}\n'.format(
+                entry['scenario'], entry['concurrency'], metric, before, after, change, flag))
+    return regressions
+
+
+def report(entry):
+    def show(value, pattern):
+        return pattern.format(value) if value is not None else '-'
+    sys.stdout.write('{0:<24} c={1:<4} {2:>9} req/s {3:>11} rec/s  p50 {4:>8} ms  p99 {5:>8} ms  {6:>7} us/rec  '
+                     '{7:>8} B/rec  {8} errors\n'.format(
+                         entry['scenario'], entry['concurrency'], show(entry['requests_per_second'], '{0:.1f}'),
+                         show(entry['records_per_second'], '{0:.0f}'), show(entry['latency_p50_ms'], '{0:.2f}'),
+                         show(entry['latency_p99_ms'], '{0:.2f}'), show(entry['cpu_us_per_record'], '{0:.1f}'),
+                         show(entry['peak_bytes_per_record'], '{0:.0f}'), entry['errors']))
+    for failure in set(entry['failures']):
+        sys.stdout.write('    failed: {0}\n'.format(failure))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('scenarios', nargs='*', help='Scenarios to run: {0}. Defaults to all.'.format(
+        ', '.join(SCENARIOS)))
+    parser.add_argument('-c', '--concurrency', default='1,8,32',
+                        help='Comma separated concurrency levels of the concurrent scenarios')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Timed runs per scenario and concurrency')
+    parser.add_argument('--operations', type=int, default=500, help='Calls made by the bulk scenarios')
+    parser.add_argument('--retries', type=int, default=0, help='Retry failed calls up to this many times')
+    parser.add_argument('-t', '--transport', default='requests', choices=sorted(transport.TRANSPORTS),
+                        help='Transport the clients send requests through')
+    parser.add_argument('--decoder', help='JSON decoder to use: {0}'.format(', '.join(serialization.DECODERS)))
+    parser.add_argument('--skip-memory', action='store_true', help='Skip the allocation tracing run')
+    parser.add_argument('--url', help='Use an already running stand-in server, started with the same options')
+    parser.add_argument('-o', '--output', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=10.0,
+                        help='Percentage by which a metric may get worse before --compare exits with an error')
+    defaults = server.ServerConfig()
+    group = parser.add_argument_group('stand-in server')
+    for field in server.ServerConfig.FIELDS:
+        default = getattr(defaults, field)
+        group.add_argument('--' + field.replace('_', '-'), type=type(default), default=default)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    unknown = [name for name in options.scenarios if name not in SCENARIOS]
+    if unknown:
+        sys.exit('unknown scenarios: {0}'.format(', '.join(unknown)))
+    if options.decoder:
+        serialization.set_decoder(options.decoder)
+    config = server.ServerConfig(**dict((field, getattr(options, field)) for field in server.ServerConfig.FIELDS))
+    levels = [int(level) for level in options.concurrency.split(',')]
+
+    process, url = (None, options.url.rstrip('/') + '/') if options.url else start_server(config)
+    entries = []
+    try:
+        for name in options.scenarios or SCENARIOS:
+            scenario = SCENARIOS[name]
+            if not scenario.available:
+                sys.stdout.write('{0:<24} skipped, optional dependency missing\n'.format(name))
+                continue
+            for concurrency in levels if scenario.concurrent else [1]:
+                entry = measure(scenario, url, concurrency, options)
+                report(entry)
+                entries.append(entry)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    results = OrderedDict((('schema', SCHEMA), ('created', time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())),
+                           ('environment', environment(options)), ('server', config.to_dict()),
+                           ('results', entries)))
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('schema') != SCHEMA:
+            sys.exit('{0} was written by an incompatible version of this script'.format(options.compare))
+        if compare(baseline, results, options.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+"""
+Local stand-in for the Cloudflare client API (api_json.html) and host API (host-gw.html), for benchmarking.
+
+Responses have the shape of the real ones and are generated from the configuration: how many zones the account holds,
+how many DNS records each zone holds and how large they are, how records are paginated, how long every request takes
+and how often it fails. Run it on its own with `python benchmarks/server.py --help`, or through benchmarks/run.py.
+"""
+__author__ = 'Joe Linn'
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlparse
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlparse
+
+CLIENT_PATH = '/api_json.html'
+HOSTING_PATH = '/host-gw.html'
+
+
+class ServerConfig(object):
+    """
+    Shape and behaviour of the stand-in API
+    """
+
+    FIELDS = ('zones', 'records', 'page_size', 'payload_size', 'latency', 'jitter', 'error_rate', 'unavailable_rate',
+              'seed')
+
+    def __init__(self, zones=50, records=1000, page_size=180, payload_size=64, latency=0.0, jitter=0.0,
+                 error_rate=0.0, unavailable_rate=0.0, seed=0):
+        """
+        :param zones: Number of zones in the account, named zone0.example ... zoneN.example
+        :type zones: int
+        :param records: Number of DNS records in every zone
+        :type records: int
+        :param page_size: Records per rec_load_all page. Cloudflare uses 180.
+        :type page_size: int
+        :param payload_size: Length of the content of every record, in characters
+        :type payload_size: int
+        :param latency: Seconds every request is delayed by before it is answered
+        :type latency: float
+        :param jitter: Up to this many seconds are added at random to the latency
+        :type jitter: float
+        :param error_rate: Fraction of requests answered with an API error result (E_UNAUTH)
+        :type error_rate: float
+        :param unavailable_rate: Fraction of requests answered with HTTP 503
+        :type unavailable_rate: float
+        :param seed: Seed of the random choices, so that runs with the same configuration see the same failures
+        :type seed: int
+        """
+        self.zones = zones
+        self.records = records
+        self.page_size = page_size
+        self.payload_size = payload_size
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.unavailable_rate = unavailable_rate
+        self.seed = seed
+
+    def to_dict(self):
+        return dict((field, getattr(self, field)) for field in self.FIELDS)
+
+    def to_args(self):
+        """
+        :return: Command line arguments of this script reproducing the configuration
+        :rtype: list of str
+        """
+        args = []
+        for field in self.FIELDS:
+            args += ['--' + field.replace('_', '-'), str(getattr(self, field))]
+        return args
+
+
+def zone_name(index):
+    return 'zone{0}.example'.format(index)
+
+
+def success(response):
+    return {'request': {}, 'response': response, 'result': 'success', 'msg': None}
+
+
+class StandInAPI(object):
+    """
+    Builds response bodies. Bodies which only depend on the request, such as record pages, are encoded once and reused,
+    so that the server spends as little CPU as possible per request.
+    """
+
+    def __init__(self, config):
+        """
+        :type config: ServerConfig
+        """
+        self.config = config
+        self._random = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._bodies = {}
+        self._next_id = config.records
+
+    def handle(self, path, params):
+        """
+        :param path: CLIENT_PATH or HOSTING_PATH
+        :param params: Form fields of the request
+        :type params: dict
+        :return: HTTP status and body
+        :rtype: tuple
+        """
+        config = self.config
+        with self._lock:
+            delay = config.latency + (self._random.random() * config.jitter if config.jitter else 0)
+            draw = self._random.random()
+        if delay:
+            time.sleep(delay)
+        if draw < config.unavailable_rate:
+            return 503, b'Service Unavailable'
+        if draw < config.unavailable_rate + config.error_rate:
+            return 200, self._encode({'result': 'error', 'msg': 'Invalid credentials', 'err_code': 'E_UNAUTH'})
+        if path == HOSTING_PATH:
+            action = params.get('act')
+            handler = getattr(self, 'host_' + str(action), None)
+        else:
+            action = params.get('a')
+            handler = getattr(self, 'client_' + str(action), None)
+        if handler is None:
+            return 200, self._encode(success({}))
+        return 200, handler(params)
+
+    def record(self, zone, index):
+        name = 'host{0}.{1}'.format(index, zone)
+        return {
+            'rec_id': str(index), 'rec_tag': '{0:032x}'.format(index), 'zone_name': zone, 'name': name,
+            'display_name': 'host{0}'.format(index), 'type': 'TXT', 'prio': None,
+            'content': ('v={0};'.format(index) + 'x' * self.config.payload_size)[:self.config.payload_size],
+            'display_content': None, 'ttl': '1', 'ttl_ceil': 86400, 'ssl_id': None, 'ssl_status': None,
+            'ssl_expires_on': None, 'auto_ttl': 1, 'service_mode': '0',
+            'props': {'proxiable': 0, 'cloud_on': 0, 'cf_open': 1, 'ssl': 0, 'expired_ssl': 0, 'expiring_ssl': 0,
+                      'pending_ssl': 0}
+        }
+
+    def zone(self, index):
+        return {
+            'zone_id': str(index), 'user_id': '1', 'zone_name': zone_name(index), 'display_name': zone_name(index),
+            'zone_status': 'V', 'zone_mode': '1', 'host_id': None, 'zone_type': 'F', 'host_pubname': None,
+            'host_website': None, 'vtxt': None, 'fqdns': None, 'step': '4', 'zone_status_class': 'statusactive',
+            'zone_status_desc': 'CloudFlare powered', 'ns_vanity_map': [], 'orig_registrar': None,
+            'orig_dnshost': None, 'orig_ns_names': None,
+            'props': {'dns_cname': 0, 'dns_partner': 0, 'dns_anon_partner': 0, 'pro': 0, 'expired_pro': 0,
+                      'pro_sub': 0, 'ssl': 0, 'expired_ssl': 0, 'expired_rs_pro': 0, 'reseller_pro': 0,
+                      'force_interal': 0, 'ssl_needed': 0, 'alexa_rank': 0},
+            'confirm_code': {}, 'allow': ['analytics', 'threat_control', 'dns_editor', 'cf_settings']
+        }
+
+    def client_rec_load_all(self, params):
+        offset = int(params.get('o') or 0)
+        zone = params.get('z')
+        key = ('rec_load_all', zone, offset)
+        body = self._bodies.get(key)
+        if body is None:
+            stop = min(offset + self.config.page_size, self.config.records)
+            objs = [self.record(zone, index) for index in range(offset, stop)]
+            body = self._bodies[key] = self._encode(success({'recs': {
+                'has_more': stop < self.config.records, 'count': len(objs), 'objs': objs}}))
+        return body
+
+    def client_zone_load_multi(self, params):
+        body = self._bodies.get('zone_load_multi')
+        if body is None:
+            objs = [self.zone(index) for index in range(self.config.zones)]
+            body = self._bodies['zone_load_multi'] = self._encode(success({'zones': {
+                'has_more': False, 'count': len(objs), 'objs': objs}}))
+        return body
+
+    def client_rec_new(self, params):
+        with self._lock:
+            self._next_id += 1
+            record_id = self._next_id
+        return self._saved_record(params, record_id)
+
+    def client_rec_edit(self, params):
+        return self._saved_record(params, int(params.get('id') or 0))
+
+    def client_rec_delete(self, params):
+        return self._encode(success({}))
+
+    def client_wl(self, params):
+        return self._ip_action(params, 'WL')
+
+    def client_ban(self, params):
+        return self._ip_action(params, 'BAN')
+
+    def client_nul(self, params):
+        return self._ip_action(params, 'NUL')
+
+    def client_ip_lkup(self, params):
+        return self._encode(success({params.get('ip'): 'BAD:0'}))
+
+    def client_stats(self, params):
+        return self._encode(success({'result': {'timeZero': 0, 'timeEnd': 0, 'count': 1, 'has_more': False, 'objs': [{
+            'cachedServerTime': int(time.time() * 1000), 'cachedExpryTime': 0,
+            'trafficBreakdown': {'pageviews': {'regular': 1, 'threat': 0, 'crawler': 0},
+                                 'uniques': {'regular': 1, 'threat': 0, 'crawler': 0}},
+            'bandwidthServed': {'cloudflare': 1.0, 'user': 1.0},
+            'requestsServed': {'cloudflare': 1, 'user': 1}}]}}))
+
+    def host_zone_list(self, params):
+        limit = int(params.get('limit') or 100)
+        offset = int(params.get('offset') or 0)
+        key = ('zone_list', limit, offset)
+        body = self._bodies.get(key)
+        if body is None:
+            zones = [{'zone_id': index, 'zone_name': zone_name(index), 'zone_status': 'V', 'sub_status': 'V',
+                      'sub_id': None, 'sub_label': None, 'user_email': 'user@example.com'}
+                     for index in range(offset, min(offset + limit, self.config.zones))]
+            body = self._bodies[key] = self._encode(success(zones))
+        return body
+
+    def host_user_lookup(self, params):
+        return self._encode(success({
+            'user_exists': True, 'cloudflare_email': params.get('cloudflare_email'), 'user_authed': True,
+            'user_key': '0' * 32, 'unique_id': params.get('unique_id'),
+            'hosted_zones': [zone_name(index) for index in range(self.config.zones)]}))
+
+    def host_zone_lookup(self, params):
+        return self._encode(success({'zone_name': params.get('zone_name'), 'zone_exists': True,
+                                     'zone_hosted': True, 'hosted_cnames': {}, 'forward_tos': {}}))
+
+    def _saved_record(self, params, record_id):
+        zone = params.get('z')
+        record = self.record(zone, record_id)
+        record.update(type=params.get('type'), content=params.get('content'),
+                      name='{0}.{1}'.format(params.get('name'), zone))
+        return self._encode(success({'rec': {'obj': record}}))
+
+    def _ip_action(self, params, action):
+        return self._encode(success({'result': {'ip': params.get('key'), 'action': action}}))
+
+    @staticmethod
+    def _encode(payload):
+        return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def make_server(config, host='127.0.0.1', port=0):
+    """
+    :type config: ServerConfig
+    :return: An HTTP server answering for both APIs, not yet serving
+    :rtype: HTTPServer
+    """
+    api = StandInAPI(config)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # headers and body are written separately; without this, delayed ACKs add ~40ms to every response
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length).decode('utf-8')
+            params = dict((key, values[0]) for key, values in parse_qs(body).items())
+            status, payload = api.handle(urlparse(self.path).path, params)
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json' if status == 200 else 'text/plain')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return _ThreadingHTTPServer((host, port), Handler)
+
+
+def parse_args(argv=None):
+    defaults = ServerConfig()
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0, help='0 picks a free port')
+    for field in ServerConfig.FIELDS:
+        default = getattr(defaults, field)
+        parser.add_argument('--' + field.replace('_', '-'), type=type(default), default=default)
+    args = parser.parse_args(argv)
+    return args, ServerConfig(**dict((field, getattr(args, field)) for field in ServerConfig.FIELDS))
+
+
+def main(argv=None):
+    args, config = parse_args(argv)
+    server = make_server(config, args.host, args.port)
+    # the first line of output tells benchmarks/run.py where to connect
+    sys.stdout.write('http://{0}:{1}/\n'.format(*server.server_address))
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
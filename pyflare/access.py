@@ -0,0 +1,128 @@
+__author__ = 'Joe Linn'
+
+import ipaddress
+import time
+from pyflare.bulk import BulkResult
+from pyflare.cache import MemoryCache
+
+IP_ACTIONS = ('wl', 'ban', 'nul')
+
+# Largest network expand() turns into individual addresses, e.g. a /16 in IPv4
+MAX_EXPANDED_ADDRESSES = 65536
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+
+def expand(ips, max_addresses=MAX_EXPANDED_ADDRESSES):
+    """
+    :param ips: IP addresses and CIDR networks, e.g. "192.0.2.1" or "198.51.100.0/24"
+    :type ips: iterable of str
+    :param max_addresses: Largest number of addresses a single network may expand to
+    :type max_addresses: int
+    :return: Every address, in canonical form, once, in order of first appearance
+    :rtype: list of str
+    """
+    seen = set()
+    addresses = []
+    for ip in ips:
+        network = ipaddress.ip_network(text_type(ip).strip(), strict=False)
+        if network.num_addresses > max_addresses:
+            raise ValueError('{0} has more than {1} addresses'.format(ip, max_addresses))
+        for address in (network if network.num_addresses > 1 else (network.network_address,)):
+            address = str(address)
+            if address not in seen:
+                seen.add(address)
+                addresses.append(address)
+    return addresses
+
+
+def canonical(ip):
+    """
+    :return: The canonical form of an IP address, or the value unchanged if it is not one
+    :rtype: str
+    """
+    try:
+        return str(ipaddress.ip_address(text_type(ip).strip()))
+    except ValueError:
+        return ip
+
+
+class AppliedActions(object):
+    """
+    Bounded record of the access action (wl, ban or nul) last applied to each IP address through a client, so that
+    bulk_ip_action can skip addresses which are already in the requested state. Entries can be given a ttl, after
+    which the action is applied again, in case the lists are also changed elsewhere.
+    """
+
+    def __init__(self, maxsize=100000, ttl=None, clock=time.time):
+        """
+        :param maxsize: Maximum number of addresses to remember. The least recently used one is forgotten first.
+        :type maxsize: int
+        :param ttl: Optional. Seconds to remember an action for
+        :type ttl: float
+        :param clock: Time source, in seconds
+        :type clock: callable
+        """
+        self.ttl = ttl
+        self._cache = MemoryCache(maxsize, clock)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def get(self, ip):
+        """
+        :return: The action last applied to the address, or None
+        :rtype: str
+        """
+        return self._cache.get(ip)
+
+    def record(self, ip, action):
+        self._cache.set(ip, action, self.ttl)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class IPActionResult(BulkResult):
+    """
+    Outcome of bulk_ip_action: the response or exception for every address the action was sent for, in order, and
+    the addresses which were skipped because the action had already been applied to them.
+    """
+
+    def __init__(self, action, ips, results, elapsed, skipped):
+        """
+        :param action: wl, ban or nul
+        :type action: str
+        :param ips: Addresses the action was sent for, in the order of results
+        :type ips: list of str
+        :param skipped: Addresses already in the requested state
+        :type skipped: list of str
+        """
+        super(IPActionResult, self).__init__(results, elapsed)
+        self.action = action
+        self.ips = ips
+        self.skipped = skipped
+        self._positions = dict((ip, index) for index, ip in enumerate(ips))
+
+    def __repr__(self):
+        return '<IPActionResult {0}: {1} ok, {2} failed, {3} skipped>'.format(self.action, self.succeeded, self.failed,
+                                                                             len(self.skipped))
+
+    def status(self, ip):
+        """
+        :param ip: An address which was given to bulk_ip_action
+        :type ip: str
+        :return: The response or exception for the address, or None if it was skipped
+        """
+        index = self._positions.get(canonical(ip))
+        return self.results[index] if index is not None else None
+
+    @property
+    def failed_ips(self):
+        """
+        :rtype: list of str
+        """
+        return [self.ips[index] for index, _ in self.errors]
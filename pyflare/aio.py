@@ -0,0 +1,366 @@
+"""
+asyncio versions of PyflareClient and PyflareHosting. Requires Python 3.6+ and aiohttp 3.3+.
+"""
+__author__ = 'Joe Linn'
+
+import asyncio
+import functools
+from urllib.parse import urlencode
+import aiohttp
+from pyflare import models
+from pyflare import serialization
+from pyflare.client import ClientActions
+from pyflare.coalesce import request_key
+from pyflare.hosting import HostingActions
+from pyflare.instrumentation import RequestEvent, timer
+from pyflare.retry import READ_ACTIONS
+
+
+class AsyncSingleFlight(object):
+    """
+    Coalesces concurrent identical calls made from coroutines on one event loop: while a call for a key is in flight,
+    further callers with the same key await it and receive its result, or its exception, instead of making their own.
+    Cancelling one caller leaves the call running for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, func):
+        """
+        :param key: Identifies calls which are interchangeable
+        :type key: str
+        :param func: Returns an awaitable which makes the call
+        :type func: callable
+        :return: The result of func, shared with every caller which joined the same flight
+        """
+        task = self._calls.get(key)
+        if task is None:
+            # the call runs as its own task, so that no single caller owns it
+            task = self._calls[key] = asyncio.ensure_future(func())
+            task.add_done_callback(functools.partial(self._done, key))
+        # shielded, so that a cancelled caller, the first one included, stops waiting without cancelling the call for
+        # everyone else
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved, as every caller may have been cancelled
+
+
+class AsyncPyflareBase(object):
+    """
+    Connection handling shared by AsyncPyflareClient and AsyncPyflareHosting.
+
+    Requests are sent through a single aiohttp.ClientSession, whose connector pools and reuses connections. The number
+    of requests in flight at any time is bounded by a semaphore, so callers may freely schedule thousands of calls with
+    asyncio.gather() without exhausting sockets.
+    """
+
+    DEFAULT_CONCURRENCY = 100
+
+    def __init__(self, session=None, concurrency=DEFAULT_CONCURRENCY, limit=DEFAULT_CONCURRENCY, limit_per_host=0,
+                 timeout=None, rate_limiter=None, coalesce=False, instrumentation=None, url=None):
+        """
+        :param session: Optional. An aiohttp session to send requests through. Pass the same session to several
+            clients to make them share one connection pool. An injected session is not closed by close().
+        :type session: aiohttp.ClientSession
+        :param concurrency: Maximum number of requests this instance keeps in flight at once
+        :type concurrency: int
+        :param limit: Maximum number of connections in the pool. Ignored if a session is given.
+        :type limit: int
+        :param limit_per_host: Maximum number of connections to a single host, 0 for no limit. Ignored if a session is
+            given.
+        :type limit_per_host: int
+        :param timeout: Optional. Total number of seconds to wait for each request
+        :type timeout: float
+        :param rate_limiter: Optional. Every request waits for this limiter, without blocking the event loop, before
+            being sent.
+        :type rate_limiter: pyflare.ratelimit.RateLimiter
+        :param coalesce: If True, concurrent identical read requests share a single HTTP request and all receive the
+            same response object, which must then be treated as read-only.
+        :type coalesce: bool
+        :param instrumentation: Optional. Notified at the start and end of every call, with its timing, size and
+            error. See :mod:`pyflare.instrumentation`.
+        :type instrumentation: pyflare.instrumentation.Instrumentation
+        :param url: Optional. Endpoint to send requests to instead of CLOUDFLARE_URL, e.g. a local stand-in
+        :type url: str
+        """
+        if url is not None:
+            self.CLOUDFLARE_URL = url
+        self._session = session
+        self._owns_session = session is None
+        self._concurrency = concurrency
+        self._semaphore = None
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._rate_limiter = rate_limiter
+        self._single_flight = AsyncSingleFlight() if coalesce else None
+        self._instrumentation = instrumentation
+
+    def _get_session(self):
+        # aiohttp sessions and semaphores bind to the running loop, so they are created on first use
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self._limit, limit_per_host=self._limit_per_host)
+            self._session = aiohttp.ClientSession(connector=connector)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        return self._session
+
+    async def close(self):
+        """
+        Release all pooled connections held by this instance
+        """
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def __enter__(self):
+        raise TypeError('use "async with" to close the session of an asyncio client')
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def _post(self, data):
+        """
+        Send a request body to Cloudflare over the pooled session
+        :param data: Request body to be sent to Cloudflare
+        :type data: dict
+        :return: Raw response body
+        :rtype: bytes
+        """
+        session = self._get_session()
+        if self._rate_limiter is not None:
+            wait = self._rate_limiter.reserve(data[self.ACTION_KEY])
+            if wait > 0:
+                await asyncio.sleep(wait)
+        async with self._semaphore:
+            async with session.post(self.CLOUDFLARE_URL, data=self._encode(data), timeout=self._timeout) as response:
+                return await response.read()
+
+    async def _send(self, data, parse):
+        """
+        Post a request body and parse the response, joining an identical request already in flight if coalescing is
+        enabled
+        :param data: Request body to be sent to Cloudflare
+        :type data: dict
+        :param parse: Turns the raw response body into the return value, raising APIError for error results
+        :type parse: callable
+        :return: Parsed response
+        """
+        event = None
+        if self._instrumentation is not None:
+            event = RequestEvent(data[self.ACTION_KEY])
+            event.request_bytes = len(urlencode(self._encode(data)))
+            parse = functools.partial(self._measure, event, parse)
+            self._instrumentation.request_started(event)
+        try:
+            if self._single_flight is not None and data[self.ACTION_KEY] in READ_ACTIONS:
+                result = await self._single_flight.do(request_key(data), lambda: self._dispatch(data, parse, event))
+            else:
+                result = await self._dispatch(data, parse, event)
+        except Exception as e:
+            if event is not None:
+                event.finish(e)
+                self._instrumentation.request_finished(event)
+            raise
+        if event is not None:
+            event.finish()
+            self._instrumentation.request_finished(event)
+        return result
+
+    async def _dispatch(self, data, parse, event=None):
+        if event is not None:
+            event.attempts += 1
+        return parse(await self._post(data))
+
+    @staticmethod
+    def _measure(event, parse, body):
+        event.response_bytes += len(body)
+        start = timer()
+        try:
+            return parse(body)
+        finally:
+            event.decode_time += timer() - start
+
+    @staticmethod
+    def _encode(data):
+        # aiohttp only accepts str, int and float form values, while requests silently drops None and stringifies
+        # everything else
+        return dict((key, value if isinstance(value, str) else str(value))
+                    for key, value in data.items() if value is not None)
+
+
+class AsyncPyflareClient(AsyncPyflareBase, ClientActions):
+    """
+    asyncio twin of PyflareClient. Every API action is available with the same arguments and returns an awaitable;
+    rec_load_all is an async generator. The thread-based helpers of PyflareClient, such as bulk_records, fan_out,
+    purge_urls and sync_zone, are not: schedule calls with asyncio.gather() instead. Neither are response caching and
+    streaming.
+    """
+
+    def __init__(self, email, token, **kwargs):
+        """
+        Instantiate an asyncio Pyflare client object
+        :param email: The email address associated with your Cloudflare account
+        :type email: str
+        :param token: The API key associated with your Cloudflare account
+        :type token: str
+        :param kwargs: Connection and request options, see :class:`pyflare.aio.AsyncPyflareBase`
+        """
+        AsyncPyflareBase.__init__(self, **kwargs)
+        self._email = email
+        self._token = token
+
+    async def zone_load_multi(self, typed=False):
+        """
+        Lists all domains in a CloudFlare account, along with other data.
+        :param typed: Optional. If True, zones are returned as compact :class:`pyflare.models.Zone` objects.
+        :type typed: bool
+        :return:
+        :rtype: dict
+        """
+        response = await self._request({
+            'a': 'zone_load_multi'
+        })
+        if typed:
+            response = models.typed_response(response, ('response', 'zones', 'objs'), models.Zone)
+        return response
+
+    async def zone_ips(self, zone, hours=24, ip_class=None, geo=False):
+        """
+        Retrieve IP addresses of recent visitors
+        :param zone: the target domain
+        :type zone: str
+        :param hours: Past number of hours to query. Defaults to 24, maximum is 48.
+        :type hours: int
+        :param ip_class: Optional. Restrict the result set to a given class as given by:
+            "r" -- regular
+            "s" -- crawler
+            "t" -- threat
+        :type ip_class: str
+        :param geo: Optional. Set to True to add longitude and latitude information to response
+        :type geo: bool
+        :return:
+        :rtype: dict
+        """
+        params = {
+            'a': 'zone_ips',
+            'z': zone,
+            'hours': hours,
+            'class': ip_class,
+        }
+        if geo:
+            params['geo'] = geo
+        return await self._request(params)
+
+    async def zone_settings(self, zone, typed=False):
+        """
+        Retrieves all current settings for a given domain.
+        :param zone: the target domain
+        :type zone: str
+        :param typed: Optional. If True, settings are returned as compact :class:`pyflare.models.ZoneSettings` objects.
+        :type typed: bool
+        :return:
+        :rtype: dict
+        """
+        response = await self._request({
+            'a': 'zone_settings',
+            'z': zone
+        })
+        if typed:
+            response = models.typed_response(response, ('response', 'result', 'objs'), models.ZoneSettings)
+        return response
+
+    async def rec_load_all(self, zone, typed=False):
+        """
+        Lists all DNS records for the given domain
+        :param zone: the domain for which records are being retrieved
+        :type zone: str
+        :param typed: Optional. If True, records are returned as compact :class:`pyflare.models.DnsRecord` objects.
+        :type typed: bool
+        :return:
+        :rtype: async generator
+        """
+        has_more = True
+        current_count = 0
+        while has_more:
+            records = await self._request({
+                'a': 'rec_load_all',
+                'o': current_count,
+                'z': zone
+            })
+            try:
+                has_more = records['response']['recs']['has_more']
+                current_count += records['response']['recs']['count']
+                for record in records['response']['recs']['objs']:
+                    yield models.DnsRecord(record) if typed else record
+            except KeyError:
+                has_more = False
+
+    async def _request(self, data):
+        """
+
+        :param data: Request body to be sent to Cloudflare
+        :type data: dict
+        :return: Response from Cloudflare
+        :rtype: dict
+        """
+        data['tkn'] = self._token
+        data['email'] = self._email
+        return await self._send(data, self._parse_body)
+
+    def _parse_body(self, body):
+        """
+        :param body: Raw response body returned from Cloudflare
+        :type body: bytes
+        :return: deserialized json response, raising APIError for error results
+        :rtype: dict
+        """
+        return serialization.parse(body)
+
+
+class AsyncPyflareHosting(AsyncPyflareBase, HostingActions):
+    """
+    asyncio twin of PyflareHosting. Every API action is available with the same arguments and returns an awaitable.
+    iter_zones is not; page through zone_list instead.
+    """
+
+    def __init__(self, host_key, **kwargs):
+        """
+        Instantiate an asyncio Pyflare hosting object
+        :param host_key: The host_key associated with your Cloudflare account
+        :type host_key: str
+        :param kwargs: Connection and request options, see :class:`pyflare.aio.AsyncPyflareBase`
+        """
+        AsyncPyflareBase.__init__(self, **kwargs)
+        self._host_key = host_key
+
+    async def _request(self, data):
+        """
+
+        :param data: Request body to be sent to Cloudflare
+        :type data: dict
+        :return: Response from Cloudflare
+        :rtype: dict
+        """
+        data['host_key'] = self._host_key
+        return await self._send(data, self._parse_body)
+
+    def _parse_body(self, body):
+        """
+        :param body: Raw response body returned from Cloudflare
+        :type body: bytes
+        :return: deserialized json response, raising APIError for error results
+        :rtype: dict
+        """
+        return serialization.parse(body)
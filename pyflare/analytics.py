@@ -0,0 +1,237 @@
+__author__ = 'Joe Linn'
+
+import heapq
+import math
+from collections import defaultdict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Columns holding repeated labels, which are stored as integer codes into a table of distinct values
+CATEGORICAL_COLUMNS = ('zone', 'window', 'ip', 'classification')
+NUMERIC_COLUMNS = ('hits', 'latitude', 'longitude')
+COLUMNS = CATEGORICAL_COLUMNS + NUMERIC_COLUMNS
+
+
+class VisitorTable(object):
+    """
+    Columnar table of zone_ips entries, for aggregating visitor data across many zones and hour windows.
+
+    Labels (zone, window, ip and classification) are dictionary-encoded as integer codes and every column is held in
+    one array, so aggregations are a handful of vectorized operations when NumPy is installed. Without NumPy the same
+    operations fall back to plain Python. Entries can be added at any time; arrays are rebuilt on the next query.
+    """
+
+    def __init__(self):
+        self._values = dict((column, []) for column in CATEGORICAL_COLUMNS)
+        self._codes = dict((column, {}) for column in CATEGORICAL_COLUMNS)
+        self._columns = dict((column, []) for column in COLUMNS)
+        self._pending = dict((column, []) for column in COLUMNS)
+        self.errors = {}
+
+    def __len__(self):
+        return len(self._columns['hits']) + len(self._pending['hits'])
+
+    @classmethod
+    def from_zones(cls, client, zones=None, hours=24, ip_class=None, concurrency=8):
+        """
+        Fetch zone_ips, with geo information, for many zones concurrently. Zones which fail are recorded in errors.
+        :param client: client to fetch through
+        :type client: pyflare.PyflareClient
+        :param zones: Optional. Domain names. Defaults to all zones in the account.
+        :type zones: iterable of str
+        :param hours: Past number of hours to query, also used as the window of every entry
+        :type hours: int
+        :param ip_class: Optional. Restrict the entries to a class, see zone_ips
+        :type ip_class: str
+        :param concurrency: Number of requests to keep in flight
+        :type concurrency: int
+        :rtype: VisitorTable
+        """
+        table = cls()
+        for zone, response in client.fan_out('zone_ips', zones, concurrency, hours=hours, ip_class=ip_class,
+                                             geo=True):
+            if isinstance(response, Exception):
+                table.errors[zone] = response
+            else:
+                table.add(response, zone, hours)
+        return table
+
+    def add(self, ips, zone=None, window=None):
+        """
+        :param ips: A zone_ips response, or its list of entries
+        :type ips: dict or iterable of dict
+        :param zone: Optional. Zone of the entries, if they do not carry a zone_name
+        :type zone: str
+        :param window: Optional. Label of the time window the entries cover, e.g. an hour
+        """
+        if isinstance(ips, dict):
+            ips = ips['response']['ips']
+        pending = self._pending
+        for entry in ips:
+            pending['zone'].append(self._encode('zone', entry.get('zone_name', zone)))
+            pending['window'].append(self._encode('window', window))
+            pending['ip'].append(self._encode('ip', entry.get('ip')))
+            pending['classification'].append(self._encode('classification', entry.get('classification')))
+            pending['hits'].append(entry.get('hits') or 0)
+            for column in ('latitude', 'longitude'):
+                value = entry.get(column)
+                pending[column].append(float(value) if value is not None else float('nan'))
+
+    def select(self, **criteria):
+        """
+        :param criteria: column=value pairs, e.g. classification='threat', zone='example.com'
+        :return: A new table holding only the matching entries
+        :rtype: VisitorTable
+        """
+        columns = self._frozen()
+        matches = None
+        for column, value in criteria.items():
+            if column not in CATEGORICAL_COLUMNS:
+                raise ValueError('can only select on {0}'.format(', '.join(CATEGORICAL_COLUMNS)))
+            code = self._codes[column].get(value, -1)
+            if numpy is not None:
+                match = columns[column] == code
+                matches = match if matches is None else matches & match
+            else:
+                match = set(index for index, entry_code in enumerate(columns[column]) if entry_code == code)
+                matches = match if matches is None else matches & match
+
+        selected = VisitorTable()
+        selected._values = self._values
+        selected._codes = self._codes
+        for column in COLUMNS:
+            if matches is None:
+                selected._columns[column] = columns[column]
+            elif numpy is not None:
+                selected._columns[column] = columns[column][matches]
+            else:
+                selected._columns[column] = [columns[column][index] for index in sorted(matches)]
+        return selected
+
+    def group_by(self, *columns):
+        """
+        :param columns: Names of label columns to group on, e.g. 'zone', 'classification'
+        :return: Total hits by distinct combination of values of the columns
+        :rtype: dict
+        """
+        for column in columns:
+            if column not in CATEGORICAL_COLUMNS:
+                raise ValueError('can only group by {0}'.format(', '.join(CATEGORICAL_COLUMNS)))
+        data = self._frozen()
+        keys, totals = _sum_by([data[column] for column in columns], data['hits'])
+        return dict((tuple(self._values[column][code] for column, code in zip(columns, key)), total)
+                    for key, total in zip(keys, totals))
+
+    def totals(self, column):
+        """
+        :param column: Name of a label column, e.g. 'classification'
+        :return: Total hits by value of the column
+        :rtype: dict
+        """
+        return dict((key[0], total) for key, total in self.group_by(column).items())
+
+    def classification_totals(self):
+        """
+        :return: Total hits by classification (regular, crawler or threat)
+        :rtype: dict
+        """
+        return self.totals('classification')
+
+    def top(self, k, by='ip'):
+        """
+        :param k: Number of values to return
+        :type k: int
+        :param by: Name of a label column
+        :type by: str
+        :return: The k values of the column with the most hits, most first, with their total hits
+        :rtype: list of tuple
+        """
+        if by not in CATEGORICAL_COLUMNS:
+            raise ValueError('can only rank by {0}'.format(', '.join(CATEGORICAL_COLUMNS)))
+        data = self._frozen()
+        keys, totals = _sum_by([data[by]], data['hits'])
+        if numpy is not None and len(totals) > k:
+            candidates = numpy.argpartition(-totals, k - 1)[:k] if k > 0 else []
+        else:
+            candidates = range(len(totals))
+        ranked = heapq.nlargest(k, ((int(totals[index]), keys[index][0]) for index in candidates),
+                                key=lambda item: item[0])
+        return [(self._values[by][code], total) for total, code in ranked]
+
+    def geo_bins(self, size=1.0):
+        """
+        :param size: Width and height of a bin, in degrees
+        :type size: float
+        :return: Total hits by bin, keyed by the (latitude, longitude) of the bin's south-west corner. Entries without
+            coordinates are left out.
+        :rtype: dict
+        """
+        data = self._frozen()
+        if numpy is not None:
+            located = ~(numpy.isnan(data['latitude']) | numpy.isnan(data['longitude']))
+            latitude = numpy.floor(data['latitude'][located] / size).astype(numpy.int64)
+            longitude = numpy.floor(data['longitude'][located] / size).astype(numpy.int64)
+            hits = data['hits'][located]
+        else:
+            located = [index for index, (lat, lon) in enumerate(zip(data['latitude'], data['longitude']))
+                       if not (math.isnan(lat) or math.isnan(lon))]
+            latitude = [int(math.floor(data['latitude'][index] / size)) for index in located]
+            longitude = [int(math.floor(data['longitude'][index] / size)) for index in located]
+            hits = [data['hits'][index] for index in located]
+        keys, totals = _sum_by([latitude, longitude], hits)
+        return dict(((lat * size, lon * size), total) for (lat, lon), total in zip(keys, totals))
+
+    def _encode(self, column, value):
+        codes = self._codes[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self._values[column])
+            self._values[column].append(value)
+        return code
+
+    def _frozen(self):
+        for column in COLUMNS:
+            pending = self._pending[column]
+            if numpy is not None:
+                if pending or not isinstance(self._columns[column], numpy.ndarray):
+                    dtype = numpy.float64 if column in ('latitude', 'longitude') else numpy.int64
+                    self._columns[column] = numpy.concatenate([numpy.asarray(self._columns[column], dtype=dtype),
+                                                               numpy.asarray(pending, dtype=dtype)])
+            elif pending:
+                self._columns[column] = self._columns[column] + pending
+            self._pending[column] = []
+        return self._columns
+
+
+def _sum_by(keys, hits):
+    """
+    :param keys: Equally long columns of integers to group on
+    :type keys: list
+    :param hits: Values to sum
+    :return: The distinct key tuples and the sum of hits for each
+    :rtype: tuple
+    """
+    if numpy is not None:
+        if len(hits) == 0:
+            return [], numpy.zeros(0, dtype=numpy.int64)
+        # combine the key columns into one integer per entry (mixed radix), so grouping is a 1-d operation
+        offsets = [int(column.min()) for column in keys]
+        radixes = [int(column.max()) - offset + 1 for column, offset in zip(keys, offsets)]
+        combined = numpy.zeros(len(hits), dtype=numpy.int64)
+        for column, offset, radix in zip(keys, offsets, radixes):
+            combined = combined * radix + (column - offset)
+        unique, inverse = numpy.unique(combined, return_inverse=True)
+        totals = numpy.bincount(inverse.reshape(-1), weights=hits, minlength=len(unique)).astype(numpy.int64)
+        parts = []
+        for offset, radix in reversed(list(zip(offsets, radixes))):
+            parts.append(unique % radix + offset)
+            unique = unique // radix
+        return list(zip(*[part.tolist() for part in reversed(parts)])), totals
+
+    totals = defaultdict(int)
+    for key, value in zip(zip(*keys), hits):
+        totals[key] += value
+    return list(totals.keys()), list(totals.values())
@@ -0,0 +1,167 @@
+__author__ = 'Joe Linn'
+
+import functools
+from pyflare.coalesce import SingleFlight, request_key
+from pyflare.instrumentation import RequestEvent, timer
+from pyflare.models import string_types
+from pyflare.retry import READ_ACTIONS
+from pyflare import transport as transports
+
+
+class PyflareBase(object):
+    """
+    Connection handling shared by PyflareClient and PyflareHosting.
+
+    Unless another transport is chosen, each instance owns a pooled, keep-alive requests.Session, so consecutive calls
+    reuse TCP connections and TLS sessions instead of performing a fresh handshake for every request. The underlying
+    urllib3 pools are thread-safe, so a single instance may be shared between threads.
+    """
+
+    CLOUDFLARE_URL = None
+    ACTION_KEY = None
+
+    DEFAULT_POOL_CONNECTIONS = 10
+    DEFAULT_POOL_MAXSIZE = 10
+
+    def __init__(self, session=None, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 pool_block=False, timeout=None, rate_limiter=None, retry=None, coalesce=False, instrumentation=None,
+                 transport=None, url=None):
+        """
+        :param session: Optional. A pre-configured session to send requests through. An injected session is not
+            closed by close().
+        :type session: requests.Session
+        :param pool_connections: Number of per-host connection pools to keep
+        :type pool_connections: int
+        :param pool_maxsize: Maximum number of connections kept open to a single host
+        :type pool_maxsize: int
+        :param pool_block: If True, wait for a free connection once pool_maxsize connections are in use instead of
+            opening a throwaway one
+        :type pool_block: bool
+        :param timeout: Optional. Seconds to wait for the server, either a single value or a (connect, read) tuple
+        :type timeout: float or tuple
+        :param rate_limiter: Optional. Every request waits for this limiter before being sent. Share one limiter
+            between instances to make them draw from the same budget.
+        :type rate_limiter: pyflare.ratelimit.RateLimiter
+        :param retry: Optional. Policy for retrying failed requests. Requests are not retried by default.
+        :type retry: pyflare.retry.RetryPolicy
+        :param coalesce: If True, concurrent identical read requests from different threads share a single HTTP
+            request and all receive the same response object, which must then be treated as read-only.
+        :type coalesce: bool
+        :param instrumentation: Optional. Notified at the start and end of every call, with its timing, size, retries
+            and error. See :mod:`pyflare.instrumentation`.
+        :type instrumentation: pyflare.instrumentation.Instrumentation
+        :param transport: Optional. Sends the requests: the name of a built-in transport (requests, urllib3 or httpx),
+            which is created with the pool arguments, or a :class:`pyflare.transport.Transport`, in which case those
+            are ignored. Defaults to requests. The transport is closed by close().
+        :type transport: str or pyflare.transport.Transport
+        :param url: Optional. Endpoint to send requests to instead of CLOUDFLARE_URL, e.g. a local stand-in
+        :type url: str
+        """
+        if transport is None or isinstance(transport, string_types):
+            transport = transports.create(transport or 'requests', session, pool_connections, pool_maxsize,
+                                          pool_block)
+        if url is not None:
+            self.CLOUDFLARE_URL = url
+        self._transport = transport
+        self._session = getattr(transport, 'session', None)
+        self._timeout = timeout
+        self._rate_limiter = rate_limiter
+        self._retry = retry
+        self._single_flight = SingleFlight() if coalesce else None
+        self._instrumentation = instrumentation
+
+    def close(self):
+        """
+        Release all pooled connections held by this instance
+        """
+        self._transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _post(self, data, **kwargs):
+        """
+        Send a request body to Cloudflare through the transport
+        :param data: Request body to be sent to Cloudflare
+        :type data: dict
+        :return:
+        :rtype: requests.Response
+        """
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire(data[self.ACTION_KEY])
+        return self._transport.post(self.CLOUDFLARE_URL, data, timeout=self._timeout, **kwargs)
+
+    def _send(self, data, parse, **kwargs):
+        """
+        Post a request body and parse the response, joining an identical request already in flight if coalescing is
+        enabled and retrying according to the retry policy. Streamed requests are never coalesced, as their response
+        can only be consumed once.
+        :param data: Request body to be sent to Cloudflare
+        :type data: dict
+        :param parse: Turns a requests.Response into the return value, raising APIError for error results
+        :type parse: callable
+        :return: Parsed response
+        """
+        event = None
+        if self._instrumentation is not None:
+            event = RequestEvent(data[self.ACTION_KEY])
+            parse = functools.partial(self._measure, event, parse, kwargs.get('stream', False))
+            self._instrumentation.request_started(event)
+        try:
+            if self._single_flight is not None and data[self.ACTION_KEY] in READ_ACTIONS and not kwargs.get('stream'):
+                result = self._single_flight.do(request_key(data), lambda: self._dispatch(data, parse, event, **kwargs))
+            else:
+                result = self._dispatch(data, parse, event, **kwargs)
+        except Exception as e:
+            if event is not None:
+                event.finish(e)
+                self._instrumentation.request_finished(event)
+            raise
+        if event is not None:
+            if kwargs.get('stream'):
+                # the body is read as the stream is consumed, so the call ends when the stream does
+                result.on_close = functools.partial(self._finish_stream, event)
+            else:
+                event.finish()
+                self._instrumentation.request_finished(event)
+        return result
+
+    def _finish_stream(self, event, stream, error):
+        event.decode_time += stream.read_time
+        event.finish(error)
+        self._instrumentation.request_finished(event)
+
+    def _dispatch(self, data, parse, event=None, **kwargs):
+        if self._retry is None:
+            if event is not None:
+                event.attempts += 1
+            return parse(self._post(data, **kwargs))
+
+        def attempt():
+            if event is not None:
+                event.attempts += 1
+            response = self._post(data, **kwargs)
+            if response.status_code in self._retry.status_forcelist:
+                response.raise_for_status()
+            return parse(response)
+        return self._retry.call(data[self.ACTION_KEY], attempt)
+
+    @staticmethod
+    def _measure(event, parse, stream, response):
+        event.status_code = response.status_code
+        request = getattr(response, 'request', None)
+        body = request.body if request is not None else None
+        event.request_bytes += len(body) if body else 0
+        length = response.headers.get('Content-Length')
+        if length is not None:
+            event.response_bytes += int(length)
+        elif not stream:
+            event.response_bytes += len(response.content)
+        start = timer()
+        try:
+            return parse(response)
+        finally:
+            event.decode_time += timer() - start
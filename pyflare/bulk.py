@@ -0,0 +1,183 @@
+__author__ = 'Joe Linn'
+
+import itertools
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests.exceptions import RequestException
+from pyflare import APIError
+
+# Failures of an individual call which are recorded in its result slot instead of aborting the batch
+CAPTURED_ERRORS = (APIError, RequestException)
+
+
+class BulkResult(object):
+    """
+    Ordered outcome of a batch of API calls. Each item is either the response of the corresponding call or the
+    exception it raised.
+    """
+
+    def __init__(self, results, elapsed):
+        """
+        :param results: Responses and exceptions, in the order the calls were given
+        :type results: list
+        :param elapsed: Wall-clock seconds taken by the whole batch
+        :type elapsed: float
+        """
+        self.results = results
+        self.elapsed = elapsed
+
+    def __len__(self):
+        return len(self.results)
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __getitem__(self, index):
+        return self.results[index]
+
+    def __repr__(self):
+        return '<BulkResult {0} ok, {1} failed, {2:.1f} ops/s>'.format(self.succeeded, self.failed, self.throughput)
+
+    @property
+    def errors(self):
+        """
+        :return: (index, exception) for every failed call
+        :rtype: list of tuple
+        """
+        return [(index, result) for index, result in enumerate(self.results) if isinstance(result, Exception)]
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    @property
+    def succeeded(self):
+        return len(self.results) - self.failed
+
+    @property
+    def throughput(self):
+        """
+        :return: Calls completed per second
+        :rtype: float
+        """
+        return len(self.results) / self.elapsed if self.elapsed else 0.0
+
+
+def _capture(call):
+    try:
+        return call()
+    except CAPTURED_ERRORS as e:
+        return e
+
+
+def run(calls, concurrency):
+    """
+    Execute calls on a pool of worker threads
+    :param calls: Zero-argument callables
+    :type calls: list of callable
+    :param concurrency: Number of worker threads
+    :type concurrency: int
+    :return:
+    :rtype: BulkResult
+    """
+    if concurrency < 1:
+        raise ValueError('concurrency must be at least 1')
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(_capture, calls))
+    return BulkResult(results, time.time() - start)
+
+
+def run_unordered(calls, concurrency):
+    """
+    Execute calls on a pool of worker threads, yielding each outcome as soon as it is available. Calls are submitted
+    only as workers free up, so calls may be a lazy iterable of any length.
+    :param calls: (key, zero-argument callable) pairs
+    :type calls: iterable of tuple
+    :param concurrency: Number of worker threads
+    :type concurrency: int
+    :return: (key, response or exception) pairs, in order of completion
+    :rtype: generator
+    """
+    if concurrency < 1:
+        raise ValueError('concurrency must be at least 1')
+    calls = iter(calls)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = {}
+        for key, call in itertools.islice(calls, concurrency):
+            pending[executor.submit(_capture, call)] = key
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                for next_key, call in itertools.islice(calls, 1):
+                    pending[executor.submit(_capture, call)] = next_key
+                yield key, future.result()
+
+
+def run_fair(queues, concurrency, per_queue=None):
+    """
+    Execute calls from several queues on a pool of worker threads, taking turns between the queues whenever a worker
+    frees up, so that a long queue cannot hold back the others. Calls are pulled from each queue only as they are
+    submitted, so queues may be lazy iterables of any length.
+    :param queues: (name, calls) pairs, where calls are (key, zero-argument callable) pairs
+    :type queues: iterable of tuple
+    :param concurrency: Number of worker threads
+    :type concurrency: int
+    :param per_queue: Optional. Maximum number of calls of a single queue in flight at once. Defaults to concurrency.
+    :type per_queue: int
+    :return: (name, key, response or exception) triples, in order of completion
+    :rtype: generator
+    """
+    if concurrency < 1:
+        raise ValueError('concurrency must be at least 1')
+    if per_queue is not None and per_queue < 1:
+        raise ValueError('per_queue must be at least 1')
+    robin = _RoundRobin(queues, per_queue or concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = {}
+
+        def fill():
+            while len(pending) < concurrency:
+                task = robin.take()
+                if task is None:
+                    return
+                name, key, call = task
+                pending[executor.submit(_capture, call)] = name, key
+
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, key = pending.pop(future)
+                robin.done(name)
+                yield name, key, future.result()
+            fill()
+
+
+class _RoundRobin(object):
+    def __init__(self, queues, per_queue):
+        self._ring = deque((name, iter(calls)) for name, calls in queues)
+        self._per_queue = per_queue
+        self._in_flight = Counter()
+
+    def take(self):
+        # next call of the first queue, starting after the one served last, which has calls left and is below its
+        # limit; None if there is none
+        for _ in range(len(self._ring)):
+            name, calls = self._ring[0]
+            if self._in_flight[name] >= self._per_queue:
+                self._ring.rotate(-1)
+                continue
+            item = next(calls, None)
+            if item is None:
+                self._ring.popleft()
+                continue
+            self._ring.rotate(-1)
+            self._in_flight[name] += 1
+            return (name,) + tuple(item)
+        return None
+
+    def done(self, name):
+        self._in_flight[name] -= 1
@@ -0,0 +1,252 @@
+__author__ = 'Joe Linn'
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Seconds for which responses to each read action are reused
+DEFAULT_TTLS = {
+    'stats': 60,
+    'zone_load_multi': 60,
+    'zone_settings': 60,
+    'zone_check': 300,
+}
+
+# Actions which change the state of the zone given in "z"
+WRITE_ACTIONS = frozenset([
+    'sec_lvl', 'cache_lvl', 'devmode', 'fpurge_ts', 'ipv46', 'async', 'minify', 'mirage2',
+    'rec_new', 'rec_edit', 'rec_delete',
+])
+
+CREDENTIAL_PARAMS = frozenset(['tkn', 'email', 'host_key'])
+
+
+class MemoryCache(object):
+    """
+    Thread-safe in-memory LRU cache with per-entry expiry
+    """
+
+    def __init__(self, maxsize=1024, clock=time.time):
+        """
+        :param maxsize: Maximum number of entries. The least recently used entry is evicted first.
+        :type maxsize: int
+        :param clock: Time source, in seconds
+        :type clock: callable
+        """
+        self.maxsize = maxsize
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        :return: The cached value, or None if it is missing or has expired
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires <= self._clock():
+                return None
+            self._entries[key] = entry  # re-insert as most recently used
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        :param ttl: Seconds until the entry expires, or None to keep it until it is evicted
+        :type ttl: float
+        """
+        expires = self._clock() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileCache(object):
+    """
+    On-disk cache storing one JSON file per entry, so that it survives restarts and can be shared between processes.
+    Entries are written atomically. Reads refresh an entry's modification time, which is used to evict the least
+    recently used entries once there are more than maxsize.
+    """
+
+    SUFFIX = '.json'
+
+    def __init__(self, directory, maxsize=4096, clock=time.time):
+        """
+        :param directory: Directory holding the cache files. Created if it does not exist.
+        :type directory: str
+        :param maxsize: Maximum number of entries
+        :type maxsize: int
+        :param clock: Time source, in seconds
+        :type clock: callable
+        """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.maxsize = maxsize
+        self._clock = clock
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires, value = json.loads(f.read().decode('utf-8'))
+        except (IOError, OSError, ValueError):
+            return None
+        if expires is not None and expires <= self._clock():
+            self._remove(path)
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires = self._clock() + ttl if ttl is not None else None
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json.dumps([expires, value]).encode('utf-8'))
+        os.rename(temp_path, self._path(key))
+        self._evict()
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(self.SUFFIX):
+                self._remove(os.path.join(self.directory, name))
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + self.SUFFIX)
+
+    def _evict(self):
+        names = [name for name in os.listdir(self.directory) if name.endswith(self.SUFFIX)]
+        if len(names) <= self.maxsize:
+            return
+        entries = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        entries.sort()
+        for _, path in entries[:len(entries) - self.maxsize]:
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class ResponseCache(object):
+    """
+    Read-through cache of API responses.
+
+    Responses are keyed on the request parameters without credentials, within a namespace (the account's email
+    address) so that one backend can be shared between accounts. Each zone has a generation token which is part of
+    the key of every cached response for that zone; a write to the zone replaces the token, which makes all entries
+    cached for it unreachable at once, whichever backend they live in. Account-wide responses such as zone_load_multi
+    share a separate token which is replaced on every write.
+
+    Cached responses are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, backend=None, ttls=None):
+        """
+        :param backend: Optional. Storage for cached responses: any object with get(key), set(key, value, ttl) and
+            delete(key) methods, e.g. MemoryCache or FileCache. Defaults to a MemoryCache.
+        :type backend: MemoryCache or FileCache
+        :param ttls: Optional. Seconds to keep responses for, by action. Only actions listed here are cached.
+            Defaults to DEFAULT_TTLS.
+        :type ttls: dict
+        """
+        self.backend = backend if backend is not None else MemoryCache()
+        self.ttls = dict(ttls if ttls is not None else DEFAULT_TTLS)
+
+    def get(self, action, data, namespace='', key=None):
+        """
+        :param action: The action being requested
+        :type action: str
+        :param data: Request body
+        :type data: dict
+        :param namespace: Account the request is made for
+        :type namespace: str
+        :param key: Optional. The request's key, as returned by key(), if it has already been computed
+        :type key: str
+        :return: The cached response, or None if there is none or the action is not cacheable
+        :rtype: dict
+        """
+        if action not in self.ttls:
+            return None
+        return self.backend.get(key if key is not None else self.key(data, namespace))
+
+    def set(self, action, data, response, namespace='', key=None):
+        """
+        Store the response to a request if its action is cacheable
+        :param key: Optional. The key computed before the request was sent. A write to the zone which completed in
+            the meantime has replaced the generation in this key, so a response that may predate the write is stored
+            where no later lookup finds it, rather than under the new generation.
+        :type key: str
+        """
+        ttl = self.ttls.get(action)
+        if ttl:
+            self.backend.set(key if key is not None else self.key(data, namespace), response, ttl)
+
+    def invalidate(self, zone, namespace=''):
+        """
+        Drop every cached response for the given zone, as well as account-wide responses
+        :param zone: domain name
+        :type zone: str
+        """
+        for scope in (zone, None):
+            self.backend.set(self._generation_key(scope, namespace), uuid.uuid4().hex)
+
+    def key(self, data, namespace=''):
+        """
+        :param data: Request body
+        :type data: dict
+        :param namespace: Account the request is made for
+        :type namespace: str
+        :return: Cache key of the request
+        :rtype: str
+        """
+        params = dict((name, value) for name, value in data.items() if name not in CREDENTIAL_PARAMS)
+        return json.dumps([namespace, self._generation(data.get('z'), namespace), params], sort_keys=True)
+
+    def _generation(self, zone, namespace):
+        key = self._generation_key(zone, namespace)
+        generation = self.backend.get(key)
+        if generation is None:
+            # A missing token may have been evicted, so a fresh one is needed to avoid resurrecting stale entries
+            generation = uuid.uuid4().hex
+            self.backend.set(key, generation)
+        return generation
+
+    @staticmethod
+    def _generation_key(zone, namespace):
+        return json.dumps(['generation', namespace, zone])
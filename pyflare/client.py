@@ -1,25 +1,28 @@
 __author__ = 'Joe Linn'
 
-import requests
-import json
-from requests.exceptions import HTTPError
-from pyflare import APIError
-
-
-class PyflareClient(object):
+import functools
+import time
+import weakref
+from pyflare import access
+from pyflare import bulk
+from pyflare import models
+from pyflare import paging
+from pyflare import purge
+from pyflare import serialization
+from pyflare import streaming
+from pyflare import sync
+from pyflare.base import PyflareBase
+from pyflare.cache import WRITE_ACTIONS
+
+
+class ClientActions(object):
+    """
+    Client API actions which only build a request body and return the response of _request unchanged, shared by
+    PyflareClient and :class:`pyflare.aio.AsyncPyflareClient`, whose _request returns an awaitable instead.
+    """
 
     CLOUDFLARE_URL = 'https://www.cloudflare.com/api_json.html'
-
-    def __init__(self, email, token):
-        """
-        Instantiate a Pyflare client object
-        :param email: The email address associated with your Cloudflare account
-        :type email: str
-        :param token: The API key associated with your Cloudflare account
-        :type token: str
-        """
-        self._email = email
-        self._token = token
+    ACTION_KEY = 'a'
 
     def stats(self, zone, interval):
         """
@@ -45,40 +48,6 @@ class PyflareClient(object):
             'interval': interval
         })
 
-    def zone_load_multi(self):
-        """
-        Lists all domains in a CloudFlare account, along with other data.
-        :return:
-        :rtype: dict
-        """
-        return self._request({
-            'a': 'zone_load_multi'
-        })
-
-    def rec_load_all(self, zone):
-        """
-        Lists all DNS records for the given domain
-        :param zone: the domain for which records are being retrieved
-        :type zone: str
-        :return:
-        :rtype: generator
-        """
-        has_more = True
-        current_count = 0
-        while has_more:
-            records = self._request({
-                'a': 'rec_load_all',
-                'o': current_count,
-                'z': zone
-            })
-            try:
-                has_more = records['response']['recs']['has_more']
-                current_count += records['response']['recs']['count']
-                for record in records['response']['recs']['objs']:
-                    yield record
-            except KeyError:
-                has_more = False
-
     def zone_check(self, zones):
         """
         Checks for active zones and returns their corresponding zids
@@ -92,33 +61,6 @@ class PyflareClient(object):
             'zones': ','.join(zones)
         })
 
-    def zone_ips(self, zone, hours=24, ip_class=None, geo=False):
-        """
-        Retrieve IP addresses of recent visitors
-        :param zone: the target domain
-        :type zone: str
-        :param hours: Past number of hours to query. Defaults to 24, maximum is 48.
-        :type hours: int
-        :param ip_class: Optional. Restrict the result set to a given class as given by:
-            "r" -- regular
-            "s" -- crawler
-            "t" -- threat
-        :type ip_class: str
-        :param geo: Optional. Set to True to add longitude and latitude information to response
-        :type geo: bool
-        :return:
-        :rtype: dict
-        """
-        params = {
-            'a': 'zone_ips',
-            'z': zone,
-            'hours': hours,
-            'class': ip_class,
-        }
-        if geo:
-            params['geo'] = geo
-        return self._request(params)
-
     def ip_lkup(self, ip):
         """
         Find the current threat score for a given IP. Note that scores are on a logarithmic scale, where a higher score
@@ -133,19 +75,6 @@ class PyflareClient(object):
             'ip': ip
         })
 
-    def zone_settings(self, zone):
-        """
-        Retrieves all current settings for a given domain.
-        :param zone: the target domain
-        :type zone: str
-        :return:
-        :rtype: dict
-        """
-        return self._request({
-            'a': 'zone_settings',
-            'z': zone
-        })
-
     def sec_lvl(self, zone, level):
         """
         Set the security level for the given zone
@@ -304,9 +233,10 @@ class PyflareClient(object):
             'v': int(enable)
         })
 
-    def async(self, zone, setting):
+    def rocket_loader(self, zone, setting):
         """
-        Changes Rocket Loader setting
+        Changes Rocket Loader setting, with the API's async action. Also available as async() on Python versions where
+        that is not a reserved word.
         :param zone: domain name
         :type zone: str
         :param setting: [0 = off, a = automatic, m = manual]
@@ -495,6 +425,309 @@ class PyflareClient(object):
             'id': record_id
         })
 
+
+# async became a reserved word in Python 3.7; the old name stays reachable through getattr
+setattr(ClientActions, 'async', vars(ClientActions)['rocket_loader'])
+
+
+class PyflareClient(ClientActions, PyflareBase):
+
+    BULK_RECORD_ACTIONS = ('rec_new', 'rec_edit', 'rec_delete')
+    FAN_OUT_ACTIONS = ('stats', 'rec_load_all', 'zone_ips', 'zone_settings', 'sec_lvl', 'cache_lvl', 'devmode',
+                       'fpurge_ts', 'ipv46', 'rocket_loader', 'async', 'minify', 'mirage2')
+
+    def __init__(self, email, token, cache=None, applied_ip_actions=None, **kwargs):
+        """
+        Instantiate a Pyflare client object
+        :param email: The email address associated with your Cloudflare account
+        :type email: str
+        :param token: The API key associated with your Cloudflare account
+        :type token: str
+        :param cache: Optional. Cache for responses to read-only actions. Writes through this client invalidate the
+            affected zone's entries.
+        :type cache: pyflare.cache.ResponseCache
+        :param applied_ip_actions: Optional. Record of the wl, ban and nul actions applied through this client, which
+            bulk_ip_action consults to skip addresses already in the requested state. Defaults to remembering up to
+            100000 addresses without expiry.
+        :type applied_ip_actions: pyflare.access.AppliedActions
+        :param kwargs: Connection and request options, see :class:`pyflare.base.PyflareBase`
+        """
+        super(PyflareClient, self).__init__(**kwargs)
+        self._email = email
+        self._token = token
+        self._cache = cache
+        self._record_listeners = weakref.WeakSet()
+        self._purge_cooldowns = {}
+        self.applied_ip_actions = applied_ip_actions if applied_ip_actions is not None else access.AppliedActions()
+
+    def zone_load_multi(self, typed=False, stream=False):
+        """
+        Lists all domains in a CloudFlare account, along with other data.
+        :param typed: Optional. If True, zones are returned as compact :class:`pyflare.models.Zone` objects.
+        :type typed: bool
+        :param stream: Optional. If True, return an iterator over the zones, which are parsed one at a time as the
+            response arrives. See :class:`pyflare.streaming.ItemStream`.
+        :type stream: bool
+        :return:
+        :rtype: dict
+        """
+        data = {
+            'a': 'zone_load_multi'
+        }
+        if stream:
+            zones = self._stream(data, 'response.zones.objs')
+            return (models.Zone(zone) for zone in zones) if typed else zones
+        response = self._request(data)
+        if typed:
+            response = models.typed_response(response, ('response', 'zones', 'objs'), models.Zone)
+        return response
+
+    def rec_load_all(self, zone, prefetch=0, typed=False, stream=False):
+        """
+        Lists all DNS records for the given domain
+        :param zone: the domain for which records are being retrieved
+        :type zone: str
+        :param prefetch: Optional. Number of pages to fetch in the background while the current one is being consumed.
+            The end of the zone is not known in advance, so up to this many requests beyond the last page are sent and
+            discarded, each counting against the rate limiter and the API quota. Only worth it for zones of many pages.
+        :type prefetch: int
+        :param typed: Optional. If True, records are returned as compact :class:`pyflare.models.DnsRecord` objects,
+            which is worthwhile when holding on to large zones.
+        :type typed: bool
+        :param stream: Optional. If True, records are parsed one at a time as each page arrives instead of a page at a
+            time. Cannot be combined with prefetch.
+        :type stream: bool
+        :return:
+        :rtype: generator
+        """
+        if stream:
+            if prefetch:
+                raise ValueError('prefetch cannot be combined with stream')
+            return self._stream_records(zone, typed)
+        return self._load_records(zone, prefetch, typed)
+
+    def _load_records(self, zone, prefetch, typed):
+        def fetch(offset):
+            records = self._request({
+                'a': 'rec_load_all',
+                'o': offset,
+                'z': zone
+            })
+            try:
+                recs = records['response']['recs']
+                return recs['objs'], (offset + recs['count'] if recs['has_more'] else None)
+            except KeyError:
+                return [], None
+
+        for page in paging.iter_pages(fetch, 0, prefetch):
+            for record in page:
+                yield models.DnsRecord(record) if typed else record
+
+    def _stream_records(self, zone, typed):
+        offset = 0
+        while offset is not None:
+            records = self._stream({
+                'a': 'rec_load_all',
+                'o': offset,
+                'z': zone
+            }, 'response.recs.objs')
+            for record in records:
+                yield models.DnsRecord(record) if typed else record
+            if records.fields.get('response.recs.has_more'):
+                offset += records.fields['response.recs.count']
+            else:
+                offset = None
+
+    def zone_ips(self, zone, hours=24, ip_class=None, geo=False, stream=False):
+        """
+        Retrieve IP addresses of recent visitors
+        :param zone: the target domain
+        :type zone: str
+        :param hours: Past number of hours to query. Defaults to 24, maximum is 48.
+        :type hours: int
+        :param ip_class: Optional. Restrict the result set to a given class as given by:
+            "r" -- regular
+            "s" -- crawler
+            "t" -- threat
+        :type ip_class: str
+        :param geo: Optional. Set to True to add longitude and latitude information to response
+        :type geo: bool
+        :param stream: Optional. If True, return an iterator over the IP entries, which are parsed one at a time as the
+            response arrives. See :class:`pyflare.streaming.ItemStream`.
+        :type stream: bool
+        :return:
+        :rtype: dict
+        """
+        params = {
+            'a': 'zone_ips',
+            'z': zone,
+            'hours': hours,
+            'class': ip_class,
+        }
+        if geo:
+            params['geo'] = geo
+        if stream:
+            return self._stream(params, 'response.ips')
+        return self._request(params)
+
+    def zone_settings(self, zone, typed=False):
+        """
+        Retrieves all current settings for a given domain.
+        :param zone: the target domain
+        :type zone: str
+        :param typed: Optional. If True, settings are returned as compact :class:`pyflare.models.ZoneSettings` objects.
+        :type typed: bool
+        :return:
+        :rtype: dict
+        """
+        response = self._request({
+            'a': 'zone_settings',
+            'z': zone
+        })
+        if typed:
+            response = models.typed_response(response, ('response', 'result', 'objs'), models.ZoneSettings)
+        return response
+
+    def add_record_listener(self, listener):
+        """
+        Register an object to be told about DNS records created, edited or deleted through this client. Only a weak
+        reference is kept.
+        :param listener: object with record_saved(zone, record) and record_deleted(zone, record_id) methods, such as
+            a :class:`pyflare.store.RecordStore`
+        """
+        self._record_listeners.add(listener)
+
+    def bulk_records(self, operations, concurrency=8):
+        """
+        Apply many DNS record changes concurrently. A failing operation does not abort the batch; its exception is
+        returned in its slot of the result instead. Keep concurrency at or below the pool_maxsize given to the
+        constructor, or surplus connections will not be reused.
+        :param operations: Dicts naming the method in "action" (one of rec_new, rec_edit or rec_delete), with the
+            remaining items passed to it as keyword arguments, e.g.
+            {'action': 'rec_delete', 'zone': 'example.com', 'record_id': 9001}
+        :type operations: iterable of dict
+        :param concurrency: Number of requests to keep in flight
+        :type concurrency: int
+        :return: Responses and APIErrors in the order of operations, along with timing and throughput
+        :rtype: pyflare.bulk.BulkResult
+        """
+        calls = []
+        for operation in operations:
+            operation = dict(operation)
+            action = operation.pop('action', None)
+            if action not in self.BULK_RECORD_ACTIONS:
+                raise ValueError('action has to be one of {0}'.format(', '.join(self.BULK_RECORD_ACTIONS)))
+            calls.append(functools.partial(getattr(self, action), **operation))
+        return bulk.run(calls, concurrency)
+
+    def bulk_ip_action(self, action, ips, concurrency=8):
+        """
+        Whitelist, ban or remove many IP addresses concurrently. Networks in CIDR notation are expanded to their
+        addresses and duplicates are dropped. Addresses to which this client has already applied the same action, as
+        remembered in applied_ip_actions, are skipped.
+        :param action: wl, ban or nul
+        :type action: str
+        :param ips: IP addresses and CIDR networks
+        :type ips: iterable of str
+        :param concurrency: Number of requests to keep in flight
+        :type concurrency: int
+        :return: Response or exception for every address the action was sent for, and the skipped addresses
+        :rtype: pyflare.access.IPActionResult
+        """
+        if action not in access.IP_ACTIONS:
+            raise ValueError('action has to be one of {0}'.format(', '.join(access.IP_ACTIONS)))
+        pending, skipped = [], []
+        for ip in access.expand(ips):
+            (skipped if self.applied_ip_actions.get(ip) == action else pending).append(ip)
+        outcome = bulk.run([functools.partial(getattr(self, action), ip) for ip in pending], concurrency)
+        return access.IPActionResult(action, pending, outcome.results, outcome.elapsed, skipped)
+
+    def purge_urls(self, zone, urls, concurrency=8, full_purge_threshold=purge.FULL_PURGE_THRESHOLD):
+        """
+        Purge many files from CloudFlare's cache. URLs are normalized and deduplicated, then purged concurrently with
+        zone_file_purge. When at least full_purge_threshold URLs remain, the whole zone is purged with a single
+        fpurge_ts call instead, unless the cooldown returned by a previous full purge of the zone through this client
+        has not yet passed. Should the full purge fail, URLs are purged one by one.
+        :param zone: domain name
+        :type zone: str
+        :param urls: Full URLs of the files to purge
+        :type urls: iterable of str
+        :param concurrency: Number of requests to keep in flight
+        :type concurrency: int
+        :param full_purge_threshold: Optional. Number of URLs from which to purge the whole zone. None to never do so.
+        :type full_purge_threshold: int
+        :return: Response or exception for every unique URL
+        :rtype: pyflare.purge.PurgeResult
+        """
+        urls = purge.unique_urls(urls)
+        start = time.time()
+        if full_purge_threshold is not None and len(urls) >= full_purge_threshold and \
+                self._purge_cooldowns.get(zone, 0) <= start:
+            try:
+                response = self.fpurge_ts(zone)
+            except bulk.CAPTURED_ERRORS:
+                pass
+            else:
+                cooldown = (response.get('attributes') or {}).get('cooldown')
+                if cooldown:
+                    self._purge_cooldowns[zone] = time.time() + cooldown
+                return purge.PurgeResult(urls, [response] * len(urls), time.time() - start, full_purge=True)
+        outcome = bulk.run([functools.partial(self.zone_file_purge, zone, url) for url in urls], concurrency)
+        return purge.PurgeResult(urls, outcome.results, outcome.elapsed)
+
+    def sync_zone(self, zone, desired_records, dry_run=False, concurrency=8, types=None):
+        """
+        Make the DNS records of a zone match the desired state with as few API calls as possible.
+        See :func:`pyflare.sync.plan_zone` for how records are matched.
+        :param zone: domain name
+        :type zone: str
+        :param desired_records: records with at least type, name and content, in the format returned by rec_load_all.
+            Names may be relative to the zone.
+        :type desired_records: iterable of dict
+        :param dry_run: If True, only compute the plan. str(plan) lists the changes which would be made.
+        :type dry_run: bool
+        :param concurrency: Number of requests to keep in flight
+        :type concurrency: int
+        :param types: Optional. Record types to manage. Existing records of other types are never touched.
+        :type types: iterable of str
+        :return: The plan. Unless dry_run is set, plan.result holds the outcome of every operation.
+        :rtype: pyflare.sync.ZonePlan
+        """
+        plan = sync.plan_zone(zone, list(self.rec_load_all(zone)), desired_records, types)
+        if not dry_run:
+            plan.execute(self, concurrency)
+        return plan
+
+    def fan_out(self, action, zones=None, concurrency=8, **kwargs):
+        """
+        Call a per-zone method for many zones concurrently, e.g. fan_out('stats', interval=40).
+        Outcomes are yielded as they complete. A failing zone does not affect the others; its exception is yielded
+        in place of its response.
+        :param action: Name of the method to call, one of FAN_OUT_ACTIONS
+        :type action: str
+        :param zones: Optional. Domain names to call the method for. Defaults to all zones in the account, as listed
+            by zone_load_multi.
+        :type zones: iterable of str
+        :param concurrency: Number of requests to keep in flight
+        :type concurrency: int
+        :param kwargs: Further arguments passed to the method, after the zone
+        :return: (zone, response or exception) pairs, in order of completion. For rec_load_all the response is the
+            list of all records in the zone.
+        :rtype: generator
+        """
+        if action not in self.FAN_OUT_ACTIONS:
+            raise ValueError('action has to be one of {0}'.format(', '.join(self.FAN_OUT_ACTIONS)))
+        if zones is None:
+            zones = [zone['zone_name'] for zone in self.zone_load_multi()['response']['zones']['objs']]
+        method = getattr(self, action)
+        if action == 'rec_load_all':
+            def call(zone):
+                return list(method(zone, **kwargs))
+        else:
+            def call(zone):
+                return method(zone, **kwargs)
+        return bulk.run_unordered(((zone, functools.partial(call, zone)) for zone in zones), concurrency)
+
     def _request(self, data):
         """
 
@@ -505,22 +738,66 @@ class PyflareClient(object):
         """
         data['tkn'] = self._token
         data['email'] = self._email
-        response = requests.post(self.CLOUDFLARE_URL, data=data)
-        deserialized_response = self._deserialize_response(response.content.decode("utf-8"))
-
-        if deserialized_response.get('result') == 'error':
-            raise APIError(deserialized_response['msg'], deserialized_response.get('err_code'))
+        if self._cache is None:
+            response = self._send(data, self._parse_response)
+        else:
+            response = self._cached_send(data)
+        if self._record_listeners and data['a'] in self.BULK_RECORD_ACTIONS:
+            self._notify_record_listeners(data, response)
+        elif data['a'] in access.IP_ACTIONS:
+            self.applied_ip_actions.record(access.canonical(data['key']), data['a'])
+        return response
+
+    def _stream(self, data, path):
+        """
+        :param data: Request body to be sent to Cloudflare
+        :type data: dict
+        :param path: dotted path of the list in the response to iterate over
+        :type path: str
+        :rtype: pyflare.streaming.ItemStream
+        """
+        data['tkn'] = self._token
+        data['email'] = self._email
+        # a stream can only be consumed once, so it bypasses the response cache
+        return self._send(data, functools.partial(streaming.ItemStream, path=path), stream=True)
 
-        return deserialized_response
+    def _cached_send(self, data):
+        action = data['a']
+        if action in WRITE_ACTIONS:
+            try:
+                return self._send(data, self._parse_response)
+            finally:
+                # invalidate even if the request failed, as it may still have been applied
+                self._cache.invalidate(data.get('z'), self._email)
+        if action not in self._cache.ttls:
+            return self._send(data, self._parse_response)
+        # the key, and with it the zone's generation, is fixed before the request is sent, so that a response read
+        # while a write to the zone was in flight is not stored under the generation following the write
+        key = self._cache.key(data, self._email)
+        response = self._cache.get(action, data, self._email, key)
+        if response is None:
+            response = self._send(data, self._parse_response)
+            self._cache.set(action, data, response, self._email, key)
+        return response
+
+    def _notify_record_listeners(self, data, response):
+        listeners = list(self._record_listeners)
+        if data['a'] == 'rec_delete':
+            for listener in listeners:
+                listener.record_deleted(data['z'], data['id'])
+            return
+        try:
+            record = response['response']['rec']['obj']
+        except (KeyError, TypeError):
+            return
+        for listener in listeners:
+            listener.record_saved(data['z'], record)
 
-    def _deserialize_response(self, response):
+    def _parse_response(self, response):
         """
-        :param: response: Response body returned from Cloudflare
-        :return: deserialized json response if valid, else raise ResponseError
+        :param response: Response returned from Cloudflare
+        :type response: requests.Response
+        :return: deserialized json response, raising APIError for error results
         :rtype: dict
         """
-
-        try:
-            return json.loads(response)
-        except APIError:
-            raise APIError("Unexpected response from Cloudflare API")
+        return serialization.parse(response.content)
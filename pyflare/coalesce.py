@@ -0,0 +1,66 @@
+__author__ = 'Joe Linn'
+
+import json
+import threading
+from pyflare.cache import CREDENTIAL_PARAMS
+
+
+def request_key(data):
+    """
+    :param data: Request body
+    :type data: dict
+    :return: Key identifying identical requests, without credentials
+    :rtype: str
+    """
+    return json.dumps(dict((name, value) for name, value in data.items() if name not in CREDENTIAL_PARAMS),
+                      sort_keys=True)
+
+
+class _Call(object):
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent identical calls made from different threads: while a call for a key is in flight, further
+    callers with the same key wait for it and receive its result, or its exception, instead of making their own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """
+        :param key: Identifies calls which are interchangeable
+        :type key: str
+        :param func: Makes the call
+        :type func: callable
+        :return: The result of func, shared with every caller which joined the same flight
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
@@ -1,23 +1,18 @@
 __author__ = 'Vanc Levstik'
 
-import requests
-from pyflare import APIError
+from pyflare import paging
+from pyflare import serialization
+from pyflare.base import PyflareBase
 
 
-class PyflareHosting(object):
+class HostingActions(object):
+    """
+    Host API actions which only build a request body and return the response of _request unchanged, shared by
+    PyflareHosting and :class:`pyflare.aio.AsyncPyflareHosting`, whose _request returns an awaitable instead.
+    """
 
     CLOUDFLARE_URL = 'https://api.cloudflare.com/host-gw.html'
-
-    def __init__(self, host_key):
-        """
-        Instantiate a Pyflare client object
-        :param email: The host_key associated with your Cloudflare account
-        :type email: str
-        :param email: The user_key associated with user for which you are
-        changing settings.
-        :type email: str
-        """
-        self._host_key = host_key
+    ACTION_KEY = 'act'
 
     def host_key_regen(self):
         """
@@ -243,6 +238,68 @@ class PyflareHosting(object):
 
         return self._request(params)
 
+
+class PyflareHosting(HostingActions, PyflareBase):
+
+    def __init__(self, host_key, **kwargs):
+        """
+        Instantiate a Pyflare client object
+        :param email: The host_key associated with your Cloudflare account
+        :type email: str
+        :param email: The user_key associated with user for which you are
+        changing settings.
+        :type email: str
+        :param kwargs: Connection and request options, see :class:`pyflare.base.PyflareBase`
+        """
+        super(PyflareHosting, self).__init__(**kwargs)
+        self._host_key = host_key
+
+    def iter_zones(
+        self,
+        user_key,
+        page_size=100,
+        prefetch=0,
+        zone_name=None,
+        sub_id=None,
+        zone_status='ALL',
+        sub_status='ALL',
+            ):
+        """
+        Iterate over all zones for a user, fetching pages of zone_list lazily.
+        Pages are requested until an empty one comes back, as the API may
+        return fewer zones than page_size even when more follow.
+
+        :param    user_key:  key for authentication of user
+        :type     user_key:  str
+        :param    page_size: number of zones requested per page
+        :type     page_size: int
+        :param    prefetch: number of pages to fetch in the background while
+        the current one is being consumed. Up to this many requests beyond
+        the end of the listing are sent and discarded, each counting against
+        the rate limiter and the API quota.
+        :type     prefetch: int
+        :param    zone_name: name of zone to lookup
+        :type     zone_name: str
+        :param    sub_id: subscription id of reseller (only for use by resellers)
+        :type     sub_id: str
+        :param    zone_status: status of zones to be shown
+        :type     zone_status: str (one of: V(active), D(deleted), ALL)
+        :param    sub_status: status of subscription of zones to be shown
+        :type     zone_name: str (one of: V(active), CNL(cancelled), ALL )
+
+        :returns: zones, one at a time
+        :rtype:   generator
+        """
+        def fetch(offset):
+            response = self.zone_list(user_key, limit=page_size, offset=offset, zone_name=zone_name, sub_id=sub_id,
+                                      zone_status=zone_status, sub_status=sub_status)
+            zones = response.get('response') or []
+            return zones, (offset + len(zones) if zones else None)
+
+        for page in paging.iter_pages(fetch, 0, prefetch):
+            for zone in page:
+                yield zone
+
     def _request(self, data):
         """
 
@@ -252,7 +309,14 @@ class PyflareHosting(object):
         :rtype: dict
         """
         data['host_key'] = self._host_key
-        response = requests.post(self.CLOUDFLARE_URL, data=data, verify=True).json()
-        if response['result'] == 'error':
-            raise APIError(response['msg'], response.get('err_code'))
-        return response
+        return self._send(data, self._parse_response, verify=True)
+
+    def _parse_response(self, response):
+        """
+
+        :param response: Response returned from Cloudflare
+        :type response: requests.Response
+        :return: deserialized json response, raising APIError for error results
+        :rtype: dict
+        """
+        return serialization.parse(response.content)
@@ -0,0 +1,287 @@
+__author__ = 'Joe Linn'
+
+import bisect
+import heapq
+import socket
+import threading
+import time
+from collections import Counter, defaultdict
+
+# Highest resolution clock available, in seconds
+timer = getattr(time, 'perf_counter', time.time)
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+
+class RequestEvent(object):
+    """
+    Measurements of a single API call, from the moment it is handed to the transport until its response is parsed,
+    including any retries. A streamed response is parsed as it is consumed, so its event finishes only once the stream
+    is exhausted or closed: elapsed then includes the time the caller spent between items, and decode_time the time
+    spent reading and parsing the body.
+    """
+
+    __slots__ = ('action', 'started', 'elapsed', 'attempts', 'request_bytes', 'response_bytes', 'decode_time',
+                 'status_code', 'error')
+
+    def __init__(self, action):
+        """
+        :param action: The value of the action parameter, a or act
+        :type action: str
+        """
+        self.action = action
+        self.started = timer()
+        self.elapsed = None
+        self.attempts = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.decode_time = 0.0
+        self.status_code = None
+        self.error = None
+
+    def __repr__(self):
+        return '<RequestEvent {0} {1:.1f}ms, {2} attempts, {3}>'.format(
+            self.action, (self.elapsed or 0) * 1000, self.attempts, self.error_code or 'ok')
+
+    @property
+    def retries(self):
+        return max(self.attempts - 1, 0)
+
+    @property
+    def error_code(self):
+        """
+        :return: The APIError code, or the class name of any other exception, or None if the call succeeded
+        :rtype: str
+        """
+        if self.error is None:
+            return None
+        return getattr(self.error, 'code', None) or type(self.error).__name__
+
+    def finish(self, error=None):
+        self.elapsed = timer() - self.started
+        self.error = error
+
+
+class Instrumentation(object):
+    """
+    Receives a RequestEvent at the start and at the end of every API call. Subclass and override either method; both
+    are called on the thread making the call, so they should return quickly.
+    """
+
+    def request_started(self, event):
+        """
+        :type event: RequestEvent
+        """
+
+    def request_finished(self, event):
+        """
+        :param event: All fields are set, and error holds the exception the call raised, if any
+        :type event: RequestEvent
+        """
+
+
+class Callbacks(Instrumentation):
+    """
+    Instrumentation calling plain functions
+    """
+
+    def __init__(self, started=None, finished=None):
+        """
+        :param started: Optional. Called with the RequestEvent when a call starts
+        :type started: callable
+        :param finished: Optional. Called with the RequestEvent when a call ends
+        :type finished: callable
+        """
+        self._started = started
+        self._finished = finished
+
+    def request_started(self, event):
+        if self._started is not None:
+            self._started(event)
+
+    def request_finished(self, event):
+        if self._finished is not None:
+            self._finished(event)
+
+
+class Multiplexer(Instrumentation):
+    """
+    Forwards events to several instrumentations, e.g. MemoryMetrics and a StatsdExporter
+    """
+
+    def __init__(self, *instrumentations):
+        self.instrumentations = instrumentations
+
+    def request_started(self, event):
+        for instrumentation in self.instrumentations:
+            instrumentation.request_started(event)
+
+    def request_finished(self, event):
+        for instrumentation in self.instrumentations:
+            instrumentation.request_finished(event)
+
+
+class Histogram(object):
+    """
+    Latency distribution in fixed buckets, with the exact sum and maximum
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[min(bisect.bisect_left(self.buckets, value), len(self.buckets) - 1)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """
+        :param q: Between 0 and 1, e.g. 0.99
+        :type q: float
+        :return: Upper bound of the bucket holding the q-quantile, capped at the maximum seen
+        :rtype: float
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class MemoryMetrics(Instrumentation):
+    """
+    Aggregates events in memory: a latency histogram, call, attempt and byte counts and decode time per action,
+    error counts per action and error code, and the slowest calls per action for finding outliers. Safe to read while
+    calls are in flight.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, keep_slowest=10):
+        """
+        :param buckets: Upper bounds, in seconds, of the latency histogram buckets
+        :type buckets: tuple of float
+        :param keep_slowest: Number of slowest events to keep per action
+        :type keep_slowest: int
+        """
+        self.keep_slowest = keep_slowest
+        self.latency = defaultdict(lambda: Histogram(buckets))
+        self.counters = dict((name, Counter()) for name in ('requests', 'attempts', 'request_bytes',
+                                                            'response_bytes', 'decode_time'))
+        self.errors = Counter()
+        self._slowest = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def request_finished(self, event):
+        action = event.action
+        with self._lock:
+            self.latency[action].observe(event.elapsed)
+            counters = self.counters
+            counters['requests'][action] += 1
+            counters['attempts'][action] += event.attempts
+            counters['request_bytes'][action] += event.request_bytes
+            counters['response_bytes'][action] += event.response_bytes
+            counters['decode_time'][action] += event.decode_time
+            if event.error is not None:
+                self.errors[action, event.error_code] += 1
+            slowest = self._slowest[action]
+            if len(slowest) < self.keep_slowest:
+                heapq.heappush(slowest, (event.elapsed, id(event), event))
+            elif slowest and event.elapsed > slowest[0][0]:
+                heapq.heapreplace(slowest, (event.elapsed, id(event), event))
+
+    def slowest(self, action):
+        """
+        :return: The slowest events of an action, slowest first
+        :rtype: list of RequestEvent
+        """
+        with self._lock:
+            return [event for _, _, event in sorted(self._slowest[action], reverse=True)]
+
+    def reset(self):
+        with self._lock:
+            self.latency.clear()
+            for counter in self.counters.values():
+                counter.clear()
+            self.errors.clear()
+            self._slowest.clear()
+
+    def prometheus(self, prefix='pyflare'):
+        """
+        :param prefix: Prefix of every metric name
+        :type prefix: str
+        :return: The metrics in the Prometheus text exposition format
+        :rtype: str
+        """
+        lines = []
+        with self._lock:
+            name = prefix + '_request_duration_seconds'
+            lines += ['# HELP {0} Duration of API calls, including retries'.format(name),
+                      '# TYPE {0} histogram'.format(name)]
+            for action, histogram in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append('{0}_bucket{{action="{1}",le="{2}"}} {3}'.format(
+                        name, action, '+Inf' if bound == float('inf') else repr(bound), cumulative))
+                lines.append('{0}_sum{{action="{1}"}} {2!r}'.format(name, action, histogram.sum))
+                lines.append('{0}_count{{action="{1}"}} {2}'.format(name, action, histogram.count))
+            for counter, unit in (('attempts', 'total'), ('request_bytes', 'total'), ('response_bytes', 'total'),
+                                  ('decode_time', 'seconds_total')):
+                name = '{0}_{1}_{2}'.format(prefix, counter, unit)
+                lines.append('# TYPE {0} counter'.format(name))
+                for action, value in sorted(self.counters[counter].items()):
+                    lines.append('{0}{{action="{1}"}} {2!r}'.format(name, action, value))
+            name = prefix + '_errors_total'
+            lines.append('# TYPE {0} counter'.format(name))
+            for (action, code), value in sorted(self.errors.items()):
+                lines.append('{0}{{action="{1}",code="{2}"}} {3}'.format(name, action, code, value))
+        return '\n'.join(lines) + '\n'
+
+
+class StatsdExporter(Instrumentation):
+    """
+    Sends the measurements of every call to a StatsD server over UDP: a timer per action, counters of attempts and
+    bytes, and a counter per error code. Sending never blocks or raises; packets which cannot be sent are dropped.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8125, prefix='pyflare'):
+        """
+        :param host: StatsD host
+        :type host: str
+        :param port: StatsD port
+        :type port: int
+        :param prefix: Prefix of every metric name
+        :type prefix: str
+        """
+        self.address = (host, port)
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+
+    def request_finished(self, event):
+        metric = '{0}.{1}.'.format(self.prefix, event.action)
+        lines = [
+            '{0}duration:{1:.3f}|ms'.format(metric, event.elapsed * 1000),
+            '{0}attempts:{1}|c'.format(metric, event.attempts),
+            '{0}request_bytes:{1}|c'.format(metric, event.request_bytes),
+            '{0}response_bytes:{1}|c'.format(metric, event.response_bytes),
+            '{0}decode:{1:.3f}|ms'.format(metric, event.decode_time * 1000),
+        ]
+        if event.error is not None:
+            lines.append('{0}errors.{1}:1|c'.format(metric, event.error_code))
+        try:
+            self._socket.sendto('\n'.join(lines).encode('utf-8'), self.address)
+        except (IOError, OSError):
+            pass
+
+    def close(self):
+        self._socket.close()
@@ -0,0 +1,209 @@
+__author__ = 'Joe Linn'
+
+import functools
+import threading
+from pyflare import bulk
+from pyflare.client import PyflareClient
+from pyflare.models import string_types
+from pyflare.ratelimit import RateLimiter, TokenBucket
+
+
+class ClientManager(object):
+    """
+    Keeps one long-lived PyflareClient per Cloudflare account, so connections are reused across tasks. Each client has
+    its own connection pool and, if a rate is given, its own token bucket, so the budget of one account is never spent
+    on another.
+
+    fan_out and fan_out_zones call a method for many accounts concurrently. Workers are handed out to the accounts in
+    turn, and no account has more than per_account calls in flight, so a huge account cannot starve the rest.
+    Clients are created and looked up under a lock; the manager may be shared between threads.
+    """
+
+    def __init__(self, credentials=None, rate=None, burst=None, **client_kwargs):
+        """
+        :param credentials: Optional. Email and API key of every account, as a dict or (email, token) pairs
+        :type credentials: dict or iterable of tuple
+        :param rate: Optional. Requests per second allowed per account. Unlimited by default.
+        :type rate: float
+        :param burst: Optional. Requests an idle account may send at once before being paced. Defaults to one second's
+            worth.
+        :type burst: float
+        :param client_kwargs: Passed to every PyflareClient, e.g. pool_maxsize, timeout, retry or transport. A
+            transport may only be given by name, so that every client gets its own.
+        """
+        for name in ('session', 'rate_limiter', 'applied_ip_actions'):
+            if name in client_kwargs:
+                raise ValueError('{0} cannot be shared between clients'.format(name))
+        transport = client_kwargs.get('transport')
+        if transport is not None and not isinstance(transport, string_types):
+            raise ValueError('transport cannot be shared between clients, give its name instead')
+        self.rate = rate
+        self.burst = burst
+        self.client_kwargs = client_kwargs
+        self._clients = {}
+        self._added = 0
+        self._lock = threading.Lock()
+        if isinstance(credentials, dict):
+            credentials = credentials.items()
+        for email, token in credentials or ():
+            self.add(email, token)
+
+    def __len__(self):
+        return len(self._clients)
+
+    def __contains__(self, email):
+        return email in self._clients
+
+    def __iter__(self):
+        return iter(self.emails)
+
+    def __getitem__(self, email):
+        return self.client(email)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def emails(self):
+        """
+        :return: Emails of all accounts, in the order they were added
+        :rtype: list of str
+        """
+        with self._lock:
+            return [email for email, _ in sorted(self._clients.items(), key=lambda item: item[1][0])]
+
+    def add(self, email, token):
+        """
+        Register an account. Adding an account again with a different token replaces its client.
+        :param email: The email address associated with the account
+        :type email: str
+        :param token: The API key associated with the account
+        :type token: str
+        :return: The client of the account
+        :rtype: pyflare.PyflareClient
+        """
+        replaced = None
+        with self._lock:
+            entry = self._clients.get(email)
+            if entry is not None and entry[1] == token:
+                return entry[2]
+            limiter = None
+            if self.rate is not None:
+                limiter = RateLimiter(TokenBucket(self.rate, self.burst))
+            client = PyflareClient(email, token, rate_limiter=limiter, **self.client_kwargs)
+            if entry is None:
+                order = self._added
+                self._added += 1
+            else:
+                order, _, replaced = entry
+            self._clients[email] = (order, token, client)
+        if replaced is not None:
+            replaced.close()
+        return client
+
+    def remove(self, email):
+        """
+        Forget an account and close its client
+        """
+        with self._lock:
+            _, _, client = self._clients.pop(email)
+        client.close()
+
+    def client(self, email):
+        """
+        :return: The client of an account
+        :rtype: pyflare.PyflareClient
+        :raise KeyError: if the account has not been added
+        """
+        with self._lock:
+            return self._clients[email][2]
+
+    def close(self):
+        """
+        Close the clients of all accounts
+        """
+        with self._lock:
+            clients = [client for _, _, client in self._clients.values()]
+        for client in clients:
+            client.close()
+
+    def fan_out(self, action, emails=None, concurrency=16, **kwargs):
+        """
+        Call a client method once for each of many accounts concurrently, e.g. fan_out('zone_load_multi').
+        A failing account does not affect the others; its exception is yielded in place of its response.
+        :param action: Name of a PyflareClient method
+        :type action: str
+        :param emails: Optional. Accounts to call the method for. Defaults to all.
+        :type emails: iterable of str
+        :param concurrency: Number of requests to keep in flight
+        :type concurrency: int
+        :param kwargs: Arguments passed to the method
+        :return: (email, response or exception) pairs, in order of completion
+        :rtype: generator
+        """
+        if action.startswith('_') or not callable(getattr(PyflareClient, action, None)):
+            raise ValueError('{0} is not a PyflareClient method'.format(action))
+        queues = [(email, [(None, functools.partial(getattr(self.client(email), action), **kwargs))])
+                  for email in self._select(emails)]
+        return ((email, outcome) for email, _, outcome in bulk.run_fair(queues, concurrency, per_queue=1))
+
+    def fan_out_zones(self, action, zones=None, concurrency=16, per_account=4, **kwargs):
+        """
+        Call a per-zone method for the zones of many accounts concurrently, e.g. fan_out_zones('stats', interval=40).
+        Accounts take turns for workers, with at most per_account calls in flight each. Outcomes are yielded as they
+        complete; a failing zone does not affect the others.
+        :param action: Name of the method to call, one of PyflareClient.FAN_OUT_ACTIONS
+        :type action: str
+        :param zones: Optional. Domain names to call the method for, by email. Defaults to all zones of all accounts,
+            as listed by zone_load_multi. An account whose zones cannot be listed is yielded with None as its zone and
+            the exception raised.
+        :type zones: dict
+        :param concurrency: Number of requests to keep in flight
+        :type concurrency: int
+        :param per_account: Maximum number of requests of a single account in flight at once
+        :type per_account: int
+        :param kwargs: Further arguments passed to the method, after the zone
+        :return: (email, zone, response or exception) triples, in order of completion. For rec_load_all the response
+            is the list of all records in the zone.
+        :rtype: generator
+        """
+        if action not in PyflareClient.FAN_OUT_ACTIONS:
+            raise ValueError('action has to be one of {0}'.format(', '.join(PyflareClient.FAN_OUT_ACTIONS)))
+        return self._fan_out_zones(action, zones, concurrency, per_account, kwargs)
+
+    def _fan_out_zones(self, action, zones, concurrency, per_account, kwargs):
+        if zones is None:
+            zones = {}
+            for email, response in self.fan_out('zone_load_multi', concurrency=concurrency):
+                if isinstance(response, Exception):
+                    yield email, None, response
+                else:
+                    zones[email] = [zone['zone_name'] for zone in response['response']['zones']['objs']]
+            emails = [email for email in self.emails if email in zones]
+        else:
+            emails = list(zones)
+        queues = [(email, self._zone_calls(self.client(email), action, zones[email], kwargs)) for email in emails]
+        for outcome in bulk.run_fair(queues, concurrency, per_account):
+            yield outcome
+
+    def _select(self, emails):
+        if emails is None:
+            return self.emails
+        emails = list(emails)
+        for email in emails:
+            self.client(email)
+        return emails
+
+    @staticmethod
+    def _zone_calls(client, action, zones, kwargs):
+        method = getattr(client, action)
+        if action == 'rec_load_all':
+            def call(zone):
+                return list(method(zone, **kwargs))
+        else:
+            def call(zone):
+                return method(zone, **kwargs)
+        return ((zone, functools.partial(call, zone)) for zone in zones)
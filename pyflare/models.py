@@ -0,0 +1,159 @@
+__author__ = 'Joe Linn'
+
+import json
+
+try:
+    string_types = (str, unicode)
+except NameError:
+    string_types = (str,)
+
+_strings = {}
+
+
+def intern_string(value):
+    """
+    Return a canonical instance of a frequently repeated string, such as a zone name or record type, so that equal
+    values across many objects share one copy. Unlike the intern() builtin this also accepts unicode on Python 2.
+    """
+    if not isinstance(value, string_types):
+        return value
+    return _strings.setdefault(value, value)
+
+
+def typed_response(response, path, model):
+    """
+    Copy an API response, replacing the list of objects found at the given path with model instances. The original
+    response is left untouched, as it may be shared with a response cache.
+    :param response: decoded API response
+    :type response: dict
+    :param path: keys leading to the list of objects, e.g. ('response', 'zones', 'objs')
+    :type path: tuple of str
+    :param model: Model subclass to wrap each object in
+    :type model: type
+    :rtype: dict
+    """
+    key = path[0]
+    if key not in response:
+        return response
+    copied = dict(response)
+    if len(path) == 1:
+        copied[key] = [model(obj) for obj in response[key]]
+    else:
+        copied[key] = typed_response(response[key], path[1:], model)
+    return copied
+
+
+class Model(object):
+    """
+    Compact, read-only view of an API object.
+
+    Commonly used fields are held in __slots__ and repeated strings among them are interned. Bulky, rarely used fields
+    (and any field this class does not know about) are kept together as one compact JSON string and only decoded when
+    accessed. Fields can be read as attributes or, for compatibility with code written against the raw dicts, with
+    item access and get().
+    """
+
+    __slots__ = ('_lazy',)
+
+    FIELDS = ()
+    INTERNED = frozenset()
+
+    def __init__(self, data):
+        """
+        :param data: decoded API object
+        :type data: dict
+        """
+        for field in self.FIELDS:
+            value = data.get(field)
+            if field in self.INTERNED:
+                value = intern_string(value)
+            setattr(self, field, value)
+        lazy = dict((key, value) for key, value in data.items() if key not in self.FIELDS)
+        self._lazy = json.dumps(lazy, separators=(',', ':')) if lazy else None
+
+    def __getattr__(self, name):
+        # only called for names which are not slots, i.e. lazily decoded fields
+        if name.startswith('_'):
+            raise AttributeError(name)
+        lazy = self._decode_lazy()
+        if name not in lazy:
+            raise AttributeError(name)
+        return lazy[name]
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.FIELDS or key in self._decode_lazy()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        """
+        :return: the object as originally decoded
+        :rtype: dict
+        """
+        data = self._decode_lazy()
+        for field in self.FIELDS:
+            data[field] = getattr(self, field)
+        return data
+
+    def _decode_lazy(self):
+        return json.loads(self._lazy) if self._lazy is not None else {}
+
+
+class DnsRecord(Model):
+    """
+    A DNS record, as listed by rec_load_all. props and the other SSL and display fields are decoded on access.
+    """
+
+    FIELDS = ('rec_id', 'zone_name', 'name', 'type', 'prio', 'content', 'ttl', 'service_mode')
+    INTERNED = frozenset(['zone_name', 'type', 'ttl', 'service_mode'])
+
+    __slots__ = FIELDS
+
+
+class Zone(Model):
+    """
+    A zone, as listed by zone_load_multi. props, confirm_code, allow, the HTML zone_status_desc and the other
+    descriptive fields are decoded on access.
+    """
+
+    FIELDS = ('zone_id', 'user_id', 'zone_name', 'display_name', 'zone_status', 'zone_mode', 'zone_type', 'host_id')
+    INTERNED = frozenset(['user_id', 'zone_status', 'zone_mode', 'zone_type', 'host_id'])
+
+    __slots__ = FIELDS
+
+
+class ZoneSettings(Model):
+    """
+    The settings of a zone, as returned by zone_settings
+    """
+
+    FIELDS = ('userSecuritySetting', 'dev_mode', 'ipv46', 'ob', 'cache_lvl', 'outboundLinks', 'async', 'bic',
+              'chl_ttl', 'exp_ttl', 'fpurge_ts', 'hotlink', 'img', 'lazy', 'minify', 'outlink', 'preload', 's404',
+              'sec_lvl', 'spdy', 'ssl', 'waf_profile')
+    INTERNED = frozenset(FIELDS) - frozenset(['dev_mode', 'fpurge_ts'])
+
+    __slots__ = FIELDS
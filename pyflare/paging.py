@@ -0,0 +1,66 @@
+__author__ = 'Joe Linn'
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def iter_pages(fetch, offset=0, prefetch=0):
+    """
+    Walk an offset-paginated listing, optionally fetching pages ahead of the consumer.
+
+    With prefetching, the offsets of upcoming pages are predicted from the size of the previous page and up to
+    `prefetch` of them are requested in the background while the caller processes the current one, so at most that
+    many pages are buffered at any time. Should a page turn out to be shorter than predicted, the speculative requests
+    are discarded and fetching resumes from the actual offset, so no item is skipped or repeated. The end of the listing
+    is only known once its last page arrives, by which time up to `prefetch` requests beyond it have been sent; their
+    responses are dropped, but each has cost a request.
+    :param fetch: Fetches the page at the given offset and returns (items, offset of the next page or None if this
+        was the last page)
+    :type fetch: callable
+    :param offset: Offset of the first page
+    :type offset: int
+    :param prefetch: Number of pages to request ahead of the consumer. 0 fetches each page only once the previous one
+        has been consumed.
+    :type prefetch: int
+    :return: pages of items, in order
+    :rtype: generator
+    """
+    items, next_offset = fetch(offset)
+    yield items
+    if prefetch <= 0:
+        while next_offset is not None:
+            items, next_offset = fetch(next_offset)
+            yield items
+        return
+
+    executor = ThreadPoolExecutor(max_workers=prefetch)
+    pending = deque()
+    try:
+        stride = next_offset - offset if next_offset is not None else 0
+        offset = next_offset
+        scheduled = offset
+        while offset is not None:
+            while len(pending) < prefetch:
+                pending.append((scheduled, executor.submit(fetch, scheduled)))
+                scheduled += stride
+            page_offset, future = pending.popleft()
+            if page_offset != offset:
+                _cancel(pending)
+                future.cancel()
+                scheduled = offset
+                continue
+            items, next_offset = future.result()
+            yield items
+            if next_offset is not None:
+                stride = next_offset - offset
+            offset = next_offset
+    finally:
+        # pages requested beyond the end of the listing are simply dropped
+        _cancel(pending)
+        executor.shutdown(wait=False)
+
+
+def _cancel(pending):
+    for _, future in pending:
+        future.cancel()
+    pending.clear()
@@ -0,0 +1,83 @@
+__author__ = 'Joe Linn'
+
+try:
+    from urllib.parse import urlsplit, urlunsplit
+except ImportError:
+    from urlparse import urlsplit, urlunsplit
+from pyflare.bulk import BulkResult
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Number of URLs from which purge_urls purges the whole zone with one fpurge_ts call instead of URL by URL
+FULL_PURGE_THRESHOLD = 1000
+
+
+def normalize_url(url):
+    """
+    :param url: URL of a cached file
+    :type url: str
+    :return: The URL with its scheme and host lowercased, the default port, any fragment and surrounding whitespace
+        removed, and an empty path replaced by "/". Path and query are case sensitive and kept as they are.
+    :rtype: str
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or '').lower()
+    if parts.port is not None and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = '{0}:{1}'.format(netloc, parts.port)
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+
+def unique_urls(urls):
+    """
+    :param urls: URLs, possibly repeated or differing only in form
+    :type urls: iterable of str
+    :return: Normalized URLs, each once, in order of first appearance
+    :rtype: list of str
+    """
+    seen = set()
+    unique = []
+    for url in urls:
+        url = normalize_url(url)
+        if url not in seen:
+            seen.add(url)
+            unique.append(url)
+    return unique
+
+
+class PurgeResult(BulkResult):
+    """
+    Outcome of purge_urls: the response or exception for every unique, normalized URL, in order. After a full purge
+    every URL shares the fpurge_ts response.
+    """
+
+    def __init__(self, urls, results, elapsed, full_purge=False):
+        """
+        :param urls: Normalized URLs, in the order of results
+        :type urls: list of str
+        :param full_purge: True if the whole zone was purged with fpurge_ts instead of URL by URL
+        :type full_purge: bool
+        """
+        super(PurgeResult, self).__init__(results, elapsed)
+        self.urls = urls
+        self.full_purge = full_purge
+        self._positions = dict((url, index) for index, url in enumerate(urls))
+
+    def __repr__(self):
+        return '<PurgeResult {0} urls, {1} failed, full purge: {2}>'.format(len(self.urls), self.failed,
+                                                                           self.full_purge)
+
+    def status(self, url):
+        """
+        :param url: A URL which was purged, in any form
+        :type url: str
+        :return: The response or exception for the URL
+        """
+        return self.results[self._positions[normalize_url(url)]]
+
+    @property
+    def failed_urls(self):
+        """
+        :rtype: list of str
+        """
+        return [self.urls[index] for index, _ in self.errors]
@@ -0,0 +1,162 @@
+__author__ = 'Joe Linn'
+
+import json
+import os
+import threading
+import time
+try:
+    import fcntl
+except ImportError:     # not available on Windows
+    fcntl = None
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket.
+
+    Callers reserve tokens up front and then sleep for exactly as long as it takes the bucket to refill to cover their
+    reservation, so concurrent callers queue up behind each other and requests leave at a steady rate rather than in
+    bursts followed by back-off.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.time):
+        """
+        :param rate: Tokens added per second
+        :type rate: float
+        :param capacity: Maximum number of tokens which can accumulate while idle, i.e. the largest permitted burst.
+            Defaults to one second's worth of tokens.
+        :type capacity: float
+        :param clock: Time source, in seconds
+        :type clock: callable
+        """
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def reserve(self, tokens=1):
+        """
+        Take tokens from the bucket, going into debt if necessary
+        :param tokens: Number of tokens to take
+        :type tokens: float
+        :return: Number of seconds the caller must wait before acting on its reservation
+        :rtype: float
+        """
+        with self._lock:
+            self._tokens, self._updated, wait = self._take(self._tokens, self._updated, tokens)
+        return wait
+
+    def acquire(self, tokens=1):
+        """
+        Take tokens from the bucket, blocking until they are available
+        :param tokens: Number of tokens to take
+        :type tokens: float
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    def _take(self, available, updated, tokens):
+        now = self._clock()
+        available = min(self.capacity, available + (now - updated) * self.rate) - tokens
+        wait = -available / self.rate if available < 0 else 0.0
+        return available, now, wait
+
+
+class FileTokenBucket(TokenBucket):
+    """
+    Token bucket whose state lives in a file, so that every process on a host which uses the same path draws from one
+    budget. Access is serialized with an exclusive flock, so it is only available on POSIX systems.
+    """
+
+    def __init__(self, path, rate, capacity=None, clock=time.time):
+        """
+        :param path: File holding the shared bucket state. Created if it does not exist.
+        :type path: str
+        :param rate: Tokens added per second
+        :type rate: float
+        :param capacity: Maximum number of tokens which can accumulate while idle
+        :type capacity: float
+        :param clock: Time source, in seconds. Must agree between processes.
+        :type clock: callable
+        """
+        if fcntl is None:
+            raise NotImplementedError('FileTokenBucket requires fcntl')
+        super(FileTokenBucket, self).__init__(rate, capacity, clock)
+        self.path = path
+
+    def reserve(self, tokens=1):
+        # The file is opened for every reservation: a descriptor shared with forked children would share its lock too
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            with self._lock:
+                state = self._read(fd)
+                if state is None:
+                    available, updated = self.capacity, self._clock()
+                else:
+                    available, updated = state
+                available, updated, wait = self._take(available, updated, tokens)
+                self._write(fd, available, updated)
+        finally:
+            os.close(fd)    # also releases the lock
+        return wait
+
+    @staticmethod
+    def _read(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        content = os.read(fd, 4096)
+        try:
+            return tuple(json.loads(content.decode('utf-8')))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _write(fd, available, updated):
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.ftruncate(fd, 0)
+        os.write(fd, json.dumps([available, updated]).encode('utf-8'))
+
+
+class RateLimiter(object):
+    """
+    Paces requests through an account-wide bucket and, optionally, per-action buckets keyed on the "a" (client API)
+    or "act" (hosting API) value. A request must obtain a token from every bucket which applies to it.
+    """
+
+    def __init__(self, bucket=None, actions=None):
+        """
+        :param bucket: Optional. Bucket applied to every request.
+        :type bucket: TokenBucket
+        :param actions: Optional. Additional buckets for individual actions, e.g. {'rec_new': TokenBucket(3)}
+        :type actions: dict
+        """
+        self.bucket = bucket
+        self.actions = dict(actions or {})
+
+    def reserve(self, action):
+        """
+        :param action: The action about to be requested
+        :type action: str
+        :return: Number of seconds the caller must wait before sending the request
+        :rtype: float
+        """
+        wait = 0.0
+        for bucket in (self.bucket, self.actions.get(action)):
+            if bucket is not None:
+                wait = max(wait, bucket.reserve())
+        return wait
+
+    def acquire(self, action):
+        """
+        Block until a request for the given action may be sent
+        :param action: The action about to be requested
+        :type action: str
+        """
+        wait = self.reserve(action)
+        if wait > 0:
+            time.sleep(wait)
@@ -0,0 +1,282 @@
+"""
+Recording and replaying of API sessions.
+
+A RecordingTransport writes every request and response passing through a client to a cassette: an append-only file
+of gzip-compressed JSON lines, with credentials removed. A ReplayTransport answers requests from a cassette, with or
+without the recorded latency, and a LoadReplayer issues the recorded calls again through any client, on the recorded
+schedule sped up by a given factor, e.g. against the stand-in server of benchmarks/server.py.
+"""
+__author__ = 'Joe Linn'
+
+import gzip
+import io
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.structures import CaseInsensitiveDict
+from pyflare import bulk
+from pyflare.cache import CREDENTIAL_PARAMS
+from pyflare.coalesce import request_key
+from pyflare.instrumentation import timer
+from pyflare.models import string_types
+from pyflare.transport import SessionTransport, Transport
+
+# Request fields, and response keys at any depth, whose values are replaced before anything is written
+REDACTED_PARAMS = CREDENTIAL_PARAMS | frozenset(['user_key', 'cloudflare_pass'])
+REDACTED_KEYS = frozenset(['user_key', 'user_api_key', 'host_key', 'tkn'])
+REDACTED = 'REDACTED'
+
+
+def redact(data):
+    """
+    :param data: Form fields of a request
+    :type data: dict
+    :return: A copy with the values of REDACTED_PARAMS replaced
+    :rtype: dict
+    """
+    return dict((name, REDACTED if name in REDACTED_PARAMS else value) for name, value in data.items())
+
+
+def redact_body(body):
+    """
+    :param body: Response body
+    :type body: bytes
+    :return: The body as text, with the values of REDACTED_KEYS in a JSON body replaced
+    :rtype: str
+    """
+    text = body.decode('utf-8', 'replace')
+    try:
+        decoded = json.loads(text)
+    except ValueError:
+        return text
+    if not _contains_secret(decoded):
+        return text
+    return json.dumps(_redact_values(decoded), separators=(',', ':'))
+
+
+def _contains_secret(node):
+    if isinstance(node, dict):
+        return any(key in REDACTED_KEYS or _contains_secret(value) for key, value in node.items())
+    if isinstance(node, list):
+        return any(_contains_secret(value) for value in node)
+    return False
+
+
+def _redact_values(node):
+    if isinstance(node, dict):
+        return dict((key, REDACTED if key in REDACTED_KEYS else _redact_values(value)) for key, value in node.items())
+    if isinstance(node, list):
+        return [_redact_values(value) for value in node]
+    return node
+
+
+def build_response(url, status, headers, body):
+    """
+    :param body: Response body
+    :type body: bytes
+    :return: A response which can be parsed like one received over the network, including as a stream
+    :rtype: requests.Response
+    """
+    response = requests.Response()
+    response.url = url
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = 'utf-8'
+    response._content = body
+    response._content_consumed = True
+    response.raw = io.BytesIO(body)
+    return response
+
+
+def read_cassette(path):
+    """
+    :param path: Cassette written by a RecordingTransport
+    :type path: str
+    :return: The recorded exchanges, in the order they completed
+    :rtype: generator of dict
+    """
+    with gzip.open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line.decode('utf-8'))
+
+
+class RecordingTransport(Transport):
+    """
+    Passes requests on to another transport and appends every exchange to a cassette. Each line holds when the request
+    was sent, as a Unix timestamp ("t"), how long it took in seconds ("d"), the URL, the redacted form fields, and the
+    response status, content type and redacted body, or the name of the exception raised. Recording to an existing
+    cassette adds to it. Safe to share between threads.
+    """
+
+    def __init__(self, path, transport=None):
+        """
+        :param path: Cassette file
+        :type path: str
+        :param transport: Optional. Transport to record. Defaults to a new pyflare.transport.SessionTransport.
+        :type transport: pyflare.transport.Transport
+        """
+        if transport is None:
+            transport = SessionTransport()
+        self.transport = transport
+        self.path = path
+        self._file = gzip.open(path, 'ab')
+        self._lock = threading.Lock()
+
+    def post(self, url, data, timeout=None, **kwargs):
+        entry = {'t': round(time.time(), 6), 'url': url, 'data': redact(data)}
+        start = timer()
+        try:
+            response = self.transport.post(url, data, timeout=timeout, **kwargs)
+            body = response.content
+        except requests.RequestException as e:
+            entry.update(d=round(timer() - start, 6), error=type(e).__name__, message=str(e))
+            self._write(entry)
+            raise
+        entry.update(d=round(timer() - start, 6), status=response.status_code,
+                     content_type=response.headers.get('Content-Type'), body=redact_body(body))
+        self._write(entry)
+        # the body has been read, so streamed requests are served from memory
+        headers = {'Content-Type': response.headers.get('Content-Type') or 'application/json'}
+        return build_response(url, response.status_code, headers, body)
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+        self.transport.close()
+
+    def _write(self, entry):
+        line = json.dumps(entry, separators=(',', ':'), sort_keys=True) + '\n'
+        with self._lock:
+            self._file.write(line.encode('utf-8'))
+
+
+class ReplayTransport(Transport):
+    """
+    Answers requests from a cassette without any network access. A request is matched to a recorded one by its form
+    fields, credentials aside; identical requests receive the recorded responses in recorded order, the last one being
+    repeated once they run out. Recorded exceptions are raised again.
+    """
+
+    def __init__(self, path_or_entries, speed=None, sleep=time.sleep):
+        """
+        :param path_or_entries: Cassette file, or entries as returned by read_cassette
+        :type path_or_entries: str or iterable of dict
+        :param speed: Optional. Delay every response by its recorded duration divided by speed, e.g. 1 for the
+            recorded latency or 10 for a tenth of it. By default responses are returned immediately.
+        :type speed: float
+        :param sleep: Called with the delay, in seconds
+        :type sleep: callable
+        """
+        entries = read_cassette(path_or_entries) if isinstance(path_or_entries, string_types) else path_or_entries
+        self.speed = speed
+        self._sleep = sleep
+        self._responses = defaultdict(deque)
+        self._lock = threading.Lock()
+        for entry in entries:
+            self._responses[request_key(entry['data'])].append(entry)
+
+    def post(self, url, data, timeout=None, **kwargs):
+        key = request_key(redact(data))
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                raise LookupError('no recorded response for {0}'.format(key))
+            entry = responses.popleft() if len(responses) > 1 else responses[0]
+        if self.speed:
+            self._sleep(entry.get('d', 0) / float(self.speed))
+        if 'error' in entry:
+            error = getattr(requests.exceptions, entry['error'], requests.RequestException)
+            raise error(entry.get('message'))
+        headers = {'Content-Type': entry.get('content_type') or 'application/json'}
+        return build_response(url, entry['status'], headers, entry['body'].encode('utf-8'))
+
+
+class ReplayResult(bulk.BulkResult):
+    """
+    Outcome of a LoadReplayer run: the response or exception of every recorded call, in recorded order
+    """
+
+    def __init__(self, results, elapsed, lateness):
+        """
+        :param lateness: For every call, the seconds it started after its scheduled time
+        :type lateness: list of float
+        """
+        super(ReplayResult, self).__init__(results, elapsed)
+        self.lateness = lateness
+
+    @property
+    def max_lateness(self):
+        return max(self.lateness) if self.lateness else 0.0
+
+
+class LoadReplayer(object):
+    """
+    Issues the calls of a cassette again, through clients, keeping their recorded spacing compressed by a speed factor.
+    This reproduces the load of a recorded session at 1x, 10x or 100x its rate. Calls are sent with placeholders in
+    place of redacted fields, so the target should be a stand-in server or a ReplayTransport, not Cloudflare itself.
+    If the clients cannot keep up, calls start late; ReplayResult.lateness shows by how much.
+    """
+
+    def __init__(self, client=None, hosting=None, concurrency=32, clock=timer, sleep=time.sleep):
+        """
+        :param client: Optional. Sends recorded client API calls
+        :type client: pyflare.PyflareClient
+        :param hosting: Optional. Sends recorded host API calls
+        :type hosting: pyflare.PyflareHosting
+        :param concurrency: Maximum number of calls in flight
+        :type concurrency: int
+        """
+        if concurrency < 1:
+            raise ValueError('concurrency must be at least 1')
+        self.client = client
+        self.hosting = hosting
+        self.concurrency = concurrency
+        self._clock = clock
+        self._sleep = sleep
+
+    def replay(self, path_or_entries, speed=1.0):
+        """
+        :param path_or_entries: Cassette file, or entries as returned by read_cassette
+        :type path_or_entries: str or iterable of dict
+        :param speed: Factor by which to compress the recorded schedule, or None to send calls as fast as possible
+        :type speed: float
+        :rtype: ReplayResult
+        """
+        entries = read_cassette(path_or_entries) if isinstance(path_or_entries, string_types) else path_or_entries
+        entries = sorted(entries, key=lambda entry: entry['t'])
+        start = self._clock()
+        first = entries[0]['t'] if entries else 0
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for entry in entries:
+                due = start + (entry['t'] - first) / float(speed) if speed else start
+                wait = due - self._clock()
+                if wait > 0:
+                    self._sleep(wait)
+                futures.append(executor.submit(self._call, entry, due))
+        outcomes = [future.result() for future in futures]
+        return ReplayResult([result for result, _ in outcomes], self._clock() - start,
+                            [lateness for _, lateness in outcomes])
+
+    def _call(self, entry, due):
+        lateness = max(self._clock() - due, 0.0)
+        data = dict(entry['data'])
+        client = self.hosting if 'act' in data else self.client
+        if client is None:
+            return ValueError('no client given for {0}'.format(data.get('act') or data.get('a'))), lateness
+        for name in CREDENTIAL_PARAMS:
+            # set again by the client
+            data.pop(name, None)
+        try:
+            return client._request(data), lateness
+        except bulk.CAPTURED_ERRORS as e:
+            return e, lateness
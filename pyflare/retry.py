@@ -0,0 +1,136 @@
+__author__ = 'Joe Linn'
+
+import random
+import threading
+import time
+from collections import Counter
+from requests.exceptions import ConnectionError, ConnectTimeout, HTTPError, Timeout
+from pyflare import APIError
+
+# Actions which only read state
+READ_ACTIONS = frozenset([
+    'stats', 'zone_load_multi', 'rec_load_all', 'zone_check', 'zone_ips', 'ip_lkup', 'zone_settings',   # client API
+    'user_lookup', 'user_auth', 'zone_lookup', 'zone_list',                                             # hosting API
+])
+
+# Actions which can be repeated without changing the outcome: reads, and writes which set an absolute value
+IDEMPOTENT_ACTIONS = READ_ACTIONS | frozenset([
+    'sec_lvl', 'cache_lvl', 'devmode', 'ipv46', 'async', 'minify', 'mirage2', 'wl', 'ban', 'nul', 'rec_edit',
+    'fpurge_ts', 'zone_file_purge', 'zone_grab',
+])
+
+# Error codes for requests which Cloudflare rejected without acting on them
+REJECTED_ERROR_CODES = frozenset(['E_MAXAPI'])
+
+
+class RetryPolicy(object):
+    """
+    Decides whether a failed request is retried, and how long to back off first.
+
+    A request is retried if it failed with a transport error, a timeout or one of the given HTTP statuses and its
+    action is idempotent, or if it never reached Cloudflare (connect timeout) or was rejected outright (one of the
+    given error codes), whatever its action. Back-off grows exponentially with "full jitter", so that many clients
+    recovering from the same outage do not retry in lockstep.
+
+    Counters of attempts, retries, requests which succeeded after retrying and requests which ran out of retries are
+    kept per action in `counters` and are safe to read while requests are in flight.
+    """
+
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=30, jitter=True,
+                 idempotent_actions=IDEMPOTENT_ACTIONS, status_forcelist=(500, 502, 503, 504),
+                 error_codes=REJECTED_ERROR_CODES):
+        """
+        :param max_retries: Maximum number of times a single request is retried
+        :type max_retries: int
+        :param backoff_factor: Back-off before the first retry, in seconds. Doubles with every further retry.
+        :type backoff_factor: float
+        :param max_backoff: Upper bound for a single back-off, in seconds
+        :type max_backoff: float
+        :param jitter: If True, sleep for a random time between zero and the computed back-off
+        :type jitter: bool
+        :param idempotent_actions: Actions (a/act values) which are safe to repeat after an ambiguous failure
+        :type idempotent_actions: collections.Iterable
+        :param status_forcelist: HTTP statuses which are treated as transient failures
+        :type status_forcelist: collections.Iterable
+        :param error_codes: Cloudflare err_code values which are always safe to retry
+        :type error_codes: collections.Iterable
+        """
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.idempotent_actions = frozenset(idempotent_actions)
+        self.status_forcelist = frozenset(status_forcelist)
+        self.error_codes = frozenset(error_codes)
+        self.counters = dict((name, Counter()) for name in ('attempts', 'retries', 'recovered', 'exhausted'))
+        self._lock = threading.Lock()
+
+    def is_retryable(self, action, error):
+        """
+        :param action: The action which failed
+        :type action: str
+        :param error: The exception it failed with
+        :type error: Exception
+        :rtype: bool
+        """
+        if isinstance(error, ConnectTimeout):
+            return True
+        if isinstance(error, APIError):
+            return error.code in self.error_codes
+        if isinstance(error, HTTPError):
+            return action in self.idempotent_actions and error.response is not None and \
+                error.response.status_code in self.status_forcelist
+        if isinstance(error, (ConnectionError, Timeout)):
+            return action in self.idempotent_actions
+        return False
+
+    def backoff(self, retry):
+        """
+        :param retry: Zero-based number of the upcoming retry
+        :type retry: int
+        :return: Seconds to sleep before the retry
+        :rtype: float
+        """
+        delay = min(self.max_backoff, self.backoff_factor * (2 ** retry))
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def call(self, action, func):
+        """
+        Call func, retrying it as this policy allows
+        :param action: The action performed by func
+        :type action: str
+        :param func: Performs a single attempt. Should raise requests.HTTPError for responses with a status in
+            status_forcelist.
+        :type func: callable
+        :return: The result of the first successful attempt
+        """
+        retry = 0
+        while True:
+            self._count('attempts', action)
+            try:
+                result = func()
+            except Exception as e:
+                if not self.is_retryable(action, e):
+                    raise
+                if retry >= self.max_retries:
+                    self._count('exhausted', action)
+                    raise
+                self._count('retries', action)
+                time.sleep(self.backoff(retry))
+                retry += 1
+            else:
+                if retry:
+                    self._count('recovered', action)
+                return result
+
+    def reset(self):
+        """
+        Clear all counters
+        """
+        with self._lock:
+            for counter in self.counters.values():
+                counter.clear()
+
+    def _count(self, name, action):
+        with self._lock:
+            self.counters[name][action] += 1
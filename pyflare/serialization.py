@@ -0,0 +1,76 @@
+__author__ = 'Joe Linn'
+
+import json
+import sys
+from pyflare import APIError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def _stdlib_loads(body):
+    # json.loads only accepts bytes from Python 3.6 on; on Python 2 bytes are str
+    if sys.version_info[:2] in ((3, 4), (3, 5)) and isinstance(body, bytes):
+        body = body.decode('utf-8')
+    return json.loads(body)
+
+
+# Available decoders, fastest first. Each takes a response body as bytes and returns the decoded object, raising
+# ValueError for malformed input.
+DECODERS = {'json': _stdlib_loads}
+if ujson is not None:
+    DECODERS['ujson'] = ujson.loads
+if orjson is not None:
+    DECODERS['orjson'] = orjson.loads
+
+PREFERENCE = ('orjson', 'ujson', 'json')
+
+_decoder = next(DECODERS[name] for name in PREFERENCE if name in DECODERS)
+
+
+def set_decoder(decoder):
+    """
+    Choose the JSON decoder used for all responses. By default the fastest installed one is used.
+    :param decoder: "orjson", "ujson", "json", or a callable taking bytes
+    :type decoder: str or callable
+    """
+    global _decoder
+    if not callable(decoder):
+        try:
+            decoder = DECODERS[decoder]
+        except KeyError:
+            raise ValueError('JSON decoder {0} is not available'.format(decoder))
+    _decoder = decoder
+
+
+def loads(body):
+    """
+    :param body: Raw response body returned from Cloudflare
+    :type body: bytes
+    :return: deserialized json response if valid, else raise APIError
+    :rtype: dict
+    """
+    try:
+        return _decoder(body)
+    except ValueError:
+        raise APIError("Unexpected response from Cloudflare API")
+
+
+def parse(body):
+    """
+    :param body: Raw response body returned from Cloudflare
+    :type body: bytes
+    :return: deserialized json response, raising APIError for error results
+    :rtype: dict
+    """
+    response = loads(body)
+    if response.get('result') == 'error':
+        raise APIError(response['msg'], response.get('err_code'))
+    return response
@@ -0,0 +1,168 @@
+__author__ = 'Joe Linn'
+
+import threading
+from collections import defaultdict
+from pyflare.sync import qualify
+
+
+class RecordStore(object):
+    """
+    In-memory copy of a zone's DNS records, with hash indexes by rec_id, name, type and content so that lookups do not
+    have to scan the zone.
+
+    The store registers itself with the client and is updated in place whenever rec_new, rec_edit or rec_delete
+    succeeds for its zone through that client (including bulk_records and sync_zone). Changes made elsewhere are
+    picked up by refresh(). The store is safe to use from several threads: records saved or deleted through the client
+    while a refresh is fetching the zone are kept as they are, rather than reverted to the fetched state.
+    """
+
+    INDEXED_FIELDS = ('name', 'type', 'content')
+
+    def __init__(self, client, zone, prefetch=0, load=True):
+        """
+        :param client: client to load records through
+        :type client: pyflare.PyflareClient
+        :param zone: domain name
+        :type zone: str
+        :param prefetch: Number of rec_load_all pages to fetch ahead when loading, at the cost of up to as many
+            requests beyond the last page
+        :type prefetch: int
+        :param load: If False, do not load the zone until refresh() is called
+        :type load: bool
+        """
+        self.client = client
+        self.zone = zone
+        self.prefetch = prefetch
+        self._records = {}
+        self._indexes = dict((field, defaultdict(set)) for field in self.INDEXED_FIELDS)
+        self._lock = threading.RLock()
+        # one set per refresh in progress, of the ids changed through the client since it started fetching
+        self._refreshes = []
+        client.add_record_listener(self)
+        if load:
+            self.refresh()
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, rec_id):
+        return str(rec_id) in self._records
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._records.values()))
+
+    def get(self, rec_id):
+        """
+        :param rec_id: DNS Record ID
+        :type rec_id: str or int
+        :return: The record, or None
+        :rtype: dict
+        """
+        return self._records.get(str(rec_id))
+
+    def find(self, name=None, type=None, content=None):
+        """
+        Records matching all of the given criteria, e.g. find(name='www', type='A')
+        :param name: Record name, either fully qualified or relative to the zone
+        :type name: str
+        :param type: Record type
+        :type type: str
+        :param content: Record content
+        :type content: str
+        :return:
+        :rtype: list of dict
+        """
+        criteria = {'name': name, 'type': type, 'content': content}
+        with self._lock:
+            matches = None
+            for field, value in criteria.items():
+                if value is None:
+                    continue
+                ids = self._indexes[field].get(self._normalize(field, value), ())
+                matches = set(ids) if matches is None else matches & ids
+            if matches is None:
+                matches = self._records
+            return [self._records[rec_id] for rec_id in matches]
+
+    def refresh(self):
+        """
+        Re-fetch the zone and apply only the records which were added, changed or removed
+        :return: (number of records added, changed, removed)
+        :rtype: tuple
+        """
+        touched = set()
+        with self._lock:
+            self._refreshes.append(touched)
+        try:
+            fetched = dict((str(record['rec_id']), record)
+                           for record in self.client.rec_load_all(self.zone, prefetch=self.prefetch))
+            added = changed = 0
+            with self._lock:
+                removed = [rec_id for rec_id in self._records if rec_id not in fetched and rec_id not in touched]
+                for rec_id in removed:
+                    self._remove(rec_id)
+                for rec_id, record in fetched.items():
+                    if rec_id in touched:
+                        continue
+                    current = self._records.get(rec_id)
+                    if current is None:
+                        added += 1
+                    elif current != record:
+                        changed += 1
+                    else:
+                        continue
+                    self._put(record)
+            return added, changed, len(removed)
+        finally:
+            with self._lock:
+                self._refreshes = [other for other in self._refreshes if other is not touched]
+
+    def record_saved(self, zone, record):
+        """
+        Called by the client after a record was created or edited
+        """
+        if zone == self.zone and record:
+            with self._lock:
+                self._touch(str(record['rec_id']))
+                self._put(record)
+
+    def record_deleted(self, zone, rec_id):
+        """
+        Called by the client after a record was deleted
+        """
+        if zone == self.zone:
+            with self._lock:
+                self._touch(str(rec_id))
+                self._remove(str(rec_id))
+
+    def _touch(self, rec_id):
+        for touched in self._refreshes:
+            touched.add(rec_id)
+
+    def _put(self, record):
+        rec_id = str(record['rec_id'])
+        self._remove(rec_id)
+        self._records[rec_id] = record
+        for field in self.INDEXED_FIELDS:
+            self._indexes[field][self._normalize(field, record.get(field))].add(rec_id)
+
+    def _remove(self, rec_id):
+        record = self._records.pop(rec_id, None)
+        if record is None:
+            return
+        for field in self.INDEXED_FIELDS:
+            key = self._normalize(field, record.get(field))
+            ids = self._indexes[field][key]
+            ids.discard(rec_id)
+            if not ids:
+                del self._indexes[field][key]
+
+    def _normalize(self, field, value):
+        if value is None:
+            return None
+        if field == 'name':
+            return qualify(value, self.zone)
+        if field == 'type':
+            return value.upper()
+        return value
@@ -0,0 +1,128 @@
+__author__ = 'Joe Linn'
+
+from decimal import Decimal
+from pyflare import APIError
+from pyflare import serialization
+from pyflare.instrumentation import timer
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:
+    ijson = None
+
+SCALAR_EVENTS = frozenset(['string', 'number', 'boolean', 'null'])
+
+
+class ItemStream(object):
+    """
+    Iterates over the elements of the list at a given path of a response, e.g. "response.recs.objs".
+
+    When ijson is installed the body is parsed incrementally as it is read from the socket, and each element is
+    yielded as soon as it is complete, so only one element is held in memory at a time. Otherwise the whole body is
+    decoded first. Either way, once the stream is exhausted fields holds the scalar values found outside of lists in
+    the response, keyed by their dotted path, e.g. {'result': 'success', 'response.recs.count': 7}. APIError is raised
+    for error results.
+
+    read_time holds the time spent reading and parsing the body so far. If on_close is set, it is called once with the
+    stream and the exception raised, if any, when the stream is exhausted, fails or is closed.
+    """
+
+    def __init__(self, response, path, on_close=None):
+        """
+        :param response: Response returned from Cloudflare, requested with stream=True
+        :type response: requests.Response
+        :param path: dotted path of the list to iterate over
+        :type path: str
+        :param on_close: Optional. Called with the stream and the exception raised, or None, once it is done
+        :type on_close: callable
+        """
+        self.response = response
+        self.path = path
+        self.on_close = on_close
+        self.fields = {}
+        self.read_time = 0.0
+        self._items = self._parse() if ijson is not None else self._decode()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = timer()
+        try:
+            item = next(self._items)
+        except Exception as e:
+            self.read_time += timer() - start
+            self._finish(None if isinstance(e, StopIteration) else e)
+            raise
+        self.read_time += timer() - start
+        return item
+
+    next = __next__
+
+    def close(self):
+        """
+        Stop reading the response and release its connection
+        """
+        self._items.close()
+        self.response.close()
+        self._finish(None)
+
+    def _finish(self, error):
+        on_close, self.on_close = self.on_close, None
+        if on_close is not None:
+            on_close(self, error)
+
+    def _parse(self):
+        prefix = self.path + '.item'
+        builder = end_event = None
+        raw = self.response.raw
+        raw.decode_content = True
+        try:
+            for current, event, value in ijson.parse(raw):
+                if isinstance(value, Decimal):
+                    value = float(value)
+                if builder is not None:
+                    if current == prefix and event == end_event:
+                        yield builder.value
+                        builder = None
+                    else:
+                        builder.event(event, value)
+                elif current == prefix:
+                    if event in ('start_map', 'start_array'):
+                        builder = ObjectBuilder()
+                        end_event = event.replace('start', 'end')
+                        builder.event(event, value)
+                    else:
+                        yield value
+                elif event in SCALAR_EVENTS and 'item' not in current.split('.'):
+                    self.fields[current] = value
+        except ijson.JSONError:
+            raise APIError("Unexpected response from Cloudflare API")
+        finally:
+            self.response.close()
+        self._check()
+
+    def _decode(self):
+        try:
+            response = serialization.loads(self.response.content)
+        finally:
+            self.response.close()
+        self._collect(response, '')
+        self._check()
+        items = response
+        for key in self.path.split('.'):
+            items = items.get(key) if isinstance(items, dict) else None
+        for item in items or ():
+            yield item
+
+    def _collect(self, node, prefix):
+        for key, value in node.items():
+            if isinstance(value, dict):
+                self._collect(value, prefix + key + '.')
+            elif not isinstance(value, list):
+                self.fields[prefix + key] = value
+
+    def _check(self):
+        if self.fields.get('result') == 'error':
+            raise APIError(self.fields.get('msg'), self.fields.get('err_code'))
@@ -0,0 +1,225 @@
+__author__ = 'Joe Linn'
+
+from collections import defaultdict
+from pyflare import bulk
+
+# Record attributes compared between existing and desired records, besides type, name and content
+COMPARED_FIELDS = ('ttl', 'prio', 'service_mode')
+
+# Record fields, as returned by rec_load_all, and the rec_new/rec_edit arguments they map to
+FIELD_ARGUMENTS = {
+    'ttl': 'ttl',
+    'prio': 'priority',
+    'service': 'service',
+    'srvname': 'service_name',
+    'protocol': 'protocol',
+    'weight': 'weight',
+    'port': 'port',
+    'target': 'target',
+}
+
+HOSTNAME_CONTENT_TYPES = frozenset(['CNAME', 'MX', 'NS', 'SRV'])
+
+
+def qualify(name, zone):
+    """
+    :param name: Record name, either fully qualified, relative to the zone or "@" for the zone apex
+    :type name: str
+    :param zone: domain name
+    :type zone: str
+    :return: Fully qualified record name, as returned by rec_load_all
+    :rtype: str
+    """
+    name = name.rstrip('.').lower()
+    if name in ('', '@'):
+        return zone
+    if name == zone or name.endswith('.' + zone):
+        return name
+    return '{0}.{1}'.format(name, zone)
+
+
+def record_key(record, zone):
+    """
+    :return: (type, fully qualified name, content) identifying the record
+    :rtype: tuple
+    """
+    record_type = record['type'].upper()
+    content = record['content']
+    if record_type in HOSTNAME_CONTENT_TYPES:
+        content = content.rstrip('.').lower()
+    return record_type, qualify(record['name'], zone), content
+
+
+class ZonePlan(object):
+    """
+    The changes needed to make a zone's records match a desired state. str() renders a dry-run summary.
+    """
+
+    def __init__(self, zone, creates, edits, deletes):
+        """
+        :param zone: domain name
+        :type zone: str
+        :param creates: desired records which do not exist yet
+        :type creates: list of dict
+        :param edits: (existing record, desired record) pairs, where the existing record is updated in place
+        :type edits: list of tuple
+        :param deletes: existing records which are not wanted
+        :type deletes: list of dict
+        """
+        self.zone = zone
+        self.creates = creates
+        self.edits = edits
+        self.deletes = deletes
+        self.result = None
+
+    def __len__(self):
+        return len(self.creates) + len(self.edits) + len(self.deletes)
+
+    def __str__(self):
+        lines = ['+ {0} {1} {2}'.format(*record_key(record, self.zone)) for record in self.creates]
+        lines += ['~ {0} {1} {2} -> {3}'.format(*(record_key(existing, self.zone) + (desired['content'],)))
+                  for existing, desired in self.edits]
+        lines += ['- {0} {1} {2}'.format(*record_key(record, self.zone)) for record in self.deletes]
+        return '\n'.join(lines)
+
+    def operations(self):
+        """
+        :return: bulk_records operations carrying out the plan, in three phases which are run one after another.
+            First the deletes which must complete before a create can succeed, as a CNAME cannot coexist with other
+            records of the same name. Then creates and edits, so that other names keep resolving throughout, and
+            finally the remaining deletes.
+        :rtype: tuple of list
+        """
+        create_names = defaultdict(set)
+        for record in self.creates:
+            record_type, name, _ = record_key(record, self.zone)
+            create_names[name].add(record_type)
+
+        early_deletes, late_deletes = [], []
+        for record in self.deletes:
+            record_type, name, _ = record_key(record, self.zone)
+            types = create_names.get(name)
+            conflicts = types and ('CNAME' in types or record_type == 'CNAME')
+            (early_deletes if conflicts else late_deletes).append(self._delete(record))
+
+        changes = [self._edit(existing, desired) for existing, desired in self.edits] + \
+            [self._create(record) for record in self.creates]
+        return early_deletes, changes, late_deletes
+
+    def execute(self, client, concurrency=8):
+        """
+        Carry out the plan, waiting for each phase of operations() to complete before starting the next
+        :param client: client to make the changes through
+        :type client: pyflare.PyflareClient
+        :param concurrency: Number of requests to keep in flight
+        :type concurrency: int
+        :return: outcome of every operation, in the order of the phases. Also stored in self.result.
+        :rtype: pyflare.bulk.BulkResult
+        """
+        results, elapsed = [], 0.0
+        for phase in self.operations():
+            if phase:
+                outcome = client.bulk_records(phase, concurrency)
+                results.extend(outcome.results)
+                elapsed += outcome.elapsed
+        self.result = bulk.BulkResult(results, elapsed)
+        return self.result
+
+    def _create(self, record):
+        operation = {
+            'action': 'rec_new',
+            'zone': self.zone,
+            'record_type': record['type'].upper(),
+            'name': qualify(record['name'], self.zone),
+            'content': record['content'],
+        }
+        operation.update(self._arguments(record))
+        return operation
+
+    def _edit(self, existing, desired):
+        operation = {
+            'action': 'rec_edit',
+            'zone': self.zone,
+            'record_type': desired['type'].upper(),
+            'record_id': existing['rec_id'],
+            'name': qualify(desired['name'], self.zone),
+            'content': desired['content'],
+        }
+        # rec_edit replaces the whole record, so unspecified attributes are carried over from the existing one
+        operation.update(self._arguments(existing))
+        operation.update(self._arguments(desired))
+        service_mode = desired.get('service_mode', existing.get('service_mode'))
+        if service_mode is not None:
+            operation['service_mode'] = service_mode
+        return operation
+
+    def _delete(self, record):
+        return {'action': 'rec_delete', 'zone': self.zone, 'record_id': record['rec_id']}
+
+    @staticmethod
+    def _arguments(record):
+        return dict((argument, record[field]) for field, argument in FIELD_ARGUMENTS.items()
+                    if record.get(field) is not None)
+
+
+def plan_zone(zone, existing_records, desired_records, types=None):
+    """
+    Compute the minimal set of creates, edits and deletes turning existing_records into desired_records.
+
+    Records are matched on (type, name, content) through a hash index. Matched records are left alone, or edited if
+    their ttl, prio or service_mode differ from those given in the desired record. Remaining desired records are paired
+    with remaining existing records of the same type and name, which are edited to the new content, so a changed
+    address costs one request instead of a delete and a create. Anything left over is created or deleted.
+    :param zone: domain name
+    :type zone: str
+    :param existing_records: records as returned by rec_load_all
+    :type existing_records: iterable of dict
+    :param desired_records: records with at least type, name and content, in the format of rec_load_all. Names may
+        be relative to the zone.
+    :type desired_records: iterable of dict
+    :param types: Optional. Record types to manage. Existing records of other types are never touched.
+    :type types: iterable of str
+    :rtype: ZonePlan
+    """
+    if types is not None:
+        types = frozenset(record_type.upper() for record_type in types)
+
+    def managed(record):
+        return types is None or record['type'].upper() in types
+
+    index = defaultdict(list)
+    positions = {}
+    for position, record in enumerate(existing_records):
+        if managed(record):
+            index[record_key(record, zone)].append(record)
+            positions[id(record)] = position
+
+    edits, unmatched = [], []
+    for record in desired_records:
+        if not managed(record):
+            continue
+        matches = index.get(record_key(record, zone))
+        if matches:
+            existing = matches.pop()
+            if any(record.get(field) is not None and str(record[field]) != str(existing.get(field))
+                   for field in COMPARED_FIELDS):
+                edits.append((existing, record))
+        else:
+            unmatched.append(record)
+
+    leftovers = defaultdict(list)
+    for (record_type, name, _), records in index.items():
+        leftovers[record_type, name].extend(records)
+
+    creates = []
+    for record in unmatched:
+        record_type, name, _ = record_key(record, zone)
+        candidates = leftovers.get((record_type, name))
+        if candidates:
+            edits.append((candidates.pop(), record))
+        else:
+            creates.append(record)
+
+    deletes = sorted((record for records in leftovers.values() for record in records),
+                     key=lambda record: positions[id(record)])
+    return ZonePlan(zone, creates, edits, deletes)
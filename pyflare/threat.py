@@ -0,0 +1,90 @@
+__author__ = 'Joe Linn'
+
+import threading
+import time
+from collections import Counter
+from pyflare import access
+from pyflare import bulk
+from pyflare.cache import MemoryCache
+from pyflare.coalesce import SingleFlight
+
+
+class ThreatScoreService(object):
+    """
+    Cached threat score lookups on top of ip_lkup.
+
+    Scores are kept in a bounded LRU cache for ttl seconds, so repeat lookups of an address do not leave the process.
+    Concurrent lookups of the same uncached address share one ip_lkup call. Failed lookups are not cached. Cache hits
+    and misses are counted in `counters`.
+    """
+
+    def __init__(self, client, maxsize=100000, ttl=300, clock=time.time):
+        """
+        :param client: client to look addresses up through
+        :type client: pyflare.PyflareClient
+        :param maxsize: Maximum number of addresses to keep scores for. The least recently used is evicted first.
+        :type maxsize: int
+        :param ttl: Seconds a score is reused for
+        :type ttl: float
+        :param clock: Time source, in seconds
+        :type clock: callable
+        """
+        self.client = client
+        self.ttl = ttl
+        self.counters = Counter()
+        self._cache = MemoryCache(maxsize, clock)
+        self._single_flight = SingleFlight()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def score(self, ip):
+        """
+        :param ip: the target IP
+        :type ip: str
+        :return: The threat score, as returned by ip_lkup, e.g. "BAD:0"
+        :rtype: str
+        """
+        ip = access.canonical(ip)
+        score = self._cache.get(ip)
+        if score is not None:
+            self._count('hits')
+            return score
+        self._count('misses')
+        return self._single_flight.do(ip, lambda: self._lookup(ip))
+
+    def scores(self, ips, concurrency=8):
+        """
+        Look many addresses up at once, concurrently for those which are not cached
+        :param ips: the target IPs
+        :type ips: iterable of str
+        :param concurrency: Number of requests to keep in flight
+        :type concurrency: int
+        :return: Score, or the exception raised looking it up, by address as given
+        :rtype: dict
+        """
+        return dict(bulk.run_unordered(((ip, lambda ip=ip: self.score(ip)) for ip in set(ips)), concurrency))
+
+    def invalidate(self, ip=None):
+        """
+        Forget the score of an address, or of all addresses if none is given
+        """
+        if ip is None:
+            self._cache.clear()
+        else:
+            self._cache.delete(access.canonical(ip))
+
+    def _lookup(self, ip):
+        scores = self.client.ip_lkup(ip)['response']
+        score = scores.get(ip)
+        if score is None and len(scores) == 1:
+            # the address may be echoed in a different notation
+            score = next(iter(scores.values()))
+        if score is not None:
+            self._cache.set(ip, score, self.ttl)
+        return score
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
@@ -0,0 +1,287 @@
+__author__ = 'Joe Linn'
+
+import json
+import math
+import numbers
+import os
+import struct
+import sys
+import time
+from array import array
+
+MAGIC = b'PFTS'
+
+# Numeric leaves of a stats() snapshot stored as columns, besides its cachedServerTime
+STATS_COLUMNS = (
+    'trafficBreakdown.pageviews.regular',
+    'trafficBreakdown.pageviews.threat',
+    'trafficBreakdown.pageviews.crawler',
+    'trafficBreakdown.uniques.regular',
+    'trafficBreakdown.uniques.threat',
+    'trafficBreakdown.uniques.crawler',
+    'bandwidthServed.cloudflare',
+    'bandwidthServed.user',
+    'requestsServed.cloudflare',
+    'requestsServed.user',
+)
+
+DOWNSAMPLERS = {
+    'last': lambda values: values[-1],
+    'first': lambda values: values[0],
+    'max': max,
+    'min': min,
+    'mean': lambda values: sum(values) / len(values),
+}
+
+
+def flatten(snapshot, columns=STATS_COLUMNS):
+    """
+    :param snapshot: One object of a stats() response
+    :type snapshot: dict
+    :return: The value at each dotted path of columns, NaN where missing
+    :rtype: list of float
+    """
+    values = []
+    for column in columns:
+        node = snapshot
+        for key in column.split('.'):
+            node = node.get(key) if isinstance(node, dict) else None
+        numeric = isinstance(node, numbers.Number) and not isinstance(node, bool)
+        values.append(float(node) if numeric else float('nan'))
+    return values
+
+
+class TimeSeriesFile(object):
+    """
+    Append-only file of fixed-size rows of doubles: a timestamp followed by one value per column. Rows are kept in
+    increasing timestamp order, so a time range is found by binary search over the file without reading it all.
+    """
+
+    def __init__(self, path, columns=STATS_COLUMNS):
+        """
+        :param path: File to read and append to, created if missing
+        :type path: str
+        :param columns: Names of the value columns. Ignored if the file exists, in which case its own are used.
+        :type columns: tuple of str
+        """
+        self.path = path
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                if f.read(4) != MAGIC:
+                    raise ValueError('{0} is not a time series file'.format(path))
+                length, = struct.unpack('<I', f.read(4))
+                self.columns = tuple(json.loads(f.read(length).decode('utf-8'))['columns'])
+                self._data_offset = 8 + length
+        else:
+            self.columns = tuple(columns)
+            header = json.dumps({'columns': self.columns}).encode('utf-8')
+            with open(path, 'wb') as f:
+                f.write(MAGIC + struct.pack('<I', len(header)) + header)
+            self._data_offset = 8 + len(header)
+        self._width = len(self.columns) + 1
+        self._row_size = 8 * self._width
+
+    def __len__(self):
+        return (os.path.getsize(self.path) - self._data_offset) // self._row_size
+
+    def append(self, timestamp, values):
+        """
+        :param timestamp: Must be greater than that of the last row
+        :type timestamp: float
+        :param values: One value per column
+        :type values: list of float
+        """
+        last = self.last()
+        if last is not None and timestamp <= last[0]:
+            raise ValueError('timestamp {0} is not after the last row, {1}'.format(timestamp, last[0]))
+        row = array('d', [timestamp] + list(values))
+        if len(row) != self._width:
+            raise ValueError('expected {0} values'.format(len(self.columns)))
+        if sys.byteorder == 'big':
+            row.byteswap()
+        end = self._data_offset + len(self) * self._row_size
+        with open(self.path, 'r+b') as f:
+            # drop any partial row left by an interrupted write, which would misalign every row appended after it
+            f.truncate(end)
+            f.seek(end)
+            f.write(row.tobytes() if hasattr(row, 'tobytes') else row.tostring())
+
+    def last(self):
+        """
+        :return: (timestamp, values) of the last row, or None if there is none
+        :rtype: tuple
+        """
+        count = len(self)
+        if not count:
+            return None
+        with open(self.path, 'rb') as f:
+            row = self._read(f, count - 1, 1)
+        return row[0], list(row[1:])
+
+    def range(self, start=None, end=None):
+        """
+        :param start: Optional. Earliest timestamp to include
+        :type start: float
+        :param end: Optional. Timestamp to stop before
+        :type end: float
+        :return: Columns of the rows in the range: 'time' and every value column, each a list
+        :rtype: dict
+        """
+        with open(self.path, 'rb') as f:
+            count = len(self)
+            first = self._search(f, start, count) if start is not None else 0
+            stop = self._search(f, end, count) if end is not None else count
+            rows = self._read(f, first, max(stop - first, 0))
+        result = {'time': list(rows[0::self._width])}
+        for index, column in enumerate(self.columns):
+            result[column] = list(rows[index + 1::self._width])
+        return result
+
+    def _search(self, f, timestamp, count):
+        # index of the first row at or after timestamp
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if self._read(f, middle, 1)[0] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _read(self, f, first, count):
+        f.seek(self._data_offset + first * self._row_size)
+        rows = array('d')
+        data = f.read(count * self._row_size)
+        if hasattr(rows, 'frombytes'):
+            rows.frombytes(data)
+        else:
+            rows.fromstring(data)
+        if sys.byteorder == 'big':
+            rows.byteswap()
+        return rows
+
+
+def downsample(series, step, how='last'):
+    """
+    :param series: Columns as returned by TimeSeriesFile.range
+    :type series: dict
+    :param step: Width of a bucket, in the unit of the timestamps
+    :type step: float
+    :param how: How to combine the values in a bucket: last, first, max, min or mean
+    :type how: str
+    :return: Columns with one row per non-empty bucket, timestamped with the bucket's start
+    :rtype: dict
+    """
+    combine = DOWNSAMPLERS[how]
+    buckets = []
+    for index, timestamp in enumerate(series['time']):
+        bucket = math.floor(timestamp / step) * step
+        if not buckets or buckets[-1][0] != bucket:
+            buckets.append((bucket, []))
+        buckets[-1][1].append(index)
+    result = {'time': [bucket for bucket, _ in buckets]}
+    for column, values in series.items():
+        if column != 'time':
+            result[column] = [combine([values[index] for index in indexes]) for _, indexes in buckets]
+    return result
+
+
+class StatsCollector(object):
+    """
+    Polls stats() for many zones and appends each new snapshot, flattened, to one TimeSeriesFile per zone. Snapshots
+    whose cachedServerTime has already been stored are skipped, so polling more often than Cloudflare refreshes its
+    statistics costs no space.
+    """
+
+    def __init__(self, client, directory, interval=20):
+        """
+        :param client: client to poll through
+        :type client: pyflare.PyflareClient
+        :param directory: Directory holding a <zone>.ts file per zone, created if missing
+        :type directory: str
+        :param interval: Stats interval to poll, see stats()
+        :type interval: int
+        """
+        self.client = client
+        self.directory = directory
+        self.interval = interval
+        self._files = {}
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def series(self, zone):
+        """
+        :rtype: TimeSeriesFile
+        """
+        series = self._files.get(zone)
+        if series is None:
+            series = self._files[zone] = TimeSeriesFile(os.path.join(self.directory, zone + '.ts'))
+        return series
+
+    def record(self, zone, response):
+        """
+        Store a stats() response
+        :return: True if it held a snapshot which was not stored yet
+        :rtype: bool
+        """
+        try:
+            snapshot = response['response']['result']['objs'][0]
+            timestamp = snapshot['cachedServerTime']
+        except (KeyError, IndexError, TypeError):
+            return False
+        series = self.series(zone)
+        last = series.last()
+        if last is not None and timestamp <= last[0]:
+            return False
+        series.append(timestamp, flatten(snapshot, series.columns))
+        return True
+
+    def poll(self, zones=None, concurrency=8):
+        """
+        Fetch and store the current stats of many zones concurrently
+        :param zones: Optional. Domain names. Defaults to all zones in the account.
+        :type zones: iterable of str
+        :param concurrency: Number of requests to keep in flight
+        :type concurrency: int
+        :return: For every zone, whether a new snapshot was stored, or the exception raised fetching it
+        :rtype: dict
+        """
+        outcomes = {}
+        for zone, response in self.client.fan_out('stats', zones, concurrency, interval=self.interval):
+            outcomes[zone] = response if isinstance(response, Exception) else self.record(zone, response)
+        return outcomes
+
+    def run(self, period, zones=None, concurrency=8, stop=None):
+        """
+        Poll every period seconds until stop is set
+        :param period: Seconds between polls
+        :type period: float
+        :param stop: Optional. Ends polling when set; without it polling runs forever
+        :type stop: threading.Event
+        """
+        while stop is None or not stop.is_set():
+            started = time.time()
+            self.poll(zones, concurrency)
+            remaining = period - (time.time() - started)
+            if stop is not None:
+                stop.wait(max(remaining, 0))
+            elif remaining > 0:
+                time.sleep(remaining)
+
+    def query(self, zone, start=None, end=None, step=None, how='last'):
+        """
+        :param zone: domain name
+        :type zone: str
+        :param start: Optional. Earliest cachedServerTime to include, in milliseconds
+        :type start: float
+        :param end: Optional. cachedServerTime to stop before, in milliseconds
+        :type end: float
+        :param step: Optional. Downsample to one row per step milliseconds
+        :type step: float
+        :param how: How downsampling combines values, see downsample()
+        :type how: str
+        :return: Columns: 'time' and every stored field, each a list
+        :rtype: dict
+        """
+        series = self.series(zone).range(start, end)
+        return downsample(series, step, how) if step else series
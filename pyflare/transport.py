@@ -0,0 +1,320 @@
+"""
+Transports send the form-encoded POST requests of PyflareClient and PyflareHosting.
+
+SessionTransport, the default, goes through a requests.Session. Urllib3Transport talks to a urllib3 pool directly,
+skipping the per-request work of requests. HttpxTransport uses httpx, and can multiplex concurrent requests over a
+single HTTP/2 connection. Whatever the transport, failures are raised as the requests exceptions which the retry
+policy and bulk calls already handle, and responses have the members of requests.Response the clients use.
+"""
+__author__ = 'Joe Linn'
+
+import socket
+import requests
+from requests.adapters import HTTPAdapter
+import urllib3
+from urllib3 import exceptions as urllib3_exceptions
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+FORM_CONTENT_TYPE = 'application/x-www-form-urlencoded'
+
+
+def encode_form(data):
+    """
+    :param data: Form fields. Fields set to None are left out, as requests does.
+    :type data: dict
+    :return: URL-encoded request body
+    :rtype: str
+    """
+    fields = []
+    for name, value in data.items():
+        if value is None:
+            continue
+        if isinstance(value, text_type):
+            value = value.encode('utf-8')
+        fields.append((name, value))
+    return urlencode(fields)
+
+
+def _timeouts(timeout):
+    # a single value or a (connect, read) tuple, as taken by requests
+    if isinstance(timeout, tuple):
+        return timeout
+    return timeout, timeout
+
+
+class SentRequest(object):
+    """
+    The parts of a sent request kept with its response
+    """
+
+    __slots__ = ('method', 'url', 'body')
+
+    def __init__(self, method, url, body):
+        self.method = method
+        self.url = url
+        self.body = body
+
+
+class Response(object):
+    """
+    Response of a transport other than SessionTransport, with the members of requests.Response the clients use
+    """
+
+    def __init__(self, url, status_code, headers, content=None, raw=None, request=None, reason=None):
+        """
+        :param content: The body, if it has been read
+        :type content: bytes
+        :param raw: File-like object to read the body from, if it has not
+        :param request: The request this response answers
+        :type request: SentRequest
+        """
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.raw = raw
+        self.request = request
+        self.reason = reason
+        self._content = content
+
+    @property
+    def content(self):
+        if self._content is None:
+            try:
+                self._content = self.raw.read()
+            finally:
+                self.close()
+        return self._content
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            raise requests.HTTPError('{0} {1} for url: {2}'.format(self.status_code, self.reason or 'Error', self.url),
+                                     response=self)
+
+    def close(self):
+        close = getattr(self.raw, 'close', None)
+        if close is not None:
+            close()
+
+
+class Transport(object):
+    """
+    Sends the requests of a client. Implementations must be safe to use from several threads at once.
+    """
+
+    def post(self, url, data, timeout=None, **kwargs):
+        """
+        :param url: API endpoint
+        :type url: str
+        :param data: Form fields
+        :type data: dict
+        :param timeout: Optional. Seconds to wait for the server, either a single value or a (connect, read) tuple
+        :type timeout: float or tuple
+        :param kwargs: stream, to leave the body unread until response.raw is consumed, and verify
+        :return: requests.Response or Response
+        :raise requests.RequestException: if no response was received
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release any connections held
+        """
+
+
+class SessionTransport(Transport):
+    """
+    Sends requests through a pooled, keep-alive requests.Session
+    """
+
+    def __init__(self, session=None, pool_connections=10, pool_maxsize=10, pool_block=False):
+        """
+        :param session: Optional. A pre-configured session to send requests through, which is not closed by close().
+            Without one, a session is created with the given pool settings.
+        :type session: requests.Session
+        :param pool_connections: Number of per-host connection pools to keep
+        :type pool_connections: int
+        :param pool_maxsize: Maximum number of connections kept open to a single host
+        :type pool_maxsize: int
+        :param pool_block: If True, wait for a free connection once pool_maxsize connections are in use
+        :type pool_block: bool
+        """
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._owns_session = True
+        else:
+            self._owns_session = False
+        self.session = session
+
+    def post(self, url, data, timeout=None, **kwargs):
+        return self.session.post(url, data=data, timeout=timeout, **kwargs)
+
+    def close(self):
+        if self._owns_session:
+            self.session.close()
+
+
+class Urllib3Transport(Transport):
+    """
+    Sends requests through a urllib3 PoolManager directly. Certificates are always verified, against the bundle used
+    by requests.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False):
+        """
+        :param pool_connections: Number of per-host connection pools to keep
+        :type pool_connections: int
+        :param pool_maxsize: Maximum number of connections kept open to a single host
+        :type pool_maxsize: int
+        :param pool_block: If True, wait for a free connection once pool_maxsize connections are in use
+        :type pool_block: bool
+        """
+        self.pool = urllib3.PoolManager(num_pools=pool_connections, maxsize=pool_maxsize, block=pool_block,
+                                        retries=False, cert_reqs='CERT_REQUIRED', ca_certs=requests.certs.where())
+
+    def post(self, url, data, timeout=None, stream=False, **kwargs):
+        body = encode_form(data)
+        connect, read = _timeouts(timeout)
+        try:
+            response = self.pool.request('POST', url, body=body, headers={'Content-Type': FORM_CONTENT_TYPE},
+                                         timeout=urllib3.Timeout(connect=connect, read=read),
+                                         preload_content=not stream, redirect=False)
+        except urllib3_exceptions.NewConnectionError as e:
+            raise requests.ConnectionError(e)
+        except urllib3_exceptions.ConnectTimeoutError as e:
+            raise requests.ConnectTimeout(e)
+        except urllib3_exceptions.ReadTimeoutError as e:
+            raise requests.ReadTimeout(e)
+        except urllib3_exceptions.SSLError as e:
+            raise requests.exceptions.SSLError(e)
+        except urllib3_exceptions.HTTPError as e:
+            raise requests.ConnectionError(e)
+        return Response(url, response.status, response.headers, content=None if stream else response.data,
+                        raw=response, request=SentRequest('POST', url, body), reason=response.reason)
+
+    def close(self):
+        self.pool.clear()
+
+
+class _ChunkReader(object):
+    # file-like view of an iterator of byte chunks, for incremental parsers
+    def __init__(self, chunks, response):
+        self._chunks = chunks
+        self._response = response
+        self._buffer = b''
+        self.decode_content = True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def close(self):
+        self._response.close()
+
+
+class HttpxTransport(Transport):
+    """
+    Sends requests through an httpx client, over HTTP/2 when the server supports it, so that concurrent requests share
+    one connection instead of a pool of them. Requires httpx with HTTP/2 support (pip install pyflare[http2]).
+    """
+
+    def __init__(self, http2=True, pool_maxsize=10, client=None):
+        """
+        :param http2: Whether to negotiate HTTP/2
+        :type http2: bool
+        :param pool_maxsize: Maximum number of connections kept open
+        :type pool_maxsize: int
+        :param client: Optional. A pre-configured httpx.Client, which is not closed by close()
+        :type client: httpx.Client
+        """
+        if client is None:
+            if httpx is None:
+                raise ImportError('HttpxTransport requires httpx, install pyflare[http2]')
+            limits = httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize)
+            try:
+                # headers and body go out in separate writes, which Nagle's algorithm would hold back
+                pool = httpx.HTTPTransport(http2=http2, limits=limits,
+                                           socket_options=[(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)])
+            except TypeError:
+                # httpx before 0.24 has no socket_options
+                pool = httpx.HTTPTransport(http2=http2, limits=limits)
+            client = httpx.Client(transport=pool)
+            self._owns_client = True
+        else:
+            self._owns_client = False
+        self.client = client
+
+    def post(self, url, data, timeout=None, stream=False, **kwargs):
+        body = encode_form(data)
+        connect, read = _timeouts(timeout)
+        request = self.client.build_request('POST', url, content=body, headers={'Content-Type': FORM_CONTENT_TYPE},
+                                            timeout=httpx.Timeout(read, connect=connect))
+        try:
+            response = self.client.send(request, stream=stream)
+        except httpx.ConnectTimeout as e:
+            raise requests.ConnectTimeout(e)
+        except httpx.TimeoutException as e:
+            raise requests.ReadTimeout(e)
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(e)
+        sent = SentRequest('POST', url, body)
+        if stream:
+            return Response(url, response.status_code, response.headers, raw=_ChunkReader(response.iter_bytes(),
+                                                                                          response),
+                            request=sent, reason=response.reason_phrase)
+        return Response(url, response.status_code, response.headers, content=response.content, request=sent,
+                        reason=response.reason_phrase)
+
+    def close(self):
+        if self._owns_client:
+            self.client.close()
+
+
+# Transports which can be chosen by name
+TRANSPORTS = {
+    'requests': SessionTransport,
+    'urllib3': Urllib3Transport,
+    'httpx': HttpxTransport,
+}
+
+
+def create(name, session=None, pool_connections=10, pool_maxsize=10, pool_block=False):
+    """
+    :param name: requests, urllib3 or httpx
+    :type name: str
+    :return: A transport with the given pool settings, as far as it supports them
+    :rtype: Transport
+    """
+    if name == 'requests':
+        return SessionTransport(session, pool_connections, pool_maxsize, pool_block)
+    if session is not None:
+        raise ValueError('a session can only be used with the requests transport')
+    if name == 'urllib3':
+        return Urllib3Transport(pool_connections, pool_maxsize, pool_block)
+    if name == 'httpx':
+        return HttpxTransport(pool_maxsize=pool_maxsize)
+    raise ValueError('transport has to be one of {0}'.format(', '.join(sorted(TRANSPORTS))))
@@ -14,7 +14,14 @@ setup(
     author_email='',
     description="An adapter for CloudFlare's client API",
     long_description=long_description,
-    install_requires=['requests'],
+    install_requires=['requests', 'futures; python_version < "3"', 'ipaddress; python_version < "3"'],
+    extras_require={
+        'aio': ['aiohttp>=3.3'],
+        'stream': ['ijson'],
+        'analytics': ['numpy'],
+        'http2': ['httpx[http2]; python_version >= "3.6"'],
+        'fast': ['orjson; python_version >= "3.6"', 'ujson; python_version < "3.6"'],
+    },
     classifiers=[
         'Intended Audience :: Developers',
         'Development Status :: 5 - Production/Stable',
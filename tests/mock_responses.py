@@ -2,7 +2,17 @@ __author__ = 'Joe Linn'
 
 import functools
 import json
+import threading
+import unittest
 import httpretty
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs
 from pyflare import PyflareClient
 from pyflare import PyflareHosting
 
@@ -69,3 +79,79 @@ hosting_responses = {
     }
 
 
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def serve_responses(responses, action_key):
+    """
+    Serve canned responses from a real local HTTP server, for transports that httpretty cannot patch and for
+    concurrent requests, which httpretty does not handle reliably.
+    The response body is chosen by the value of the action_key form field, or returned by responses if it is a
+    callable taking the parsed form fields. A (status, body) tuple sets the HTTP status as well.
+    :return: the running server and its url
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length).decode('utf-8')
+            params = dict((key, values[0]) for key, values in parse_qs(body).items())
+            if callable(responses):
+                payload = responses(params)
+            else:
+                payload = responses[params[action_key]]
+            status = 200
+            if isinstance(payload, tuple):
+                status, payload = payload
+            payload = payload.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05})
+    thread.daemon = True
+    thread.start()
+    return server, 'http://127.0.0.1:{0}/'.format(server.server_address[1])
+
+
+class LocalServerTestCase(unittest.TestCase):
+    """
+    Runs a local server from serve_responses for each test, with self.pyflare pointed at it. The form fields of every
+    request are appended to self.requests. Subclasses override respond() to choose responses and create_client() for
+    a differently configured client.
+    """
+
+    action_key = 'a'
+
+    def setUp(self):
+        self.requests = []
+        self.lock = threading.Lock()
+        self.server, self.url = serve_responses(self._handle, self.action_key)
+        self.pyflare = self.create_client()
+
+    def tearDown(self):
+        self.pyflare.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def create_client(self):
+        return PyflareClient('address@example.com', 'your_api_key', url=self.url)
+
+    def respond(self, params):
+        """
+        :param params: Form fields of the request
+        :type params: dict
+        :return: Response body, or a (status, body) tuple
+        """
+        return client_responses[params[self.action_key]]
+
+    def _handle(self, params):
+        with self.lock:
+            self.requests.append(params)
+        return self.respond(params)
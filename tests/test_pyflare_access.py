@@ -0,0 +1,65 @@
+__author__ = 'Joe Linn'
+
+import json
+import unittest
+from pyflare import APIError, PyflareClient
+from pyflare.access import AppliedActions, expand
+from mock_responses import LocalServerTestCase, client_responses
+
+
+class ExpandTest(unittest.TestCase):
+    def test_expand(self):
+        addresses = expand(['192.0.2.1', '192.0.2.0/30', ' 192.0.2.1 ', '2001:DB8::1', '10.0.0.5/32'])
+        self.assertEqual(addresses, ['192.0.2.1', '192.0.2.0', '192.0.2.2', '192.0.2.3', '2001:db8::1', '10.0.0.5'])
+
+    def test_limits(self):
+        self.assertEqual(len(expand(['10.0.0.0/16'])), 65536)
+        self.assertRaises(ValueError, expand, ['10.0.0.0/8'])
+        self.assertRaises(ValueError, expand, ['not an ip'])
+
+
+class BulkIPActionTest(LocalServerTestCase):
+    def respond(self, params):
+        if params['key'] == '192.0.2.3':
+            return json.dumps({'result': 'error', 'msg': 'Invalid IP', 'err_code': None})
+        return client_responses[params['a']]
+
+    def test_bulk_ip_action(self):
+        result = self.pyflare.bulk_ip_action('ban', ['192.0.2.0/30', '192.0.2.1'], concurrency=4)
+        self.assertEqual(result.ips, ['192.0.2.0', '192.0.2.1', '192.0.2.2', '192.0.2.3'])
+        self.assertEqual(result.failed_ips, ['192.0.2.3'])
+        self.assertIsInstance(result.status('192.0.2.3'), APIError)
+        self.assertEqual(result.status('192.0.2.0')['result'], 'success')
+        self.assertEqual(len(self.requests), 4)
+
+        # only the failed address is retried
+        result = self.pyflare.bulk_ip_action('ban', ['192.0.2.0/30'])
+        self.assertEqual(result.ips, ['192.0.2.3'])
+        self.assertEqual(len(result.skipped), 3)
+        self.assertIsNone(result.status('192.0.2.0'))
+
+        # a different action is applied
+        result = self.pyflare.bulk_ip_action('wl', ['192.0.2.0'])
+        self.assertEqual(result.ips, ['192.0.2.0'])
+        self.assertEqual(self.pyflare.applied_ip_actions.get('192.0.2.0'), 'wl')
+
+        self.assertRaises(ValueError, self.pyflare.bulk_ip_action, 'block', ['192.0.2.0'])
+
+    def test_direct_calls_are_recorded(self):
+        self.pyflare.nul('2001:DB8::1')
+        result = self.pyflare.bulk_ip_action('nul', ['2001:db8::1'])
+        self.assertEqual(result.skipped, ['2001:db8::1'])
+        self.assertEqual(len(self.requests), 1)
+
+    def test_ttl(self):
+        now = [0]
+        applied = AppliedActions(ttl=60, clock=lambda: now[0])
+        pyflare = PyflareClient('address@example.com', 'your_api_key', applied_ip_actions=applied, url=self.url)
+        pyflare.bulk_ip_action('ban', ['192.0.2.1'])
+        self.assertEqual(len(pyflare.bulk_ip_action('ban', ['192.0.2.1']).skipped), 1)
+        now[0] = 61
+        self.assertEqual(pyflare.bulk_ip_action('ban', ['192.0.2.1']).ips, ['192.0.2.1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+__author__ = 'Joe Linn'
+
+import unittest
+from mock_responses import client_responses, hosting_responses, serve_responses
+try:
+    import asyncio
+    from pyflare.aio import AsyncPyflareClient, AsyncPyflareHosting, AsyncSingleFlight
+except (ImportError, SyntaxError):
+    asyncio = None
+
+
+@unittest.skipIf(asyncio is None, 'pyflare.aio requires Python 3.6+ and aiohttp')
+class AsyncPyflareClientTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server, cls.url = serve_responses(client_responses, 'a')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.pyflare = AsyncPyflareClient('address@example.com', 'your_api_key', concurrency=4)
+        self.pyflare.CLOUDFLARE_URL = self.url
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.pyflare.close())
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def test_stats(self):
+        response = self.loop.run_until_complete(self.pyflare.stats('example.com', 40))
+        self.assertIsInstance(response['response']['result']['timeZero'], int)
+
+    def test_zone_ips(self):
+        # ip_class defaults to None, which must not be sent
+        response = self.loop.run_until_complete(self.pyflare.zone_ips('example.com'))
+        self.assertIsInstance(response['response']['ips'], list)
+
+    def test_rec_edit(self):
+        response = self.loop.run_until_complete(self.pyflare.rec_edit('example.com', 'A', 9001, 'sub', '1.2.3.4'))
+        self.assertIn('rec_id', response['response']['rec']['obj'])
+
+    def test_rec_load_all(self):
+        records = []
+        generator = self.pyflare.rec_load_all('example.com')
+        while True:
+            try:
+                records.append(self.loop.run_until_complete(generator.__anext__()))
+            except StopAsyncIteration:
+                break
+        self.assertEqual(len(records), 7)
+
+    def test_zone_load_multi_typed(self):
+        response = self.loop.run_until_complete(self.pyflare.zone_load_multi(typed=True))
+        self.assertEqual(response['response']['zones']['objs'][0].zone_name, 'exampledomain1.com')
+
+    def test_rocket_loader(self):
+        response = self.loop.run_until_complete(self.pyflare.rocket_loader('example.com', 'a'))
+        self.assertEqual(response['result'], 'success')
+        response = self.loop.run_until_complete(getattr(self.pyflare, 'async')('example.com', 0))
+        self.assertEqual(response['result'], 'success')
+
+    def test_sync_helpers(self):
+        # helpers built on threads and blocking iteration are not inherited
+        for name in ('add_record_listener', 'bulk_records', 'bulk_ip_action', 'purge_urls', 'sync_zone', 'fan_out'):
+            self.assertFalse(hasattr(self.pyflare, name), name)
+        self.assertRaises(TypeError, self.pyflare.zone_ips, 'example.com', stream=True)
+
+    def test_blocking_with(self):
+        def enter():
+            with self.pyflare:
+                pass
+        self.assertRaises(TypeError, enter)
+        pyflare = self.loop.run_until_complete(self.pyflare.__aenter__())
+        self.loop.run_until_complete(pyflare.ip_lkup('0.0.0.0'))
+        self.loop.run_until_complete(pyflare.__aexit__(None, None, None))
+        self.assertIsNone(pyflare._session)
+
+    def test_concurrent(self):
+        calls = [self.pyflare.zone_settings('example.com') for _ in range(20)]
+        responses = self.loop.run_until_complete(asyncio.gather(*calls))
+        self.assertEqual(len(responses), 20)
+        self.assertTrue(all(response['result'] == 'success' for response in responses))
+
+
+@unittest.skipIf(asyncio is None, 'pyflare.aio requires Python 3.6+ and aiohttp')
+class AsyncSingleFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.single_flight = AsyncSingleFlight()
+        self.calls = []
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def call(self):
+        future = self.loop.create_future()
+        self.calls.append(future)
+        return future
+
+    def test_shared(self):
+        first = self.loop.create_task(self.single_flight.do('key', self.call))
+        second = self.loop.create_task(self.single_flight.do('key', self.call))
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+        self.calls[0].set_result('result')
+        self.assertEqual(self.loop.run_until_complete(asyncio.gather(first, second)), ['result', 'result'])
+        self.assertEqual(len(self.calls), 1)
+
+    def test_first_caller_cancelled(self):
+        first = self.loop.create_task(self.single_flight.do('key', self.call))
+        second = self.loop.create_task(self.single_flight.do('key', self.call))
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+        first.cancel()
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+        self.assertTrue(first.cancelled())
+        self.assertFalse(self.calls[0].cancelled())
+        self.calls[0].set_result('result')
+        self.assertEqual(self.loop.run_until_complete(second), 'result')
+        self.assertEqual(len(self.calls), 1)
+        # the finished call is no longer shared
+        third = self.loop.create_task(self.single_flight.do('key', self.call))
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+        self.assertEqual(len(self.calls), 2)
+        self.calls[1].set_result('later')
+        self.assertEqual(self.loop.run_until_complete(third), 'later')
+
+
+@unittest.skipIf(asyncio is None, 'pyflare.aio requires Python 3.6+ and aiohttp')
+class AsyncPyflareHostingTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server, cls.url = serve_responses(hosting_responses, 'act')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.pyflare = AsyncPyflareHosting('your_api_key')
+        self.pyflare.CLOUDFLARE_URL = self.url
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.pyflare.close())
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def test_zone_list(self):
+        response = self.loop.run_until_complete(self.pyflare.zone_list('user_key', limit=10, zone_status='V'))
+        self.assertEqual(response['response'][0]['zone_name'], 'example.com')
+
+    def test_host_key_regen(self):
+        response = self.loop.run_until_complete(self.pyflare.host_key_regen())
+        self.assertEqual(response['result'], 'success')
+
+    def test_iter_zones(self):
+        self.assertFalse(hasattr(self.pyflare, 'iter_zones'))
+
+
+if __name__ == '__main__':
+    unittest.main()
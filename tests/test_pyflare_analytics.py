@@ -0,0 +1,91 @@
+__author__ = 'Joe Linn'
+
+import json
+import unittest
+from pyflare import analytics
+from pyflare.analytics import VisitorTable
+from mock_responses import LocalServerTestCase, client_responses
+
+
+def entries(zone, *rows):
+    return [{'ip': ip, 'classification': classification, 'hits': hits, 'latitude': latitude,
+             'longitude': longitude, 'zone_name': zone} for ip, classification, hits, latitude, longitude in rows]
+
+
+class VisitorTableTest(unittest.TestCase):
+    def setUp(self):
+        self.numpy = analytics.numpy
+
+    def tearDown(self):
+        analytics.numpy = self.numpy
+
+    def backends(self):
+        # vectorized if NumPy is installed, then the pure Python fallback
+        return [self.numpy, None] if self.numpy is not None else [None]
+
+    def fresh_table(self):
+        table = VisitorTable()
+        table.add(entries('example.com',
+                          ('192.0.2.1', 'regular', 40, 37.7, -122.4),
+                          ('192.0.2.2', 'threat', 25, 37.2, -122.1),
+                          ('192.0.2.3', 'crawler', 5, None, None)), window=0)
+        table.add(entries('example.org',
+                          ('192.0.2.1', 'regular', 30, 37.7, -122.4),
+                          ('192.0.2.4', 'threat', 50, -33.9, 151.2)), window=1)
+        return table
+
+    def test_aggregations(self):
+        for backend in self.backends():
+            analytics.numpy = backend
+            table = self.fresh_table()
+            self.assertEqual(len(table), 5)
+            self.assertEqual(table.classification_totals(), {'regular': 70, 'threat': 75, 'crawler': 5})
+            self.assertEqual(table.totals('zone'), {'example.com': 70, 'example.org': 80})
+            self.assertEqual(table.group_by('window', 'classification')[1, 'threat'], 50)
+            self.assertEqual(table.top(2), [('192.0.2.1', 70), ('192.0.2.4', 50)])
+            self.assertEqual(table.top(10, by='zone'), [('example.org', 80), ('example.com', 70)])
+            self.assertEqual(table.top(0), [])
+
+    def test_select(self):
+        for backend in self.backends():
+            analytics.numpy = backend
+            table = self.fresh_table()
+            threats = table.select(classification='threat')
+            self.assertEqual(len(threats), 2)
+            self.assertEqual(threats.top(1), [('192.0.2.4', 50)])
+            self.assertEqual(len(table.select(classification='threat', zone='example.com')), 1)
+            self.assertEqual(len(table.select(zone='missing.com')), 0)
+            self.assertEqual(table.select(zone='missing.com').top(3), [])
+            self.assertRaises(ValueError, table.select, hits=5)
+
+    def test_geo_bins(self):
+        for backend in self.backends():
+            analytics.numpy = backend
+            bins = self.fresh_table().geo_bins(1.0)
+            self.assertEqual(bins, {(37.0, -123.0): 95, (-34.0, 151.0): 50})
+
+    def test_incremental(self):
+        for backend in self.backends():
+            analytics.numpy = backend
+            table = self.fresh_table()
+            table.top(1)
+            table.add(entries('example.net', ('192.0.2.9', 'regular', 500, None, None)))
+            self.assertEqual(table.top(1), [('192.0.2.9', 500)])
+            self.assertEqual(len(table), 6)
+
+
+class FromZonesTest(LocalServerTestCase):
+    def respond(self, params):
+        if params['z'] == 'broken.com':
+            return json.dumps({'result': 'error', 'msg': 'Invalid zone', 'err_code': None})
+        return client_responses['zone_ips']
+
+    def test_from_zones(self):
+        table = VisitorTable.from_zones(self.pyflare, ['example.com', 'broken.com'], hours=24)
+        self.assertEqual(len(table), 4)
+        self.assertEqual(table.classification_totals(), {'regular': 77})
+        self.assertEqual(list(table.errors), ['broken.com'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+__author__ = 'Joe Linn'
+
+import unittest
+import requests
+from pyflare import PyflareClient
+from pyflare import PyflareHosting
+from mock_responses import mock_response_client
+
+
+class PyflareBaseTest(unittest.TestCase):
+    def test_pool_configuration(self):
+        pyflare = PyflareClient('address@example.com', 'your_api_key', pool_connections=3, pool_maxsize=25,
+                                timeout=5)
+        adapter = pyflare._session.get_adapter(PyflareClient.CLOUDFLARE_URL)
+        self.assertEqual(adapter._pool_connections, 3)
+        self.assertEqual(adapter._pool_maxsize, 25)
+        self.assertEqual(pyflare._timeout, 5)
+
+    def test_injected_session_not_closed(self):
+        session = requests.Session()
+        closed = []
+        session.close = lambda: closed.append(True)
+        with PyflareHosting('your_api_key', session=session) as pyflare:
+            self.assertIs(pyflare._session, session)
+        self.assertEqual(closed, [])
+
+    def test_owned_session_closed(self):
+        pyflare = PyflareClient('address@example.com', 'your_api_key')
+        closed = []
+        pyflare._session.close = lambda: closed.append(True)
+        with pyflare:
+            pass
+        self.assertEqual(closed, [True])
+
+    @mock_response_client
+    def test_stats(self):
+        # consecutive calls go through the same session
+        with PyflareClient('address@example.com', 'your_api_key') as pyflare:
+            session = pyflare._session
+            pyflare.stats('example.com', 40)
+            pyflare.stats('example.com', 40)
+            self.assertIs(pyflare._session, session)
+
+
+if __name__ == '__main__':
+    unittest.main()
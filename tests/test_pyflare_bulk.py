@@ -0,0 +1,107 @@
+__author__ = 'Joe Linn'
+
+import json
+import threading
+import time
+import unittest
+from pyflare import APIError
+from pyflare import bulk
+from pyflare import PyflareClient
+from mock_responses import client_responses, serve_responses
+
+
+def respond(params):
+    if params['a'] == 'rec_delete' and params['id'] == '404':
+        return json.dumps({'result': 'error', 'msg': 'Invalid record id', 'err_code': 'E_INVLDREC'})
+    if params.get('z') == 'exampledomain2.net':
+        return json.dumps({'result': 'error', 'msg': 'Zone not active', 'err_code': 'E_ZONE'})
+    return client_responses[params['a']]
+
+
+class PyflareBulkTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server, cls.url = serve_responses(respond, 'a')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.pyflare = PyflareClient('address@example.com', 'your_api_key')
+        self.pyflare.CLOUDFLARE_URL = self.url
+
+    def test_bulk_records(self):
+        operations = [
+            {'action': 'rec_new', 'zone': 'example.com', 'record_type': 'A', 'name': 'sub', 'content': '1.2.3.4'},
+            {'action': 'rec_delete', 'zone': 'example.com', 'record_id': 404},
+            {'action': 'rec_edit', 'zone': 'example.com', 'record_type': 'A', 'record_id': 9001, 'name': 'sub',
+             'content': '1.2.3.4'},
+        ] + [{'action': 'rec_delete', 'zone': 'example.com', 'record_id': i} for i in range(20)]
+        result = self.pyflare.bulk_records(operations, concurrency=4)
+
+        self.assertEqual(len(result), 23)
+        self.assertIn('rec_id', result[0]['response']['rec']['obj'])
+        self.assertIsInstance(result[1], APIError)
+        self.assertEqual(result[1].code, 'E_INVLDREC')
+        self.assertIn('rec_id', result[2]['response']['rec']['obj'])
+        self.assertEqual(result.failed, 1)
+        self.assertEqual(result.succeeded, 22)
+        self.assertEqual([index for index, error in result.errors], [1])
+        self.assertGreater(result.throughput, 0)
+
+    def test_bulk_records_invalid_action(self):
+        self.assertRaises(ValueError, self.pyflare.bulk_records, [{'action': 'zone_grab', 'zone_id': 1}])
+
+    def test_fan_out_all_zones(self):
+        results = dict(self.pyflare.fan_out('stats', concurrency=2, interval=40))
+        self.assertEqual(sorted(results), ['exampledomain1.com', 'exampledomain2.net', 'exampledomain3.org'])
+        self.assertIsInstance(results['exampledomain2.net'], APIError)
+        self.assertEqual(results['exampledomain1.com']['result'], 'success')
+
+    def test_fan_out_rec_load_all(self):
+        results = dict(self.pyflare.fan_out('rec_load_all', ['example.com', 'example.org']))
+        self.assertEqual(len(results['example.com']), 7)
+        self.assertEqual(len(results['example.org']), 7)
+
+    def test_fan_out_invalid_action(self):
+        self.assertRaises(ValueError, self.pyflare.fan_out, 'rec_new', ['example.com'])
+
+
+class RunFairTest(unittest.TestCase):
+    def test_round_robin(self):
+        lock = threading.Lock()
+        in_flight = {'big': 0, 'small': 0}
+        peaks = {'big': 0, 'small': 0}
+
+        def call(name):
+            def run():
+                with lock:
+                    in_flight[name] += 1
+                    peaks[name] = max(peaks[name], in_flight[name])
+                time.sleep(0.01)
+                with lock:
+                    in_flight[name] -= 1
+                if name == 'small':
+                    raise APIError('Zone not active', 'E_ZONE')
+                return name
+            return run
+        queues = [('big', ((i, call('big')) for i in range(40))), ('small', [(i, call('small')) for i in range(4)])]
+        outcomes = list(bulk.run_fair(queues, concurrency=4, per_queue=2))
+
+        self.assertEqual(len(outcomes), 44)
+        self.assertEqual(peaks, {'big': 2, 'small': 2})
+        # the small queue is done long before the big one
+        small = [index for index, (name, _, _) in enumerate(outcomes) if name == 'small']
+        self.assertLess(max(small), 12)
+        self.assertTrue(all(isinstance(result, APIError) for name, _, result in outcomes if name == 'small'))
+        self.assertEqual(sorted(key for name, key, _ in outcomes if name == 'big'), list(range(40)))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, list, bulk.run_fair([], concurrency=0))
+        self.assertRaises(ValueError, list, bulk.run_fair([], concurrency=1, per_queue=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
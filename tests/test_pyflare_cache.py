@@ -0,0 +1,153 @@
+__author__ = 'Joe Linn'
+
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from pyflare import PyflareClient
+from pyflare.cache import FileCache, MemoryCache, ResponseCache
+from mock_responses import LocalServerTestCase, client_responses
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class MemoryCacheTest(unittest.TestCase):
+    def test_expiry(self):
+        clock = FakeClock()
+        cache = MemoryCache(clock=clock)
+        cache.set('key', 'value', 10)
+        self.assertEqual(cache.get('key'), 'value')
+        clock.now += 10
+        self.assertIsNone(cache.get('key'))
+
+    def test_lru_eviction(self):
+        cache = MemoryCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+
+
+class FileCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        clock = FakeClock()
+        cache = FileCache(self.directory, clock=clock)
+        cache.set('key', {'result': 'success'}, 10)
+        self.assertEqual(FileCache(self.directory, clock=clock).get('key'), {'result': 'success'})
+        clock.now += 10
+        self.assertIsNone(cache.get('key'))
+
+    def test_eviction(self):
+        cache = FileCache(self.directory, maxsize=3)
+        for i in range(5):
+            cache.set(str(i), i)
+        self.assertEqual(len([key for key in map(str, range(5)) if cache.get(key) is not None]), 3)
+
+
+class CachedClientTest(LocalServerTestCase):
+    def setUp(self):
+        self.cache = ResponseCache()
+        super(CachedClientTest, self).setUp()
+
+    def create_client(self):
+        return PyflareClient('address@example.com', 'your_api_key', cache=self.cache, url=self.url)
+
+    def test_reads_cached(self):
+        first = self.pyflare.zone_settings('example.com')
+        second = self.pyflare.zone_settings('example.com')
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.requests), 1)
+        self.pyflare.zone_settings('example.org')
+        self.assertEqual(len(self.requests), 2)
+
+    def test_uncached_actions(self):
+        self.pyflare.ip_lkup('0.0.0.0')
+        self.pyflare.ip_lkup('0.0.0.0')
+        self.assertEqual(len(self.requests), 2)
+
+    def test_write_invalidates_zone(self):
+        self.pyflare.zone_settings('example.com')
+        self.pyflare.zone_settings('example.org')
+        self.pyflare.sec_lvl('example.com', 'high')
+        self.pyflare.zone_settings('example.com')
+        self.assertEqual(len(self.requests), 4)
+        self.pyflare.zone_settings('example.org')
+        self.assertEqual(len(self.requests), 4)
+
+    def test_accounts_separated(self):
+        other = PyflareClient('other@example.com', 'other_api_key', cache=self.cache, url=self.url)
+        self.pyflare.zone_load_multi()
+        other.zone_load_multi()
+        other.close()
+        self.assertEqual(len(self.requests), 2)
+
+    def test_key_excludes_credentials(self):
+        key = self.cache.key({'a': 'stats', 'z': 'example.com', 'tkn': 'your_api_key', 'email': 'a@example.com'})
+        self.assertNotIn('your_api_key', key)
+        self.assertNotIn('a@example.com', key)
+
+
+class CacheRaceTest(LocalServerTestCase):
+    def setUp(self):
+        self.level = 'med'
+        self.reads = []
+        self.read_started = threading.Event()
+        self.write_done = threading.Event()
+        super(CacheRaceTest, self).setUp()
+
+    def tearDown(self):
+        self.write_done.set()
+        super(CacheRaceTest, self).tearDown()
+
+    def create_client(self):
+        return PyflareClient('address@example.com', 'your_api_key', cache=ResponseCache(), url=self.url)
+
+    def respond(self, params):
+        if params['a'] == 'sec_lvl':
+            self.level = params['v']
+            return client_responses['sec_lvl']
+        self.reads.append(self.level)
+        settings = json.loads(client_responses['zone_settings'])
+        settings['response']['result']['objs'][0]['sec_lvl'] = self.level
+        if len(self.reads) == 1:
+            # the first read is answered with the state from before the write, once the write has completed
+            self.read_started.set()
+            self.write_done.wait(5)
+        return json.dumps(settings)
+
+    def settings(self):
+        return self.pyflare.zone_settings('example.com')['response']['result']['objs'][0]['sec_lvl']
+
+    def test_read_racing_write(self):
+        stale = []
+        reader = threading.Thread(target=lambda: stale.append(self.settings()))
+        reader.start()
+        self.assertTrue(self.read_started.wait(5))
+        self.pyflare.sec_lvl('example.com', 'high')
+        self.write_done.set()
+        reader.join(5)
+        self.assertEqual(stale, ['med'])
+        # the response which raced the write is not served from the cache
+        self.assertEqual(self.settings(), 'high')
+        self.assertEqual(self.settings(), 'high')
+        self.assertEqual(len(self.reads), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
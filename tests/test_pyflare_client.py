@@ -103,7 +103,9 @@ class PyflareTest(unittest.TestCase):
 
     @mock_response_client
     def test_async(self):
-        response = self.pyflare.async('example.com', 0)
+        response = self.pyflare.rocket_loader('example.com', 0)
+        self.assertEqual(response['result'], 'success')
+        response = getattr(self.pyflare, 'async')('example.com', 0)
         self.assertEqual(response['result'], 'success')
 
     @mock_response_client
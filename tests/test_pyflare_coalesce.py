@@ -0,0 +1,108 @@
+__author__ = 'Joe Linn'
+
+import threading
+import time
+import unittest
+from pyflare import PyflareClient
+from pyflare.coalesce import SingleFlight, request_key
+from mock_responses import LocalServerTestCase, client_responses
+try:
+    import asyncio
+    from pyflare.aio import AsyncPyflareClient
+except (ImportError, SyntaxError):
+    asyncio = None
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_calls_share_result(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def func():
+            calls.append(1)
+            release.wait()
+            return {'result': 'success'}
+
+        threads = [threading.Thread(target=lambda: results.append(flight.do('key', func))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(result is results[0] for result in results))
+        # once the flight has landed, a new call is made
+        flight.do('key', func)
+        self.assertEqual(len(calls), 2)
+
+    def test_error_shared(self):
+        flight = SingleFlight()
+
+        def func():
+            raise ValueError('failed')
+        self.assertRaises(ValueError, flight.do, 'key', func)
+
+    def test_request_key(self):
+        self.assertEqual(request_key({'a': 'ip_lkup', 'ip': '0.0.0.0', 'tkn': 'x', 'email': 'a@example.com'}),
+                         request_key({'ip': '0.0.0.0', 'a': 'ip_lkup', 'tkn': 'y', 'email': 'b@example.com'}))
+
+
+class CoalescingClientTest(LocalServerTestCase):
+    def setUp(self):
+        self.delay = 0.3
+        super(CoalescingClientTest, self).setUp()
+
+    def create_client(self):
+        return PyflareClient('address@example.com', 'your_api_key', coalesce=True, url=self.url)
+
+    def respond(self, params):
+        time.sleep(self.delay)
+        return client_responses[params['a']]
+
+    def count(self, action):
+        return sum(1 for params in self.requests if params['a'] == action)
+
+    def test_zone_settings(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.pyflare.zone_settings('example.com')))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 8)
+        self.assertEqual(self.count('zone_settings'), 1)
+
+    def test_writes_not_coalesced(self):
+        self.delay = 0
+        threads = [threading.Thread(target=lambda: self.pyflare.rec_new('example.com', 'A', 'sub', '1.2.3.4'))
+                   for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.count('rec_new'), 3)
+
+    @unittest.skipIf(asyncio is None, 'pyflare.aio requires Python 3.6+ and aiohttp')
+    def test_async_zone_settings(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            pyflare = AsyncPyflareClient('address@example.com', 'your_api_key', coalesce=True, url=self.url)
+            results = loop.run_until_complete(asyncio.gather(*[pyflare.zone_settings('example.com')
+                                                               for _ in range(8)]))
+            loop.run_until_complete(pyflare.close())
+        finally:
+            loop.close()
+            asyncio.set_event_loop(None)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(self.count('zone_settings'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+__author__ = 'Joe Linn'
+
+import json
+import socket
+import unittest
+import httpretty
+from pyflare import APIError
+from pyflare import PyflareClient
+from pyflare import PyflareHosting
+from pyflare.instrumentation import Callbacks, Histogram, MemoryMetrics, Multiplexer, StatsdExporter
+from pyflare.retry import RetryPolicy
+from mock_responses import LocalServerTestCase, client_responses, hosting_responses
+
+UNAUTHORIZED = json.dumps({'result': 'error', 'msg': 'Invalid credentials', 'err_code': 'E_UNAUTH'})
+
+
+class HistogramTest(unittest.TestCase):
+    def test_quantile(self):
+        histogram = Histogram((0.1, 1.0, float('inf')))
+        for value in (0.05, 0.05, 0.05, 0.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [3, 1, 1])
+        self.assertEqual(histogram.quantile(0.5), 0.1)
+        self.assertEqual(histogram.quantile(0.8), 1.0)
+        self.assertEqual(histogram.quantile(1.0), 3.0)
+        self.assertEqual(Histogram().quantile(0.5), 0.0)
+
+
+class InstrumentationTest(unittest.TestCase):
+    def setUp(self):
+        self.metrics = MemoryMetrics(keep_slowest=2)
+        self.started = []
+        self.instrumentation = Multiplexer(self.metrics, Callbacks(started=self.started.append))
+        self.pyflare = PyflareClient('address@example.com', 'your_api_key', instrumentation=self.instrumentation)
+
+    @httpretty.activate
+    def test_success(self):
+        body = client_responses['zone_settings']
+        httpretty.register_uri(httpretty.POST, PyflareClient.CLOUDFLARE_URL, body=body)
+        self.pyflare.zone_settings('example.com')
+        self.pyflare.zone_settings('example.com')
+
+        self.assertEqual([event.action for event in self.started], ['zone_settings', 'zone_settings'])
+        self.assertEqual(self.metrics.latency['zone_settings'].count, 2)
+        self.assertEqual(self.metrics.counters['attempts']['zone_settings'], 2)
+        self.assertEqual(self.metrics.counters['response_bytes']['zone_settings'], 2 * len(body))
+        self.assertGreater(self.metrics.counters['request_bytes']['zone_settings'], 0)
+        self.assertGreater(self.metrics.counters['decode_time']['zone_settings'], 0)
+        self.assertEqual(len(self.metrics.errors), 0)
+        event = self.metrics.slowest('zone_settings')[0]
+        self.assertEqual(event.status_code, 200)
+        self.assertIsNone(event.error_code)
+
+    @httpretty.activate
+    def test_errors_and_retries(self):
+        httpretty.register_uri(httpretty.POST, PyflareClient.CLOUDFLARE_URL, responses=[
+            httpretty.Response(body='Service Unavailable', status=503),
+            httpretty.Response(body=UNAUTHORIZED, status=200),
+        ])
+        pyflare = PyflareClient('address@example.com', 'your_api_key', instrumentation=self.metrics,
+                                retry=RetryPolicy(max_retries=2, backoff_factor=0))
+        self.assertRaises(APIError, pyflare.stats, 'example.com', 40)
+        self.assertEqual(self.metrics.errors, {('stats', 'E_UNAUTH'): 1})
+        event = self.metrics.slowest('stats')[0]
+        self.assertEqual(event.attempts, 2)
+        self.assertEqual(event.retries, 1)
+        self.assertIsInstance(event.error, APIError)
+
+    @httpretty.activate
+    def test_hosting(self):
+        body = hosting_responses['user_lookup_email']
+        httpretty.register_uri(httpretty.POST, PyflareHosting.CLOUDFLARE_URL, body=body)
+        pyflare = PyflareHosting('your_api_key', instrumentation=self.metrics)
+        pyflare.user_lookup(cloudflare_email='user@example.com')
+        self.assertEqual(self.metrics.counters['requests']['user_lookup'], 1)
+
+    def test_prometheus(self):
+        with httpretty.enabled():
+            httpretty.register_uri(httpretty.POST, PyflareClient.CLOUDFLARE_URL, body=UNAUTHORIZED)
+            self.assertRaises(APIError, self.pyflare.ip_lkup, '0.0.0.0')
+        text = self.metrics.prometheus()
+        self.assertIn('pyflare_request_duration_seconds_bucket{action="ip_lkup",le="+Inf"} 1', text)
+        self.assertIn('pyflare_request_duration_seconds_count{action="ip_lkup"} 1', text)
+        self.assertIn('pyflare_errors_total{action="ip_lkup",code="E_UNAUTH"} 1', text)
+        self.assertIn('pyflare_attempts_total{action="ip_lkup"} 1', text)
+
+    def test_statsd(self):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(('127.0.0.1', 0))
+        receiver.settimeout(2)
+        exporter = StatsdExporter('127.0.0.1', receiver.getsockname()[1], prefix='cf')
+        pyflare = PyflareClient('address@example.com', 'your_api_key', instrumentation=exporter)
+        try:
+            with httpretty.enabled():
+                httpretty.register_uri(httpretty.POST, PyflareClient.CLOUDFLARE_URL, body=UNAUTHORIZED)
+                self.assertRaises(APIError, pyflare.ip_lkup, '0.0.0.0')
+            lines = receiver.recv(4096).decode('utf-8').split('\n')
+        finally:
+            exporter.close()
+            receiver.close()
+        self.assertTrue(lines[0].startswith('cf.ip_lkup.duration:'))
+        self.assertTrue(lines[0].endswith('|ms'))
+        self.assertIn('cf.ip_lkup.attempts:1|c', lines)
+        self.assertIn('cf.ip_lkup.errors.E_UNAUTH:1|c', lines)
+
+
+
+class StreamedInstrumentationTest(LocalServerTestCase):
+    def setUp(self):
+        self.finished = []
+        super(StreamedInstrumentationTest, self).setUp()
+
+    def create_client(self):
+        return PyflareClient('address@example.com', 'your_api_key', url=self.url,
+                             instrumentation=Callbacks(finished=self.finished.append))
+
+    def respond(self, params):
+        if params['z'] == 'broken.com':
+            return json.dumps({'result': 'error', 'msg': 'Invalid zone', 'err_code': 'E_INVLDINPUT'})
+        return client_responses[params['a']]
+
+    def test_exhausted(self):
+        stream = self.pyflare.zone_ips('example.com', stream=True)
+        self.assertEqual(self.finished, [])
+        self.assertEqual(len(list(stream)), len(json.loads(client_responses['zone_ips'])['response']['ips']))
+        self.assertEqual(len(self.finished), 1)
+        event = self.finished[0]
+        self.assertEqual(event.action, 'zone_ips')
+        self.assertIsNone(event.error)
+        self.assertGreater(event.decode_time, 0)
+        self.assertGreaterEqual(event.elapsed, event.decode_time)
+
+    def test_closed(self):
+        stream = self.pyflare.zone_ips('example.com', stream=True)
+        next(stream)
+        stream.close()
+        stream.close()
+        self.assertEqual(len(self.finished), 1)
+        self.assertIsNone(self.finished[0].error)
+
+    def test_error(self):
+        stream = self.pyflare.zone_ips('broken.com', stream=True)
+        self.assertRaises(APIError, list, stream)
+        self.assertEqual([event.error_code for event in self.finished], ['E_INVLDINPUT'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+__author__ = 'Joe Linn'
+
+import json
+import time
+import unittest
+from pyflare import APIError
+from pyflare.manager import ClientManager
+from pyflare.transport import SessionTransport
+from mock_responses import LocalServerTestCase, client_responses
+
+
+def zones(count):
+    return json.dumps({'response': {'zones': {'has_more': False, 'count': count, 'objs': [
+        {'zone_name': 'zone{0}.example'.format(i)} for i in range(count)]}}, 'result': 'success', 'msg': None})
+
+
+class ClientManagerTest(LocalServerTestCase):
+    zone_counts = {'big@example.com': 30, 'small@example.com': 3, 'broken@example.com': 0}
+
+    def setUp(self):
+        super(ClientManagerTest, self).setUp()
+        self.manager = self.pyflare
+
+    def create_client(self):
+        return ClientManager([('big@example.com', 'big_token'), ('small@example.com', 'small_token')], url=self.url)
+
+    def respond(self, params):
+        if params['email'] == 'broken@example.com':
+            return json.dumps({'result': 'error', 'msg': 'Invalid token', 'err_code': 'E_UNAUTH'})
+        if params['a'] == 'zone_load_multi':
+            return zones(self.zone_counts[params['email']])
+        time.sleep(0.005)
+        return client_responses[params['a']]
+
+    def test_clients(self):
+        big = self.manager['big@example.com']
+        small = self.manager.client('small@example.com')
+        self.assertEqual(len(self.manager), 2)
+        self.assertIn('big@example.com', self.manager)
+        self.assertEqual(list(self.manager), ['big@example.com', 'small@example.com'])
+        self.assertIsNot(big._transport, small._transport)
+        self.assertIs(self.manager.add('big@example.com', 'big_token'), big)
+        replaced = self.manager.add('big@example.com', 'new_token')
+        self.assertIsNot(replaced, big)
+        self.assertEqual(list(self.manager), ['big@example.com', 'small@example.com'])
+        replaced.ip_lkup('0.0.0.0')
+        self.assertEqual(self.requests[-1]['tkn'], 'new_token')
+        self.manager.remove('small@example.com')
+        self.assertNotIn('small@example.com', self.manager)
+        self.assertRaises(KeyError, self.manager.client, 'small@example.com')
+
+    def test_budgets(self):
+        manager = ClientManager({'big@example.com': 'big_token', 'small@example.com': 'small_token'}, rate=5,
+                                burst=1, url=self.url)
+        big = manager['big@example.com']
+        small = manager['small@example.com']
+        self.assertIsNot(big._rate_limiter, small._rate_limiter)
+        started = time.time()
+        big.ip_lkup('0.0.0.0')
+        small.ip_lkup('0.0.0.0')
+        # each account starts with a full bucket of its own
+        self.assertLess(time.time() - started, 0.15)
+
+    def test_shared_arguments(self):
+        self.assertRaises(ValueError, ClientManager, session=None)
+        self.assertRaises(ValueError, ClientManager, transport=SessionTransport())
+        self.assertEqual(len(ClientManager(transport='urllib3')), 0)
+
+    def test_fan_out(self):
+        self.manager.add('broken@example.com', 'broken_token')
+        results = dict(self.manager.fan_out('ip_lkup', ip='0.0.0.0'))
+        self.assertEqual(sorted(results), ['big@example.com', 'broken@example.com', 'small@example.com'])
+        self.assertEqual(results['big@example.com']['response'], {'0.0.0.0': 'BAD:0'})
+        self.assertIsInstance(results['broken@example.com'], APIError)
+        results = dict(self.manager.fan_out('ip_lkup', emails=['small@example.com'], ip='0.0.0.0'))
+        self.assertEqual(list(results), ['small@example.com'])
+        self.assertRaises(ValueError, self.manager.fan_out, '_request')
+        self.assertRaises(KeyError, self.manager.fan_out, 'ip_lkup', emails=['nobody@example.com'])
+
+    def test_fan_out_zones_fair(self):
+        self.manager.add('broken@example.com', 'broken_token')
+        outcomes = list(self.manager.fan_out_zones('stats', concurrency=4, per_account=2, interval=40))
+        self.assertEqual(len(outcomes), 34)
+        self.assertEqual(outcomes[0][0], 'broken@example.com')
+        self.assertIsNone(outcomes[0][1])
+        self.assertIsInstance(outcomes[0][2], APIError)
+        small = [index for index, (email, _, _) in enumerate(outcomes) if email == 'small@example.com']
+        # the small account is not queued behind the big one
+        self.assertLess(max(small), 12)
+        self.assertEqual(sorted(zone for email, zone, _ in outcomes if email == 'small@example.com'),
+                         ['zone0.example', 'zone1.example', 'zone2.example'])
+        stats = [params for params in self.requests if params['a'] == 'stats']
+        self.assertTrue(all(params['tkn'] == params['email'].split('@')[0] + '_token' for params in stats))
+
+    def test_fan_out_zones_given(self):
+        outcomes = list(self.manager.fan_out_zones('rec_load_all', {'small@example.com': ['example.com']}))
+        self.assertEqual(len(outcomes), 1)
+        email, zone, records = outcomes[0]
+        self.assertEqual((email, zone, len(records)), ('small@example.com', 'example.com', 7))
+        self.assertRaises(ValueError, self.manager.fan_out_zones, 'rec_new')
+
+
+if __name__ == '__main__':
+    unittest.main()
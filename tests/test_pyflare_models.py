@@ -0,0 +1,63 @@
+__author__ = 'Joe Linn'
+
+import json
+import pickle
+import unittest
+from pyflare.models import DnsRecord, Zone, ZoneSettings
+from mock_responses import LocalServerTestCase, client_responses
+
+RECORDS = json.loads(client_responses['rec_load_all'])['response']['recs']['objs']
+
+
+class ModelTest(unittest.TestCase):
+    def test_fields(self):
+        record = DnsRecord(RECORDS[0])
+        self.assertEqual(record.name, 'direct.example.com')
+        self.assertEqual(record['type'], 'A')
+        self.assertIsNone(record.prio)
+        # lazily decoded fields
+        self.assertEqual(record.props['cloud_on'], 0)
+        self.assertEqual(record['ttl_ceil'], 86400)
+        self.assertEqual(record.get('srvname', 'missing'), 'missing')
+        self.assertIn('rec_tag', record)
+        self.assertNotIn('srvname', record)
+        self.assertRaises(AttributeError, getattr, record, 'srvname')
+        self.assertRaises(KeyError, record.__getitem__, 'srvname')
+        self.assertFalse(hasattr(record, '__dict__'))
+
+    def test_round_trip(self):
+        record = DnsRecord(RECORDS[0])
+        self.assertEqual(record.to_dict(), RECORDS[0])
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+        self.assertNotEqual(record, DnsRecord(RECORDS[1]))
+
+    def test_interned(self):
+        first, second = DnsRecord(json.loads(json.dumps(RECORDS[0]))), DnsRecord(json.loads(json.dumps(RECORDS[1])))
+        self.assertIs(first.zone_name, second.zone_name)
+        self.assertIs(first.type, second.type)
+
+
+class TypedClientTest(LocalServerTestCase):
+    def test_rec_load_all(self):
+        records = list(self.pyflare.rec_load_all('example.com', typed=True))
+        self.assertEqual(len(records), 7)
+        self.assertIsInstance(records[0], DnsRecord)
+        self.assertEqual(records[0].to_dict(), RECORDS[0])
+
+    def test_zone_load_multi(self):
+        response = self.pyflare.zone_load_multi(typed=True)
+        zones = response['response']['zones']['objs']
+        self.assertEqual(response['response']['zones']['count'], 3)
+        self.assertIsInstance(zones[0], Zone)
+        self.assertEqual(zones[1].zone_name, 'exampledomain2.net')
+        self.assertIn('zone_delete', zones[1].allow)
+
+    def test_zone_settings(self):
+        settings = self.pyflare.zone_settings('example.com', typed=True)['response']['result']['objs'][0]
+        self.assertIsInstance(settings, ZoneSettings)
+        self.assertEqual(settings.sec_lvl, 'med')
+        self.assertEqual(settings['dev_mode'], 1345768790)
+
+
+if __name__ == '__main__':
+    unittest.main()
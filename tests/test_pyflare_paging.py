@@ -0,0 +1,113 @@
+__author__ = 'Joe Linn'
+
+import json
+import threading
+import unittest
+from pyflare import PyflareHosting
+from pyflare.paging import iter_pages
+from mock_responses import LocalServerTestCase
+
+
+class Listing(object):
+    """
+    Offset-paginated listing whose page sizes follow the given sequence
+    """
+
+    def __init__(self, total, page_sizes):
+        self.total = total
+        self.page_sizes = page_sizes
+        self.requested = []
+        self.lock = threading.Lock()
+
+    def fetch(self, offset):
+        with self.lock:
+            self.requested.append(offset)
+        boundaries = [0]
+        while boundaries[-1] < self.total:
+            boundaries.append(boundaries[-1] + self.page_sizes[(len(boundaries) - 1) % len(self.page_sizes)])
+        if offset not in boundaries or offset >= self.total:
+            return [], None
+        size = boundaries[boundaries.index(offset) + 1] - offset
+        items = list(range(offset, min(offset + size, self.total)))
+        return items, (offset + size if offset + size < self.total else None)
+
+
+class IterPagesTest(unittest.TestCase):
+    def collect(self, listing, prefetch):
+        return [item for page in iter_pages(listing.fetch, 0, prefetch) for item in page]
+
+    def test_sequential(self):
+        listing = Listing(25, [10])
+        self.assertEqual(self.collect(listing, 0), list(range(25)))
+        self.assertEqual(listing.requested, [0, 10, 20])
+
+    def test_prefetch(self):
+        for prefetch in (1, 2, 5):
+            listing = Listing(95, [10])
+            self.assertEqual(self.collect(listing, prefetch), list(range(95)))
+
+    def test_prefetch_irregular_pages(self):
+        listing = Listing(60, [10, 7, 13])
+        self.assertEqual(self.collect(listing, 3), list(range(60)))
+
+    def test_single_page(self):
+        listing = Listing(5, [10])
+        self.assertEqual(self.collect(listing, 3), list(range(5)))
+        self.assertEqual(listing.requested, [0])
+
+
+class PrefetchingClientTest(LocalServerTestCase):
+    def setUp(self):
+        self.listing = Listing(45, [10])
+        super(PrefetchingClientTest, self).setUp()
+
+    def respond(self, params):
+        records, next_offset = self.listing.fetch(int(params['o']))
+        return json.dumps({'response': {'recs': {
+            'has_more': next_offset is not None,
+            'count': len(records),
+            'objs': [{'rec_id': str(record), 'zone_name': params['z']} for record in records]
+        }}, 'result': 'success', 'msg': None})
+
+    def test_rec_load_all(self):
+        records = list(self.pyflare.rec_load_all('example.com', prefetch=3))
+        self.assertEqual([record['rec_id'] for record in records], [str(i) for i in range(45)])
+
+
+class ZoneIteratorTest(LocalServerTestCase):
+    action_key = 'act'
+    max_limit = 100
+
+    def create_client(self):
+        return PyflareHosting('your_api_key', url=self.url)
+
+    def respond(self, params):
+        offset, limit = int(params['offset']), min(int(params['limit']), self.max_limit)
+        zones = [{'zone_id': i, 'zone_name': 'example{0}.com'.format(i), 'zone_status': params['zone_status']}
+                 for i in range(offset, min(offset + limit, 23))]
+        return json.dumps({'request': {'act': 'zone_list'}, 'response': zones, 'result': 'success', 'msg': None})
+
+    def test_iter_zones(self):
+        zones = list(self.pyflare.iter_zones('user_key', page_size=5, zone_status='V'))
+        self.assertEqual([zone['zone_id'] for zone in zones], list(range(23)))
+        self.assertEqual([int(params['offset']) for params in self.requests], [0, 5, 10, 15, 20, 23])
+        self.assertTrue(all(params['zone_status'] == 'V' for params in self.requests))
+
+    def test_iter_zones_prefetch(self):
+        zones = list(self.pyflare.iter_zones('user_key', page_size=4, prefetch=3))
+        self.assertEqual([zone['zone_id'] for zone in zones], list(range(23)))
+
+    def test_iter_zones_capped_limit(self):
+        # the API returns fewer zones than asked for, which must not end the listing
+        self.max_limit = 3
+        zones = list(self.pyflare.iter_zones('user_key', page_size=5))
+        self.assertEqual([zone['zone_id'] for zone in zones], list(range(23)))
+        zones = list(self.pyflare.iter_zones('user_key', page_size=5, prefetch=2))
+        self.assertEqual([zone['zone_id'] for zone in zones], list(range(23)))
+
+    def test_iter_zones_invalid_status(self):
+        self.assertRaises(ValueError, list, self.pyflare.iter_zones('user_key', zone_status='X'))
+
+
+if __name__ == '__main__':
+    unittest.main()
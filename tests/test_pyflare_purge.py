@@ -0,0 +1,65 @@
+__author__ = 'Joe Linn'
+
+import json
+import unittest
+from pyflare import APIError
+from pyflare.purge import normalize_url, unique_urls
+from mock_responses import LocalServerTestCase, client_responses
+
+
+class NormalizeTest(unittest.TestCase):
+    def test_normalize_url(self):
+        self.assertEqual(normalize_url(' HTTP://Example.COM:80/Image.jpg#top '), 'http://example.com/Image.jpg')
+        self.assertEqual(normalize_url('https://example.com:8443?v=1'), 'https://example.com:8443/?v=1')
+
+    def test_unique_urls(self):
+        urls = ['http://example.com/a.css', 'HTTP://EXAMPLE.com/a.css', 'https://example.com/a.css',
+                'http://example.com/a.css#x']
+        self.assertEqual(unique_urls(urls), ['http://example.com/a.css', 'https://example.com/a.css'])
+
+
+class PurgeUrlsTest(LocalServerTestCase):
+    fail_full_purge = False
+
+    def respond(self, params):
+        if params['a'] == 'zone_file_purge' and params['url'].endswith('/missing.js'):
+            return json.dumps({'result': 'error', 'msg': 'Invalid url', 'err_code': None})
+        if params['a'] == 'fpurge_ts' and self.fail_full_purge:
+            return json.dumps({'result': 'error', 'msg': 'Purge rate exceeded', 'err_code': None})
+        return client_responses[params['a']]
+
+    def actions(self):
+        return sorted(params['a'] for params in self.requests)
+
+    def test_purge_urls(self):
+        urls = ['http://example.com/{0}.css'.format(i) for i in range(20)] * 2 + ['http://example.com/missing.js']
+        result = self.pyflare.purge_urls('example.com', urls, concurrency=4)
+        self.assertFalse(result.full_purge)
+        self.assertEqual(len(result), 21)
+        self.assertEqual(self.actions(), ['zone_file_purge'] * 21)
+        self.assertEqual(result.failed_urls, ['http://example.com/missing.js'])
+        self.assertIsInstance(result.status('HTTP://example.com/missing.js'), APIError)
+        self.assertEqual(result.status('http://example.com/3.css')['result'], 'success')
+
+    def test_full_purge(self):
+        urls = ['http://example.com/{0}.css'.format(i) for i in range(5)]
+        result = self.pyflare.purge_urls('example.com', urls, full_purge_threshold=5)
+        self.assertTrue(result.full_purge)
+        self.assertEqual(result.failed, 0)
+        self.assertEqual(result.status(urls[0])['attributes']['cooldown'], 20)
+        # within the cooldown, URLs are purged one by one
+        result = self.pyflare.purge_urls('example.com', urls, full_purge_threshold=5)
+        self.assertFalse(result.full_purge)
+        self.assertEqual(self.actions(), ['fpurge_ts'] + ['zone_file_purge'] * 5)
+        # other zones are not affected by the cooldown
+        self.assertTrue(self.pyflare.purge_urls('example.org', urls, full_purge_threshold=5).full_purge)
+
+    def test_full_purge_failure(self):
+        self.fail_full_purge = True
+        result = self.pyflare.purge_urls('example.com', ['http://example.com/a.css'], full_purge_threshold=1)
+        self.assertFalse(result.full_purge)
+        self.assertEqual(self.actions(), ['fpurge_ts', 'zone_file_purge'])
+
+
+if __name__ == '__main__':
+    unittest.main()
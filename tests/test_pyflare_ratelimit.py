@@ -0,0 +1,87 @@
+__author__ = 'Joe Linn'
+
+import os
+import shutil
+import tempfile
+import unittest
+from pyflare import PyflareClient
+from pyflare import PyflareHosting
+from pyflare.ratelimit import FileTokenBucket, RateLimiter, TokenBucket, fcntl
+from mock_responses import mock_response_client, mock_response_hosting
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingLimiter(object):
+    def __init__(self):
+        self.actions = []
+
+    def acquire(self, action):
+        self.actions.append(action)
+
+
+class TokenBucketTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_burst_then_steady_rate(self):
+        bucket = TokenBucket(2, capacity=2, clock=self.clock)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        # the bucket is empty: each further caller is scheduled half a second after the previous one
+        self.assertAlmostEqual(bucket.reserve(), 0.5)
+        self.assertAlmostEqual(bucket.reserve(), 1.0)
+        self.clock.now += 1.0
+        self.assertAlmostEqual(bucket.reserve(), 0.5)
+
+    def test_refill_capped_at_capacity(self):
+        bucket = TokenBucket(1, capacity=3, clock=self.clock)
+        for _ in range(3):
+            bucket.reserve()
+        self.clock.now += 100
+        for _ in range(3):
+            self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 1.0)
+
+    def test_rate_limiter_actions(self):
+        limiter = RateLimiter(TokenBucket(10, clock=self.clock), {'rec_new': TokenBucket(1, clock=self.clock)})
+        self.assertEqual(limiter.reserve('rec_new'), 0)
+        self.assertAlmostEqual(limiter.reserve('rec_new'), 1.0)
+        self.assertEqual(limiter.reserve('rec_edit'), 0)
+
+    @unittest.skipIf(fcntl is None, 'fcntl is not available')
+    def test_file_bucket_shared(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'bucket')
+            first = FileTokenBucket(path, 1, clock=self.clock)
+            second = FileTokenBucket(path, 1, clock=self.clock)
+            self.assertEqual(first.reserve(), 0)
+            self.assertAlmostEqual(second.reserve(), 1.0)
+            self.assertAlmostEqual(first.reserve(), 2.0)
+        finally:
+            shutil.rmtree(directory)
+
+
+class RateLimitedClientTest(unittest.TestCase):
+    @mock_response_client
+    def test_zone_settings(self):
+        limiter = RecordingLimiter()
+        PyflareClient('address@example.com', 'your_api_key', rate_limiter=limiter).zone_settings('example.com')
+        self.assertEqual(limiter.actions, ['zone_settings'])
+
+    @mock_response_hosting
+    def test_host_key_regen(self):
+        limiter = RecordingLimiter()
+        PyflareHosting('your_api_key', rate_limiter=limiter).host_key_regen()
+        self.assertEqual(limiter.actions, ['host_key_regen'])
+
+
+if __name__ == '__main__':
+    unittest.main()
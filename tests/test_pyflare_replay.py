@@ -0,0 +1,121 @@
+__author__ = 'Joe Linn'
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+import requests
+from pyflare import APIError
+from pyflare import PyflareClient
+from pyflare import PyflareHosting
+from pyflare.replay import LoadReplayer, RecordingTransport, ReplayTransport, read_cassette
+from mock_responses import client_responses, hosting_responses, serve_responses
+
+
+class RecordReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'session.jsonl.gz')
+        responses = dict(client_responses)
+        responses.update(hosting_responses)
+        self.server, self.url = serve_responses(lambda params: responses[params.get('a') or params.get('act')], 'a')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def record(self):
+        with PyflareClient('address@example.com', 'secret_token', transport=RecordingTransport(self.path)) as pyflare:
+            pyflare.CLOUDFLARE_URL = self.url
+            pyflare.ip_lkup('0.0.0.0')
+            records = list(pyflare.rec_load_all('example.com'))
+        with PyflareHosting('secret_host_key', transport=RecordingTransport(self.path)) as hosting:
+            hosting.CLOUDFLARE_URL = self.url
+            hosting.user_create('newuser@example.com', 'secret_password')
+        return records
+
+    def test_record(self):
+        self.record()
+        with gzip.open(self.path, 'rb') as f:
+            raw = f.read().decode('utf-8')
+        for secret in ('secret_token', 'address@example.com', 'secret_host_key', 'secret_password',
+                       '8afbe6dea02407989af4dd4c97bb6e25'):
+            self.assertNotIn(secret, raw)
+        entries = list(read_cassette(self.path))
+        self.assertEqual([entry['data'].get('a') or entry['data'].get('act') for entry in entries],
+                         ['ip_lkup', 'rec_load_all', 'user_create'])
+        self.assertEqual(entries[0]['data'], {'a': 'ip_lkup', 'ip': '0.0.0.0', 'tkn': 'REDACTED',
+                                              'email': 'REDACTED'})
+        self.assertEqual(entries[0]['status'], 200)
+        self.assertGreaterEqual(entries[1]['t'], entries[0]['t'])
+        self.assertGreaterEqual(entries[0]['d'], 0)
+
+    def test_replay(self):
+        records = self.record()
+        self.server.shutdown()
+        pyflare = PyflareClient('other@example.com', 'other_token', transport=ReplayTransport(self.path))
+        self.assertEqual(pyflare.ip_lkup('0.0.0.0'), {'response': {'0.0.0.0': 'BAD:0'}, 'result': 'success',
+                                                      'msg': None})
+        self.assertEqual(list(pyflare.rec_load_all('example.com')), records)
+        self.assertEqual(list(pyflare.rec_load_all('example.com', stream=True)), records)
+        self.assertRaises(LookupError, pyflare.ip_lkup, '192.0.2.1')
+
+    def test_replay_timing_and_errors(self):
+        entries = [
+            {'t': 0, 'd': 0.5, 'url': '', 'data': {'a': 'wl', 'key': '0.0.0.0'}, 'status': 200,
+             'content_type': 'application/json', 'body': client_responses['wl']},
+            {'t': 1, 'd': 2.0, 'url': '', 'data': {'a': 'wl', 'key': '0.0.0.0'}, 'error': 'ConnectTimeout',
+             'message': 'timed out'},
+            {'t': 2, 'd': 0.1, 'url': '', 'data': {'a': 'ban', 'key': '0.0.0.0'}, 'status': 200,
+             'content_type': 'application/json', 'body': '{"result":"error","msg":"nope","err_code":"E_UNAUTH"}'},
+        ]
+        slept = []
+        pyflare = PyflareClient('address@example.com', 'your_api_key',
+                                transport=ReplayTransport(entries, speed=10, sleep=slept.append))
+        self.assertEqual(pyflare.wl('0.0.0.0')['response']['result']['action'], 'WL')
+        self.assertRaises(requests.exceptions.ConnectTimeout, pyflare.wl, '0.0.0.0')
+        # the last recorded response is repeated
+        self.assertRaises(requests.exceptions.ConnectTimeout, pyflare.wl, '0.0.0.0')
+        self.assertRaises(APIError, pyflare.ban, '0.0.0.0')
+        self.assertEqual([round(delay, 3) for delay in slept], [0.05, 0.2, 0.2, 0.01])
+
+
+class LoadReplayerTest(unittest.TestCase):
+    def setUp(self):
+        body = client_responses['ip_lkup']
+        self.entries = [{'t': 100 + index, 'd': 0.01, 'url': '', 'status': 200, 'content_type': 'application/json',
+                         'data': {'a': 'ip_lkup', 'ip': '0.0.0.0', 'tkn': 'REDACTED', 'email': 'REDACTED'},
+                         'body': body} for index in range(5)]
+        self.entries.append({'t': 105, 'd': 0.01, 'url': '', 'status': 200, 'content_type': 'application/json',
+                             'data': {'act': 'zone_list', 'user_key': 'REDACTED', 'limit': 100, 'offset': 0,
+                                      'zone_status': 'ALL', 'sub_status': 'ALL', 'host_key': 'REDACTED'},
+                             'body': hosting_responses['zone_list']})
+        transport = ReplayTransport(self.entries)
+        self.client = PyflareClient('address@example.com', 'your_api_key', transport=transport)
+        self.hosting = PyflareHosting('your_api_key', transport=transport)
+
+    def test_speed(self):
+        now = [0.0]
+        slept = []
+
+        def sleep(seconds):
+            slept.append(seconds)
+            now[0] += seconds
+        replayer = LoadReplayer(self.client, self.hosting, concurrency=4, clock=lambda: now[0], sleep=sleep)
+        result = replayer.replay(list(reversed(self.entries)), speed=10)
+        self.assertEqual(result.succeeded, 6)
+        self.assertEqual([round(seconds, 3) for seconds in slept], [0.1] * 5)
+        self.assertEqual(result.results[-1]['response'][0]['zone_name'], 'example.com')
+        self.assertEqual(len(result.lateness), 6)
+
+    def test_as_fast_as_possible(self):
+        replayer = LoadReplayer(self.client, concurrency=2, sleep=lambda seconds: self.fail('slept'))
+        result = replayer.replay(self.entries, speed=None)
+        self.assertEqual(result.succeeded, 5)
+        self.assertIsInstance(result.results[-1], ValueError)
+
+
+if __name__ == '__main__':
+    unittest.main()
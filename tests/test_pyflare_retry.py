@@ -0,0 +1,79 @@
+__author__ = 'Joe Linn'
+
+import json
+import unittest
+import httpretty
+from requests.exceptions import HTTPError
+from pyflare import APIError
+from pyflare import PyflareClient
+from pyflare import PyflareHosting
+from pyflare.retry import RetryPolicy
+from mock_responses import client_responses, hosting_responses
+
+MAX_API = json.dumps({'result': 'error', 'msg': 'Too many API calls', 'err_code': 'E_MAXAPI'})
+UNAUTHORIZED = json.dumps({'result': 'error', 'msg': 'Invalid credentials', 'err_code': 'E_UNAUTH'})
+
+
+def register(url, *responses):
+    httpretty.register_uri(httpretty.POST, url, responses=[
+        httpretty.Response(body=body, status=status) for status, body in responses
+    ])
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.retry = RetryPolicy(max_retries=2, backoff_factor=0)
+        self.pyflare = PyflareClient('address@example.com', 'your_api_key', retry=self.retry)
+
+    def test_backoff(self):
+        retry = RetryPolicy(backoff_factor=0.5, max_backoff=3, jitter=False)
+        self.assertEqual([retry.backoff(i) for i in range(4)], [0.5, 1, 2, 3])
+        retry.jitter = True
+        self.assertTrue(0 <= retry.backoff(3) <= 3)
+
+    @httpretty.activate
+    def test_read_retried(self):
+        register(PyflareClient.CLOUDFLARE_URL, (503, 'Service Unavailable'), (200, client_responses['zone_settings']))
+        response = self.pyflare.zone_settings('example.com')
+        self.assertEqual(response['result'], 'success')
+        self.assertEqual(self.retry.counters['retries']['zone_settings'], 1)
+        self.assertEqual(self.retry.counters['recovered']['zone_settings'], 1)
+
+    @httpretty.activate
+    def test_non_idempotent_not_retried(self):
+        register(PyflareClient.CLOUDFLARE_URL, (503, 'Service Unavailable'), (200, client_responses['rec_new']))
+        self.assertRaises(HTTPError, self.pyflare.rec_new, 'example.com', 'A', 'sub', '1.2.3.4')
+        self.assertEqual(self.retry.counters['retries']['rec_new'], 0)
+
+    @httpretty.activate
+    def test_rejected_retried(self):
+        register(PyflareClient.CLOUDFLARE_URL, (200, MAX_API), (200, client_responses['rec_new']))
+        response = self.pyflare.rec_new('example.com', 'A', 'sub', '1.2.3.4')
+        self.assertIn('rec_id', response['response']['rec']['obj'])
+
+    @httpretty.activate
+    def test_api_error_not_retried(self):
+        register(PyflareClient.CLOUDFLARE_URL, (200, UNAUTHORIZED), (200, client_responses['stats']))
+        self.assertRaises(APIError, self.pyflare.stats, 'example.com', 40)
+        self.assertEqual(self.retry.counters['attempts']['stats'], 1)
+
+    @httpretty.activate
+    def test_exhausted(self):
+        register(PyflareClient.CLOUDFLARE_URL, *[(502, 'Bad Gateway')] * 3)
+        self.assertRaises(HTTPError, self.pyflare.stats, 'example.com', 40)
+        self.assertEqual(self.retry.counters['attempts']['stats'], 3)
+        self.assertEqual(self.retry.counters['exhausted']['stats'], 1)
+        self.retry.reset()
+        self.assertEqual(self.retry.counters['attempts']['stats'], 0)
+
+    @httpretty.activate
+    def test_hosting_read_retried(self):
+        register(PyflareHosting.CLOUDFLARE_URL, (500, 'Internal Server Error'), (200, hosting_responses['zone_list']))
+        pyflare = PyflareHosting('your_api_key', retry=self.retry)
+        response = pyflare.zone_list('user_key')
+        self.assertEqual(response['response'][0]['zone_name'], 'example.com')
+        self.assertEqual(self.retry.counters['recovered']['zone_list'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
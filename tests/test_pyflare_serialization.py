@@ -0,0 +1,51 @@
+__author__ = 'Joe Linn'
+
+import json
+import unittest
+import httpretty
+from pyflare import APIError, PyflareClient, PyflareHosting
+from pyflare import serialization
+
+
+class SerializationTest(unittest.TestCase):
+    def setUp(self):
+        self.decoder = serialization._decoder
+
+    def tearDown(self):
+        serialization.set_decoder(self.decoder)
+
+    def test_decoders(self):
+        body = json.dumps({'result': 'success', 'msg': None, 'response': {'name': u'\u00fcber'}}).encode('utf-8')
+        for name in serialization.DECODERS:
+            serialization.set_decoder(name)
+            self.assertEqual(serialization.parse(body)['response']['name'], u'\u00fcber')
+
+    def test_set_decoder(self):
+        serialization.set_decoder(lambda body: {'result': 'success', 'decoded': body})
+        self.assertEqual(serialization.parse(b'{}')['decoded'], b'{}')
+        self.assertRaises(ValueError, serialization.set_decoder, 'missing')
+
+    def test_invalid(self):
+        for name in serialization.DECODERS:
+            serialization.set_decoder(name)
+            self.assertRaises(APIError, serialization.loads, b'<html>Bad gateway</html>')
+
+    def test_error_result(self):
+        body = json.dumps({'result': 'error', 'msg': 'Invalid zone', 'err_code': 'E_UNAUTH'}).encode('utf-8')
+        try:
+            serialization.parse(body)
+            self.fail('APIError not raised')
+        except APIError as e:
+            self.assertEqual(e.code, 'E_UNAUTH')
+            self.assertEqual(e.msg, 'Invalid zone')
+
+    @httpretty.activate
+    def test_clients(self):
+        httpretty.register_uri(httpretty.POST, PyflareClient.CLOUDFLARE_URL, body='Bad gateway')
+        httpretty.register_uri(httpretty.POST, PyflareHosting.CLOUDFLARE_URL, body='Bad gateway')
+        self.assertRaises(APIError, PyflareClient('address@example.com', 'your_api_key').ip_lkup, '0.0.0.0')
+        self.assertRaises(APIError, PyflareHosting('your_api_key').zone_lookup, 'user_key', 'example.com')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+__author__ = 'Joe Linn'
+
+import copy
+import json
+import threading
+import unittest
+from pyflare.store import RecordStore
+from mock_responses import LocalServerTestCase, client_responses
+
+RECORDS = json.loads(client_responses['rec_load_all'])['response']['recs']['objs']
+
+
+class RecordStoreTest(LocalServerTestCase):
+    # when set, rec_load_all signals fetching and then waits for it before responding
+    fetching = resume = None
+
+    def setUp(self):
+        self.records = copy.deepcopy(RECORDS)
+        super(RecordStoreTest, self).setUp()
+        self.store = RecordStore(self.pyflare, 'example.com')
+
+    def respond(self, params):
+        if params['a'] == 'rec_load_all':
+            if self.resume is not None:
+                self.fetching.set()
+                self.resume.wait(5)
+            return json.dumps({'response': {'recs': {'has_more': False, 'count': len(self.records),
+                                                     'objs': self.records}},
+                               'result': 'success', 'msg': None})
+        return client_responses[params['a']]
+
+    def actions(self):
+        return [params['a'] for params in self.requests]
+
+    def test_lookups(self):
+        self.assertEqual(len(self.store), 7)
+        self.assertEqual(self.store.get(16606018)['name'], 'www.example.com')
+        self.assertEqual([record['rec_id'] for record in self.store.find(name='www', type='cname')], ['16606018'])
+        self.assertEqual(len(self.store.find(type='A')), 4)
+        self.assertEqual(len(self.store.find(content='example.com')), 2)
+        self.assertEqual(self.store.find(name='www', type='A'), [])
+        self.assertEqual(len(self.store.find()), 7)
+
+    def test_refresh(self):
+        self.records[0]['content'] = '1.2.3.4'
+        del self.records[1]
+        self.records.append(dict(RECORDS[1], rec_id='99', name='new.example.com'))
+        self.assertEqual(self.store.refresh(), (1, 1, 1))
+        self.assertEqual(self.store.find(content='1.2.3.4')[0]['rec_id'], '16606009')
+        self.assertNotIn('16606003', self.store)
+        self.assertEqual(self.store.find(name='new')[0]['rec_id'], '99')
+        self.assertEqual(self.store.refresh(), (0, 0, 0))
+
+    def test_updated_by_client(self):
+        self.pyflare.rec_new('example.com', 'A', 'test', '96.126.126.36')
+        self.assertIn('23734516', self.store)
+        self.assertEqual(self.store.find(name='test', content='96.126.126.36')[0]['rec_id'], '23734516')
+        self.pyflare.rec_edit('example.com', 'A', 23734516, 'sub', '96.126.126.36')
+        self.assertEqual(self.store.find(name='test', content='96.126.126.36'), [])
+        self.assertEqual(self.store.get('23734516')['name'], 'sub.example.com')
+        self.pyflare.rec_delete('example.com', 16606018)
+        self.assertNotIn('16606018', self.store)
+        self.assertEqual(self.store.find(name='www'), [])
+        # other zones are ignored
+        self.pyflare.rec_delete('example.org', 16606000)
+        self.assertIn('16606000', self.store)
+        self.assertEqual(self.actions().count('rec_load_all'), 1)
+
+    def test_updated_during_refresh(self):
+        self.fetching = threading.Event()
+        self.resume = threading.Event()
+        refresh = threading.Thread(target=self.store.refresh)
+        refresh.start()
+        self.assertTrue(self.fetching.wait(5))
+        # the zone was read before these changes, so the fetched records do not include them
+        self.pyflare.rec_new('example.com', 'A', 'test', '96.126.126.36')
+        self.pyflare.rec_delete('example.com', 16606018)
+        self.resume.set()
+        refresh.join(5)
+        self.assertIn('23734516', self.store)
+        self.assertNotIn('16606018', self.store)
+        # a later refresh applies the zone as fetched
+        self.assertEqual(self.store.refresh(), (1, 0, 1))
+        self.assertNotIn('23734516', self.store)
+        self.assertIn('16606018', self.store)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+__author__ = 'Joe Linn'
+
+import io
+import json
+import unittest
+from pyflare import APIError
+from pyflare import streaming
+from pyflare.models import Zone
+from mock_responses import LocalServerTestCase, client_responses
+
+RECORDS = json.loads(client_responses['rec_load_all'])['response']['recs']['objs']
+
+
+class FakeResponse(object):
+    def __init__(self, body):
+        self.content = body
+        self.raw = io.BytesIO(body)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class StreamingClientTest(LocalServerTestCase):
+    def setUp(self):
+        self.ijson = streaming.ijson
+        super(StreamingClientTest, self).setUp()
+
+    def tearDown(self):
+        streaming.ijson = self.ijson
+        super(StreamingClientTest, self).tearDown()
+
+    def respond(self, params):
+        if params['a'] == 'rec_load_all':
+            # two pages: records 0-4, then 5-6
+            offset = int(params['o'])
+            objs = RECORDS[offset:offset + 5]
+            return json.dumps({'response': {'recs': {'has_more': offset + 5 < len(RECORDS), 'count': len(objs),
+                                                     'objs': objs}},
+                               'result': 'success', 'msg': None})
+        if params['a'] == 'ip_lkup':
+            return json.dumps({'result': 'error', 'msg': 'Invalid IP', 'err_code': 'E_INVLDINPUT'})
+        return client_responses[params['a']]
+
+    def parsers(self):
+        # incremental parsing if ijson is installed, then the full decoding fallback
+        return [self.ijson, None] if self.ijson is not None else [None]
+
+    def test_rec_load_all(self):
+        for parser in self.parsers():
+            streaming.ijson = parser
+            del self.requests[:]
+            self.assertEqual(list(self.pyflare.rec_load_all('example.com', stream=True)), RECORDS)
+            self.assertEqual([params['o'] for params in self.requests], ['0', '5'])
+        self.assertRaises(ValueError, self.pyflare.rec_load_all, 'example.com', prefetch=2, stream=True)
+
+    def test_zone_ips(self):
+        expected = json.loads(client_responses['zone_ips'])['response']['ips']
+        for parser in self.parsers():
+            streaming.ijson = parser
+            ips = self.pyflare.zone_ips('example.com', stream=True)
+            parsed = list(ips)
+            self.assertEqual(parsed, expected)
+            self.assertIsInstance(parsed[0]['latitude'], float)
+            self.assertEqual(ips.fields['result'], 'success')
+
+    def test_zone_load_multi(self):
+        for parser in self.parsers():
+            streaming.ijson = parser
+            zones = list(self.pyflare.zone_load_multi(typed=True, stream=True))
+            self.assertEqual([zone.zone_name for zone in zones],
+                             ['exampledomain1.com', 'exampledomain2.net', 'exampledomain3.org'])
+            self.assertIsInstance(zones[0], Zone)
+            self.assertIn('zone_delete', zones[1].allow)
+
+    def test_error(self):
+        for parser in self.parsers():
+            streaming.ijson = parser
+            self.assertRaises(APIError, list, self.pyflare._stream({'a': 'ip_lkup', 'ip': '0.0.0.0'}, 'response'))
+
+
+@unittest.skipIf(streaming.ijson is None, 'incremental parsing requires ijson')
+class IncrementalParsingTest(unittest.TestCase):
+    def test_first_item_before_body_is_read(self):
+        objs = [dict(RECORDS[0], rec_id=str(i)) for i in range(2000)]
+        body = json.dumps({'response': {'recs': {'has_more': False, 'count': len(objs), 'objs': objs}},
+                           'result': 'success', 'msg': None}).encode('utf-8')
+        response = FakeResponse(body)
+        records = streaming.ItemStream(response, 'response.recs.objs')
+        self.assertEqual(next(records)['rec_id'], '0')
+        self.assertLess(response.raw.tell(), len(body) // 2)
+        self.assertEqual(len(list(records)), 1999)
+        self.assertEqual(records.fields['response.recs.count'], 2000)
+        self.assertTrue(response.closed)
+
+    def test_malformed(self):
+        body = b'{"response": {"recs": {"objs": [{"rec_id": '
+        records = streaming.ItemStream(FakeResponse(body), 'response.recs.objs')
+        self.assertRaises(APIError, list, records)
+
+
+if __name__ == '__main__':
+    unittest.main()
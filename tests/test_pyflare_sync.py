@@ -0,0 +1,107 @@
+__author__ = 'Joe Linn'
+
+import json
+import time
+import unittest
+from pyflare.sync import plan_zone, qualify
+from mock_responses import LocalServerTestCase, client_responses
+
+EXISTING = json.loads(client_responses['rec_load_all'])['response']['recs']['objs']
+
+
+class PlanZoneTest(unittest.TestCase):
+    def desired(self):
+        return [{'type': record['type'], 'name': record['name'], 'content': record['content']}
+                for record in EXISTING]
+
+    def test_qualify(self):
+        self.assertEqual(qualify('@', 'example.com'), 'example.com')
+        self.assertEqual(qualify('www', 'example.com'), 'www.example.com')
+        self.assertEqual(qualify('WWW.example.com.', 'example.com'), 'www.example.com')
+
+    def test_unchanged(self):
+        plan = plan_zone('example.com', EXISTING, self.desired())
+        self.assertEqual(len(plan), 0)
+
+    def test_minimal_diff(self):
+        desired = self.desired()
+        # relative name, changed content: edited in place
+        desired[0] = {'type': 'A', 'name': 'direct', 'content': '1.2.3.4'}
+        # changed ttl only: edited
+        desired[1] = dict(desired[1], ttl=300)
+        # removed: deleted
+        del desired[6]
+        # new: created
+        desired.append({'type': 'MX', 'name': '@', 'content': 'mail.example.com', 'prio': 10})
+        plan = plan_zone('example.com', EXISTING, desired)
+
+        self.assertEqual(len(plan.creates), 1)
+        self.assertEqual([existing['rec_id'] for existing, _ in plan.edits], ['16606003', '16606009'])
+        self.assertEqual([record['rec_id'] for record in plan.deletes], ['16606030'])
+
+        conflicts, first, last = plan.operations()
+        self.assertEqual(conflicts, [])
+        self.assertEqual([operation['action'] for operation in first], ['rec_edit', 'rec_edit', 'rec_new'])
+        self.assertEqual(first[2]['priority'], 10)
+        self.assertEqual(first[2]['name'], 'example.com')
+        self.assertEqual(last, [{'action': 'rec_delete', 'zone': 'example.com', 'record_id': '16606030'}])
+        self.assertIn('- CNAME yay.example.com domains.tumblr.com', str(plan))
+        self.assertIn('~ A direct.example.com [server IP] -> 1.2.3.4', str(plan))
+
+    def test_cname_conflict_deleted_first(self):
+        desired = self.desired()
+        desired[0] = {'type': 'CNAME', 'name': 'direct', 'content': 'example.com'}
+        plan = plan_zone('example.com', EXISTING, desired)
+        conflicts, first, last = plan.operations()
+        self.assertEqual(conflicts, [{'action': 'rec_delete', 'zone': 'example.com', 'record_id': '16606009'}])
+        self.assertEqual([operation['action'] for operation in first], ['rec_new'])
+        self.assertEqual(last, [])
+
+    def test_types(self):
+        plan = plan_zone('example.com', EXISTING, [], types=['CNAME'])
+        self.assertEqual(len(plan.deletes), 3)
+
+
+class SyncZoneTest(LocalServerTestCase):
+    def setUp(self):
+        self.deleted = []
+        super(SyncZoneTest, self).setUp()
+
+    def respond(self, params):
+        if params['a'] == 'rec_delete':
+            time.sleep(0.05)
+            self.deleted.append(params['id'])
+        elif params['a'] == 'rec_new' and params['type'] == 'CNAME' and params['name'] == 'direct.example.com' and \
+                '16606009' not in self.deleted:
+            # the A record of the same name still exists
+            return json.dumps({'result': 'error', 'msg': 'CNAME conflicts with an existing record',
+                               'err_code': 'E_CNAMECONFLICT'})
+        return client_responses[params['a']]
+
+    def test_dry_run(self):
+        plan = self.pyflare.sync_zone('example.com', [], dry_run=True)
+        self.assertEqual(len(plan.deletes), 7)
+        self.assertIsNone(plan.result)
+        self.assertEqual([params['a'] for params in self.requests], ['rec_load_all'])
+
+    def test_sync_zone(self):
+        desired = [{'type': 'A', 'name': 'direct', 'content': '1.2.3.4'},
+                   {'type': 'A', 'name': 'new', 'content': '1.2.3.4'}]
+        plan = self.pyflare.sync_zone('example.com', desired, types=['A'])
+        self.assertEqual(len(plan.result), 5)
+        self.assertEqual(plan.result.failed, 0)
+        actions = sorted(params['a'] for params in self.requests)
+        self.assertEqual(actions, ['rec_delete'] * 3 + ['rec_edit', 'rec_load_all', 'rec_new'])
+
+    def test_cname_replaces_record(self):
+        desired = [{'type': record['type'], 'name': record['name'], 'content': record['content']}
+                   for record in EXISTING[1:]]
+        desired.append({'type': 'CNAME', 'name': 'direct', 'content': 'example.com'})
+        plan = self.pyflare.sync_zone('example.com', desired)
+        self.assertEqual(plan.result.failed, 0)
+        self.assertEqual(len(plan.result), 2)
+        self.assertEqual([params['a'] for params in self.requests[1:3]], ['rec_delete', 'rec_new'])
+
+
+if __name__ == '__main__':
+    unittest.main()
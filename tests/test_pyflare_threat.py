@@ -0,0 +1,68 @@
+__author__ = 'Joe Linn'
+
+import json
+import threading
+import time
+import unittest
+from pyflare import APIError
+from pyflare.threat import ThreatScoreService
+from mock_responses import LocalServerTestCase
+
+
+class ThreatScoreServiceTest(LocalServerTestCase):
+    delay = 0
+
+    def setUp(self):
+        super(ThreatScoreServiceTest, self).setUp()
+        self.now = [0]
+        self.service = ThreatScoreService(self.pyflare, ttl=60, clock=lambda: self.now[0])
+
+    def respond(self, params):
+        time.sleep(self.delay)
+        if params['ip'] == '192.0.2.99':
+            return json.dumps({'result': 'error', 'msg': 'Invalid IP', 'err_code': None})
+        return json.dumps({'response': {params['ip']: 'SL:{0}'.format(params['ip'].split('.')[-1])},
+                           'result': 'success', 'msg': None})
+
+    def looked_up(self):
+        return [params['ip'] for params in self.requests]
+
+    def test_cached(self):
+        self.assertEqual(self.service.score('192.0.2.1'), 'SL:1')
+        self.assertEqual(self.service.score(' 192.0.2.1'), 'SL:1')
+        self.assertEqual(self.looked_up(), ['192.0.2.1'])
+        self.assertEqual(self.service.counters['hits'], 1)
+        self.now[0] = 61
+        self.service.score('192.0.2.1')
+        self.assertEqual(len(self.requests), 2)
+        self.service.invalidate('192.0.2.1')
+        self.service.score('192.0.2.1')
+        self.assertEqual(len(self.requests), 3)
+
+    def test_errors_not_cached(self):
+        self.assertRaises(APIError, self.service.score, '192.0.2.99')
+        self.assertRaises(APIError, self.service.score, '192.0.2.99')
+        self.assertEqual(len(self.requests), 2)
+
+    def test_concurrent_lookups_coalesced(self):
+        self.delay = 0.2
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.service.score('192.0.2.5'))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['SL:5'] * 5)
+        self.assertEqual(self.looked_up(), ['192.0.2.5'])
+
+    def test_scores(self):
+        self.service.score('192.0.2.1')
+        scores = self.service.scores(['192.0.2.1', '192.0.2.2', '192.0.2.3', '192.0.2.2', '192.0.2.99'])
+        self.assertEqual(scores['192.0.2.2'], 'SL:2')
+        self.assertIsInstance(scores['192.0.2.99'], APIError)
+        self.assertEqual(len(scores), 4)
+        self.assertEqual(sorted(self.looked_up()), ['192.0.2.1', '192.0.2.2', '192.0.2.3', '192.0.2.99'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+__author__ = 'Joe Linn'
+
+import copy
+import json
+import math
+import shutil
+import tempfile
+import unittest
+from pyflare.timeseries import STATS_COLUMNS, StatsCollector, TimeSeriesFile, downsample, flatten
+from mock_responses import LocalServerTestCase, client_responses
+
+STATS = json.loads(client_responses['stats'])
+
+
+class TimeSeriesFileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = self.directory + '/example.com.ts'
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_flatten(self):
+        values = flatten(STATS['response']['result']['objs'][0])
+        self.assertEqual(len(values), len(STATS_COLUMNS))
+        self.assertEqual(values[:3], [2640.0, 27.0, 4.0])
+        self.assertTrue(math.isnan(flatten({})[0]))
+
+    def test_append_and_range(self):
+        series = TimeSeriesFile(self.path, ('a', 'b'))
+        self.assertIsNone(series.last())
+        for timestamp in range(0, 1000, 10):
+            series.append(timestamp, [timestamp * 2, 1])
+        self.assertRaises(ValueError, series.append, 990, [0, 0])
+        self.assertRaises(ValueError, series.append, 1000, [0])
+
+        # reopened, the columns come from the file
+        series = TimeSeriesFile(self.path, ('ignored',))
+        self.assertEqual(series.columns, ('a', 'b'))
+        self.assertEqual(len(series), 100)
+        self.assertEqual(series.last(), (990.0, [1980.0, 1.0]))
+        result = series.range(95, 130)
+        self.assertEqual(result['time'], [100.0, 110.0, 120.0])
+        self.assertEqual(result['a'], [200.0, 220.0, 240.0])
+        self.assertEqual(len(series.range()['time']), 100)
+        self.assertEqual(series.range(2000)['time'], [])
+
+    def test_partial_row(self):
+        series = TimeSeriesFile(self.path, ('a', 'b'))
+        series.append(10, [1, 2])
+        with open(self.path, 'ab') as f:
+            # a write interrupted part way through a row
+            f.write(b'\x00' * 10)
+        self.assertEqual(len(series), 1)
+        series.append(20, [3, 4])
+        self.assertEqual(series.range(), {'time': [10.0, 20.0], 'a': [1.0, 3.0], 'b': [2.0, 4.0]})
+
+    def test_downsample(self):
+        series = {'time': [0, 10, 20, 30, 65], 'a': [1, 2, 3, 4, 5]}
+        self.assertEqual(downsample(series, 30), {'time': [0, 30, 60], 'a': [3, 4, 5]})
+        self.assertEqual(downsample(series, 30, 'mean')['a'], [2, 4, 5])
+        self.assertEqual(downsample(series, 30, 'max')['a'], [3, 4, 5])
+
+
+class StatsCollectorTest(LocalServerTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.server_time = [1335816172000]
+        super(StatsCollectorTest, self).setUp()
+        self.collector = StatsCollector(self.pyflare, self.directory + '/stats')
+
+    def tearDown(self):
+        super(StatsCollectorTest, self).tearDown()
+        shutil.rmtree(self.directory)
+
+    def respond(self, params):
+        stats = copy.deepcopy(STATS)
+        stats['response']['result']['objs'][0]['cachedServerTime'] = self.server_time[0]
+        stats['response']['result']['objs'][0]['requestsServed']['user'] = self.server_time[0] % 1000000
+        return json.dumps(stats)
+
+    def test_poll(self):
+        zones = ['example.com', 'example.org']
+        self.assertEqual(self.collector.poll(zones), {'example.com': True, 'example.org': True})
+        # unchanged snapshots are skipped
+        self.assertEqual(self.collector.poll(zones), {'example.com': False, 'example.org': False})
+        for minutes in range(1, 10):
+            self.server_time[0] += 60000
+            self.collector.poll(zones)
+        series = self.collector.query('example.com')
+        self.assertEqual(len(series['time']), 10)
+        self.assertEqual(series['trafficBreakdown.pageviews.regular'][0], 2640.0)
+
+        start = 1335816172000 + 2 * 60000
+        series = self.collector.query('example.org', start, start + 3 * 60000)
+        self.assertEqual(len(series['time']), 3)
+        self.assertEqual(series['time'][0], start)
+
+        series = self.collector.query('example.org', step=5 * 60000, how='last')
+        self.assertEqual(len(series['time']), 3)
+        self.assertEqual(series['requestsServed.user'][-1], (1335816172000 + 9 * 60000) % 1000000)
+
+
+if __name__ == '__main__':
+    unittest.main()
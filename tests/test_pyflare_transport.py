@@ -0,0 +1,107 @@
+__author__ = 'Joe Linn'
+
+import json
+import socket
+import time
+import unittest
+import requests
+from pyflare import APIError
+from pyflare import PyflareClient
+from pyflare import PyflareHosting
+from pyflare import transport
+from pyflare.retry import RetryPolicy
+from mock_responses import client_responses, hosting_responses, serve_responses
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+NAMES = sorted(name for name in transport.TRANSPORTS if name != 'httpx' or transport.httpx is not None)
+
+
+class EncodeFormTest(unittest.TestCase):
+    def test_encode_form(self):
+        body = transport.encode_form({'a': 'rec_edit', 'prio': None, 'ttl': 1, 'content': u'\u00fcber'})
+        self.assertEqual(sorted(body.split('&')), ['a=rec_edit', 'content=%C3%BCber', 'ttl=1'])
+
+
+class TransportTest(unittest.TestCase):
+    def setUp(self):
+        self.requests = []
+        self.statuses = []
+
+        def respond(params):
+            self.requests.append(params)
+            if params.get('ip') == 'slow':
+                time.sleep(0.2)
+            if params.get('key') == 'garbage':
+                return 'not json'
+            if self.statuses:
+                status = self.statuses.pop(0)
+                if status != 200:
+                    return status, 'Service Unavailable'
+            if 'act' in params:
+                return hosting_responses[params['act'] + ('_email' if params['act'] == 'user_lookup' else '')]
+            return client_responses[params['a']]
+        self.server, self.url = serve_responses(respond, 'a')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_url(self):
+        pyflare = PyflareClient('address@example.com', 'your_api_key', url=self.url)
+        self.assertEqual(pyflare.CLOUDFLARE_URL, self.url)
+        self.assertEqual(PyflareClient.CLOUDFLARE_URL, 'https://www.cloudflare.com/api_json.html')
+        pyflare.ip_lkup('0.0.0.0')
+        self.assertEqual(self.requests[0]['tkn'], 'your_api_key')
+
+    def test_transports(self):
+        expected = json.loads(client_responses['rec_load_all'])['response']['recs']['objs']
+        for name in NAMES:
+            del self.requests[:]
+            with PyflareClient('address@example.com', 'your_api_key', transport=name, url=self.url) as pyflare:
+                self.assertEqual(pyflare.ip_lkup('0.0.0.0')['response'], {'0.0.0.0': 'BAD:0'})
+                self.assertEqual(list(pyflare.rec_load_all('example.com')), expected)
+                if ijson is not None:
+                    self.assertEqual(list(pyflare.rec_load_all('example.com', stream=True)), expected)
+                pyflare.rec_new('example.com', 'A', 'test', '96.126.126.36')
+                self.assertNotIn('prio', self.requests[-1])
+            with PyflareHosting('your_api_key', transport=name, url=self.url) as hosting:
+                self.assertEqual(hosting.user_lookup(cloudflare_email='user@example.com')['response']['user_key'],
+                                 '8afbe6dea02407989af4dd4c97bb6e25')
+            self.assertEqual(self.requests[0], {'a': 'ip_lkup', 'ip': '0.0.0.0', 'tkn': 'your_api_key',
+                                                'email': 'address@example.com'})
+
+    def test_errors(self):
+        for name in NAMES:
+            with PyflareClient('address@example.com', 'your_api_key', transport=name, url=self.url, timeout=0.05,
+                               retry=RetryPolicy(max_retries=1, backoff_factor=0)) as pyflare:
+                self.statuses = [503, 200]
+                self.assertEqual(pyflare.ip_lkup('0.0.0.0')['response'], {'0.0.0.0': 'BAD:0'})
+                self.statuses = [503, 503]
+                self.assertRaises(requests.HTTPError, pyflare.ip_lkup, '0.0.0.0')
+                self.assertRaises(requests.Timeout, pyflare.ip_lkup, 'slow')
+                self.assertRaises(APIError, pyflare.wl, 'garbage')
+
+    def test_connection_refused(self):
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+        listener.close()
+        for name in NAMES:
+            with PyflareClient('address@example.com', 'your_api_key', transport=name,
+                               url='http://127.0.0.1:{0}/'.format(port)) as pyflare:
+                self.assertRaises(requests.ConnectionError, pyflare.ip_lkup, '0.0.0.0')
+
+    def test_create(self):
+        self.assertIsInstance(transport.create('urllib3', pool_maxsize=3), transport.Urllib3Transport)
+        self.assertRaises(ValueError, transport.create, 'carrier pigeon')
+        self.assertRaises(ValueError, transport.create, 'urllib3', session=requests.Session())
+        custom = transport.SessionTransport()
+        self.assertIs(PyflareClient('address@example.com', 'your_api_key', transport=custom)._transport, custom)
+
+
+if __name__ == '__main__':
+    unittest.main()